@@ -26,13 +26,12 @@ class TransformAngleAxisCluster(TransformPolicy):
     def rotate(self, X, mx):
         ca = self.topology.coords_adapter(X)
         if(ca.nrigid > 0):
-            ca.posRigid[:] = np.dot(mx, ca.posRigid.transpose()).transpose()
+            ca.posRigid[:] = np.dot(ca.posRigid, mx.transpose())
             dp = rotations.mx2aa(mx)
-            for p in ca.rotRigid:
-                p[:] = rotations.rotate_aa(p, dp)
+            ca.rotRigid[:] = rotations.rotate_aa_array(ca.rotRigid, dp)
 
         if(ca.natoms > 0):
-            ca.posAtom[:] = np.dot(mx, ca.posAtom.transpose()).transpose()
+            ca.posAtom[:] = np.dot(ca.posAtom, mx.transpose())
         
     def can_invert(self):
         return self._can_invert
@@ -142,11 +141,15 @@ class ExactMatchAACluster(ExactMatchCluster):
         
         ExactMatchCluster.__init__(self, transform=transform, measure=measure, **kwargs)
 
-    def standard_alignments(self, coords1, coords2):
+    def standard_alignments(self, coords1, coords2, **kwargs):
         ca1 = self.topology.coords_adapter(coords1)
         ca2 = self.topology.coords_adapter(coords2)
         return StandardClusterAlignment(ca1.posRigid, ca2.posRigid, accuracy = self.accuracy,
-                                   can_invert=self.transform.can_invert())
+                                   can_invert=self.transform.can_invert(), **kwargs)
+    
+    def get_radii(self, x):
+        ca = self.topology.coords_adapter(x)
+        return np.sqrt(np.sum(ca.posRigid**2, axis=1))
             
 class MinPermDistAACluster(MinPermDistCluster):
     def __init__(self, topology, transform=None, measure=None, **kwargs):
@@ -160,11 +163,15 @@ class MinPermDistAACluster(MinPermDistCluster):
         
         MinPermDistCluster.__init__(self, transform=transform, measure=measure, **kwargs)
 
-    def _standard_alignments(self, x1, x2):
+    def _standard_alignments(self, x1, x2, **kwargs):
         ca1 = self.topology.coords_adapter(x1)
         ca2 = self.topology.coords_adapter(x2)
         return StandardClusterAlignment(ca1.posRigid, ca2.posRigid, accuracy=self.accuracy, 
-                                        can_invert=self.transform.can_invert())
+                                        can_invert=self.transform.can_invert(), **kwargs)
+    
+    def get_radii(self, x):
+        ca = self.topology.coords_adapter(x)
+        return np.sqrt(np.sum(ca.posRigid**2, axis=1))
 
     def finalize_best_match(self, x1):
         self.transform.translate(self.x2_best, self.com_shift)
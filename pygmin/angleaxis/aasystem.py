@@ -8,7 +8,7 @@ from pygmin.takestep import RotationalDisplacement
 from pygmin.systems import BaseSystem, dict_copy_update, BaseParameters
 from pygmin.transition_states import NEB, InterpolatedPathDensity
 
-from pygmin.optimize import fire, mylbfgs
+from pygmin.optimize import fire, mylbfgs, MetricTensorPreconditioner
 
 from pygmin.angleaxis.aamindist import *
 from pygmin.angleaxis import MinPermDistAACluster, ExactMatchAACluster
@@ -94,6 +94,13 @@ class AASystem(BaseSystem):
     def get_metric_tensor(self, coords):
         return self.aasystem.metric_tensor(coords)
     
+    def get_preconditioner(self):
+        """precondition with the translational and rotational blocks of the metric tensor
+        
+        This is not used by default, see BaseSystem.get_preconditioner
+        """
+        return MetricTensorPreconditioner(self.aasystem.metric_tensor)
+    
 class RBSystem(AASystem):
     def drawCylinder(self, X1, X2):
         from OpenGL import GL,GLUT, GLU
@@ -393,16 +393,21 @@ class AATopology(object):
         #print "Zero eigenvectors", zev         
         return zev + [dx, dy, dz]
     
+    def _get_zev_cache(self):
+        # the zero eigenvectors are expensive to compute, so the orthonormal
+        # basis is cached for the last few structures
+        try:
+            return self._zev_cache
+        except AttributeError:
+            self._zev_cache = zeroev.ZeroEVBasisCache(self.zeroEV)
+            return self._zev_cache
+    
     def orthogopt(self, v, coords):
-        zev = zeroev.gramm_schmidt(self.zeroEV(coords))
-        zeroev.orthogonalize(v, zev)
-        return v
+        return self._get_zev_cache().orthogonalize(v, coords)
     
     def ortogopt_aa(self, v, coords):
         v = v.copy()
-        zev = zeroev.gramm_schmidt(self.zeroEV(coords))
-        zeroev.orthogonalize(v, zev)
-        return v
+        return self._get_zev_cache().orthogonalize(v, coords)
     
     def metric_tensor(self, coords):
         ''' get the metric tensor for a current configuration '''
@@ -19,6 +19,17 @@ series of minima and transition states between two end point minima.
     DoubleEndedConnect
     DoubleEndedConnectPar
 
+Single ended transition state search
+++++++++++++++++++++++++++++++++++++
+Single ended searches start from a minimum and climb out of it in random
+directions.  They can be used to grow a landscape without a target minimum.
+
+.. autosummary::
+   :toctree: generated/
+
+    SingleEndedExplorer
+    find_escape_paths
+
 Other utilities
 ++++++++++++++++++++++++++++++++++++
 
@@ -51,4 +62,5 @@ from local_connect import *
 from connect_min import *
 from connect_min_parallel import *
 from singleended import *
+from _single_ended_explorer import *
 from _smooth_path import *
\ No newline at end of file
@@ -21,7 +21,9 @@ class _DistanceGraph(object):
     graph :
         the graph build from the database which contains the minima and transition states
     mindist : callable
-        the routine which calculates the optimized distance between two structures
+        the routine which calculates the optimized distance between two structures.
+        If mindist has a structure cache (e.g. MinPermDistCluster(cache=StructureCache()))
+        the ids of the minima are passed as keys for the cache
     verbosity :
         how much info to print (not very thoroughly implemented)
     defer_database_update : bool
@@ -140,7 +142,11 @@ class _DistanceGraph(object):
         if dist is not None: return dist
         
         #if it's not already known we must calculate it
-        dist, coords1, coords2 = self.mindist(min1.coords, min2.coords)
+        if getattr(self.mindist, "cache", None) is not None:
+            dist, coords1, coords2 = self.mindist(min1.coords, min2.coords, 
+                                                  id1=min1._id, id2=min2._id)
+        else:
+            dist, coords1, coords2 = self.mindist(min1.coords, min2.coords)
         if self.verbosity > 1:
             logger.debug("calculated distance between %s %s %s", min1._id, min2._id, dist)
         self._setDist(min1, min2, dist)
@@ -357,6 +363,8 @@ class _DistanceGraph(object):
             self.Gdist.add_edge(min1, m, weight=wnew)
             
         self.Gdist.remove_node(min2)
+        if getattr(self.mindist, "cache", None) is not None:
+            self.mindist.cache.remove(min2._id)
             
 
     def checkGraph(self):
@@ -0,0 +1,414 @@
+import heapq
+import logging
+import traceback
+from Queue import Queue
+import numpy as np
+
+#this import fixes some bugs in how multiprocessing deals with exceptions
+import pygmin.utils.fix_multiprocessing
+
+from pygmin.landscape import Graph
+from pygmin.landscape import connect_min_parallel
+from pygmin.landscape.connect_min_parallel import _createPool
+from pygmin.landscape.singleended import _uphill_search
+from pygmin.optimize import Result
+from pygmin.storage.database import TransitionState
+from pygmin.transition_states import findTransitionState, minima_from_ts, \
+    DimerSearch
+
+__all__ = ["SingleEndedExplorer"]
+
+logger = logging.getLogger("pygmin.connect.single_ended")
+
+
+def _random_direction(coords, orthogZeroEigs=None):
+    """return a random unit vector orthogonal to the known zero eigenvectors"""
+    v = np.random.uniform(-1, 1, coords.shape)
+    if orthogZeroEigs is not None:
+        v = orthogZeroEigs(v, coords)
+    return v / np.linalg.norm(v)
+
+def _escapeSearch(pot, coords, direction, energy0, method="eigenvector_following",
+                  push=1e-2, eigenval_tol=1e-3, energy_tol=1e-3,
+                  tsSearchParams=dict(), dimer_params=dict()):
+    """
+    search for a transition state starting from a minimum in a given direction
+
+    energy0 is the energy of the minimum.  See _checkTransitionState for
+    when the search is successful.
+
+    Returns
+    -------
+    ret : Result
+        with attributes success, coords, energy, eigenval, eigenvec and rms
+    """
+    if method == "eigenvector_following":
+        x = coords + push * direction
+        kwargs = dict([("method", "bofill")] + tsSearchParams.items())
+        ret = findTransitionState(x, pot, eigenvec0=direction, **kwargs)
+    elif method == "dimer":
+        dimer_params = dict(dimer_params.items())
+        push_minrms = dimer_params.pop("push_minrms", 1e-2)
+        tol = dimer_params.pop("tol", 1e-6)
+        search = DimerSearch(coords, pot, direction=direction, **dimer_params)
+        res = _uphill_search(coords, search, push, push_minrms)
+        x, energy, rms = res.coords, res.energy, res.rms
+        # the dimer search does not compute the curvature at the converged
+        # point, so check it with a finite difference along the dimer
+        eigenvec = search.tau.copy()
+        e, g = pot.getEnergyGradient(x)
+        e, g1 = pot.getEnergyGradient(x + search.delta * eigenvec)
+        ret = Result()
+        ret.coords = x
+        ret.energy = energy
+        ret.rms = rms
+        ret.eigenvec = eigenvec
+        ret.eigenval = np.dot(g1 - g, eigenvec) / search.delta
+        ret.success = rms <= tol
+    else:
+        raise ValueError("unknown single ended search method %s" % method)
+    return _checkTransitionState(ret, energy0, eigenval_tol, energy_tol)
+
+def _checkTransitionState(ret, energy0, eigenval_tol, energy_tol):
+    """
+    keep ret.success only if ret has a curvature below -eigenval_tol and an
+    energy more than energy_tol above energy0
+
+    Otherwise a search which stays in the minimum, where the curvature along
+    a zero eigenvector is about zero, would be accepted.
+    """
+    ret.success = bool(ret.success and ret.eigenval < -eigenval_tol
+                       and ret.energy > energy0 + energy_tol)
+    return ret
+
+def _escapeSearchWrapper(inputs):
+    """
+    wrapper for _escapeSearch to be used with the pool from _createPool
+    """
+    coords, direction, energy0, kwargs = inputs
+    return _escapeSearch(connect_min_parallel._worker_pot, coords, direction,
+                         energy0, **kwargs)
+
+def _pushoffWrapper(inputs):
+    """
+    wrapper for minima_from_ts to be used with the pool from _createPool
+    """
+    coords, eigenvec, pushoff_params = inputs
+    return minima_from_ts(connect_min_parallel._worker_pot, coords, n=eigenvec,
+                          **pushoff_params)
+
+def _jobWrapper(inputs):
+    """
+    run func(args) in a worker and return (True, result)
+
+    If func raises, (False, traceback) is returned instead.  The callback of
+    apply_async is not called for a job which raised, so the main process
+    would otherwise wait for its result forever.
+    """
+    func, args = inputs
+    try:
+        return True, func(args)
+    except Exception:
+        return False, traceback.format_exc()
+
+
+class SingleEndedExplorer(object):
+    """
+    grow a landscape with single ended transition state searches run in parallel
+
+    The minima to search from are kept in a priority queue, lowest energy
+    first.  For each minimum `nsearches` transition state searches are started
+    in random directions.  The searches are run in a pool of worker processes
+    and the results are processed as soon as they arrive.  A search is only
+    successful if it ends at a point with negative curvature above the
+    minimum it started from.  A new transition
+    state is compared with the transition states in the database (and with
+    those currently being processed) before the expensive pushoff, so
+    duplicates are discarded early.  The new minima and transition states are
+    added to the Graph and the new minima are put on the queue.
+
+    Parameters
+    ----------
+    pot : potential object
+    database : Database
+        the minima and transition states are stored here
+    compare_exact : callable, optional
+        `bool = compare_exact(coords1, coords2)` returns True if two
+        structures are identical.  If not given, transition states are
+        considered duplicates if their energies agree within
+        `duplicate_energy_tol`
+    ncores : int, optional
+        the number of worker processes
+    method : string, optional
+        "eigenvector_following" (findTransitionState) or "dimer" (DimerSearch).
+        The hybrid eigenvector following of FindTransitionState is made for
+        refining NEB climbing images and gives up if the curvature is
+        positive, so the mode following P-RFO search
+        (tsSearchParams["method"] = "bofill") is used by default
+    nsearches : int, optional
+        the number of searches started from each minimum
+    push : float, optional
+        the size of the initial displacement from the minimum
+    eigenval_tol : float, optional
+        a transition state must have a curvature below -eigenval_tol
+    tsSearchParams : dict, optional
+        parameters passed to findTransitionState.  orthogZeroEigs is also used
+        to remove the zero eigenvectors from the random directions
+    dimer_params : dict, optional
+        parameters passed to DimerSearch.  push_minrms and tol are used by
+        the uphill search
+    pushoff_params : dict, optional
+        parameters passed to minima_from_ts
+    duplicate_energy_tol : float, optional
+        energy tolerance for detecting duplicate transition states.  A
+        transition state must also be this much higher in energy than the
+        minimum the search started from
+    graph : Graph, optional
+        the graph to add the results to.  If not given it is built from the
+        database
+    pool : tuple, optional
+        (pool, cancel) as returned by connect_min_parallel._createPool.  If not
+        given a new pool is created in run() and closed when it returns
+
+    Attributes
+    ----------
+    nsearches_done : int
+        the number of finished transition state searches
+    nduplicates : int
+        the number of transition states which were already known
+    new_transition_states : list
+        the transition states added to the database
+
+    See Also
+    --------
+    find_escape_paths : serial single ended searches with the dimer method
+    DoubleEndedConnectPar : uses the same pool of workers
+
+    Examples
+    --------
+
+    >>> explorer = SingleEndedExplorer(pot, database, ncores=4)
+    >>> explorer.add_minimum(database.minima()[0])
+    >>> explorer.run(max_searches=100)
+    """
+    def __init__(self, pot, database, compare_exact=None, ncores=4,
+                 method="eigenvector_following", nsearches=4, push=1e-2,
+                 eigenval_tol=1e-3, tsSearchParams=dict(), dimer_params=dict(),
+                 pushoff_params=dict(), duplicate_energy_tol=1e-3, graph=None,
+                 pool=None):
+        self.pot = pot
+        self.database = database
+        self.compare_exact = compare_exact
+        self.ncores = ncores
+        self.method = method
+        self.nsearches = nsearches
+        self.push = push
+        self.eigenval_tol = eigenval_tol
+        self.tsSearchParams = tsSearchParams
+        self.dimer_params = dimer_params
+        self.pushoff_params = pushoff_params
+        self.duplicate_energy_tol = duplicate_energy_tol
+        if graph is None:
+            graph = Graph(database)
+        self.graph = graph
+        self.pool = pool
+
+        self.orthogZeroEigs = tsSearchParams.get("orthogZeroEigs", None)
+
+        self._queue = []
+        self._queued = set()
+        self._counter = 0
+        self._pending_ts = []
+        self._results = Queue()
+        self._njobs = 0
+        self.nsearches_done = 0
+        self.nduplicates = 0
+        self.new_transition_states = []
+
+    def add_minimum(self, m, priority=None):
+        """put a minimum on the queue of minima to search from
+
+        minima with lower priority are searched first.  The default priority
+        is the energy of the minimum.
+        """
+        if m._id in self._queued:
+            return
+        if priority is None:
+            priority = m.energy
+        self._queued.add(m._id)
+        heapq.heappush(self._queue, (priority, self._counter, m))
+        self._counter += 1
+
+    def _is_duplicate(self, ret):
+        """return True if the transition state is in the database or is already being processed"""
+        E = ret.energy
+        tol = self.duplicate_energy_tol
+        candidates = [ts.coords for ts in self.database.session.query(TransitionState).\
+                      filter(TransitionState.energy > E - tol).\
+                      filter(TransitionState.energy < E + tol)]
+        candidates += [tsret.coords for tsret in self._pending_ts
+                       if abs(tsret.energy - E) < tol]
+        for coords in candidates:
+            if self.compare_exact is None or self.compare_exact(ret.coords, coords):
+                return True
+        return False
+
+    def _addTransitionState(self, tsret, m1ret, m2ret):
+        """add the transition state and the minima on either side to the graph"""
+        min1 = self.graph.addMinimum(m1ret.energy, m1ret.coords)
+        min2 = self.graph.addMinimum(m2ret.energy, m2ret.coords)
+        if min1 == min2:
+            logger.warning("stepping off the transition state resulted in twice the same minima %s", min1._id)
+            return
+        ts = self.graph.addTransitionState(tsret.energy, tsret.coords, min1, min2,
+                                           eigenvec=tsret.eigenvec, eigenval=tsret.eigenval)
+        logger.info("found transition state %s %s %s %s %s", min1._id, min2._id,
+                    min1.energy, ts.energy, min2.energy)
+        self.new_transition_states.append(ts)
+        self.add_minimum(min1)
+        self.add_minimum(min2)
+
+    def _submit(self, pool, func, args, pending, kind, tsret=None):
+        """submit a job to the pool, its result is put on self._results when it finishes"""
+        jobid = self._njobs
+        self._njobs += 1
+        results = self._results
+        pool.apply_async(_jobWrapper, [(func, args)],
+                         callback=lambda ret: results.put((jobid, ret)))
+        pending[jobid] = (kind, tsret)
+
+    def _submitSearches(self, pool, m, pending):
+        kwargs = dict(method=self.method, push=self.push,
+                      eigenval_tol=self.eigenval_tol,
+                      energy_tol=self.duplicate_energy_tol,
+                      tsSearchParams=self.tsSearchParams,
+                      dimer_params=self.dimer_params)
+        for i in xrange(self.nsearches):
+            direction = _random_direction(m.coords, self.orthogZeroEigs)
+            self._submit(pool, _escapeSearchWrapper,
+                         (m.coords, direction, m.energy, kwargs), pending, "search")
+
+    def _processSearch(self, pool, ret, pending):
+        self.nsearches_done += 1
+        if not ret.success:
+            logger.info("single ended transition state search failed")
+            return
+        if self._is_duplicate(ret):
+            logger.info("transition state is already known, energy %s", ret.energy)
+            self.nduplicates += 1
+            return
+        self._pending_ts.append(ret)
+        self._submit(pool, _pushoffWrapper,
+                     (ret.coords, ret.eigenvec, self.pushoff_params),
+                     pending, "pushoff", ret)
+
+    def run(self, max_searches=100):
+        """run transition state searches until max_searches have been done or the queue is empty
+
+        Returns
+        -------
+        new_transition_states : list
+            the transition states found in this run
+        """
+        if self.pool is None:
+            pool, cancel = _createPool(self.pot, self.ncores)
+            close_pool = True
+        else:
+            pool, cancel = self.pool
+            close_pool = False
+        nsubmitted = 0
+        pending = dict()
+        ntsold = len(self.new_transition_states)
+        try:
+            while True:
+                # keep the workers busy
+                while (self._queue and nsubmitted < max_searches and
+                       len(pending) < 2 * self.ncores):
+                    priority, count, m = heapq.heappop(self._queue)
+                    self._submitSearches(pool, m, pending)
+                    nsubmitted += self.nsearches
+                if not pending:
+                    break
+
+                # wait for the next job to finish
+                jobid, (ok, ret) = self._results.get()
+                kind, tsret = pending.pop(jobid)
+                if not ok:
+                    raise RuntimeError("single ended %s failed in a worker:\n%s" % (kind, ret))
+                if kind == "search":
+                    self._processSearch(pool, ret, pending)
+                else:
+                    self._pending_ts = [t for t in self._pending_ts if t is not tsret]
+                    m1ret, m2ret = ret
+                    self._addTransitionState(tsret, m1ret, m2ret)
+        finally:
+            if close_pool:
+                pool.terminate()
+                pool.join()
+            if pending:
+                # results of jobs abandoned after an error must not be
+                # mistaken for those of a later run
+                self._results = Queue()
+                self._pending_ts = []
+
+        logger.info("single ended exploration: %d searches, %d new transition states, %d duplicates",
+                    self.nsearches_done, len(self.new_transition_states) - ntsold, self.nduplicates)
+        return self.new_transition_states[ntsold:]
+
+
+import unittest
+
+class TestSingleEndedExplorer(unittest.TestCase):
+    def setUp(self):
+        from pygmin.systems import LJCluster
+        np.random.seed(0)
+        self.system = LJCluster(13)
+        self.pot = self.system.get_potential()
+        self.database = self.system.create_database()
+        bh = self.system.get_basinhopping(database=self.database, outstream=None)
+        bh.run(20)
+        self.m = self.database.minima()[0]
+
+    def test_start_minimum(self):
+        # a search which stays in the minimum finds a curvature of about zero
+        # along a zero eigenvector, with either sign
+        ret = Result()
+        ret.coords = self.m.coords.copy()
+        ret.energy = self.m.energy
+        ret.eigenval = -1e-6
+        ret.success = True
+        self.assertFalse(_checkTransitionState(ret, self.m.energy, 1e-3, 1e-3).success)
+
+        # a saddle point below the minimum is rejected as well
+        ret.success = True
+        ret.eigenval = -1.
+        ret.energy = self.m.energy - 1.
+        self.assertFalse(_checkTransitionState(ret, self.m.energy, 1e-3, 1e-3).success)
+
+        ret.success = True
+        ret.energy = self.m.energy + 1.
+        self.assertTrue(_checkTransitionState(ret, self.m.energy, 1e-3, 1e-3).success)
+
+    def test_explore(self):
+        from pygmin.utils.hessian import get_sorted_eig
+        explorer = self.system.get_single_ended_explorer(self.database, ncores=2)
+        explorer.add_minimum(self.m)
+        new_ts = explorer.run(max_searches=8)
+        self.assertEqual(explorer.nsearches_done, 8)
+        self.assertGreater(len(new_ts), 0)
+        for ts in new_ts:
+            self.assertNotEqual(ts.minimum1, ts.minimum2)
+            self.assertGreater(ts.energy, max(ts.minimum1.energy, ts.minimum2.energy))
+            self.assertLess(ts.eigenval, -explorer.eigenval_tol)
+            evals = get_sorted_eig(self.pot.getHessian(ts.coords))[0]
+            self.assertLess(evals[0], -explorer.eigenval_tol)
+            self.assertLess(np.abs(evals[1]), 1e-3)
+
+    def test_worker_error(self):
+        explorer = SingleEndedExplorer(self.pot, self.database, ncores=2,
+                                       method="no_such_method")
+        explorer.add_minimum(self.m)
+        self.assertRaises(RuntimeError, explorer.run, 4)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,6 +4,7 @@ import logging
 
 from pygmin.landscape import Graph, LocalConnect
 from pygmin.landscape._distance_graph import _DistanceGraph
+from pygmin.utils.benchmark import ProfilingPotential
 
 __all__ = ["DoubleEndedConnect"]
 
@@ -470,6 +471,8 @@ class DoubleEndedConnect(object):
     def connect(self):
         """
         the main loop of the algorithm
+        
+        If the potential is a ProfilingPotential its report is logged at the end
         """
         self.NEBattempts = 2;
         for i in range(self.niter):
@@ -480,6 +483,7 @@ class DoubleEndedConnect(object):
             if self.graph.areConnected(self.minstart, self.minend):
                 self.dist_graph.updateDatabase(force=True)
                 logger.info("found connection!")
+                self._log_profile()
                 return
             
             logger.info("")
@@ -502,6 +506,11 @@ class DoubleEndedConnect(object):
 
             
         logger.info("failed to find connection between %s %s", self.minstart._id, self.minend._id)
+        self._log_profile()
+
+    def _log_profile(self):
+        if isinstance(self.pot, ProfilingPotential):
+            self.pot.log_report(logging.getLogger("pygmin.connect.profile"))
 
     def success(self):
         return self.graph.areConnected(self.minstart, self.minend)
@@ -1,4 +1,5 @@
 import multiprocessing as mp
+import numpy as np
 import logging
 
 #this import fixes some bugs in how multiprocessing deals with exceptions
@@ -12,11 +13,44 @@ __all__ = ["DoubleEndedConnectPar", "LocalConnectPar"]
 
 logger = logging.getLogger("pygmin.connect")
 
+# the potential and the cancel flag are stored in each worker process by
+# _initWorker so the potential does not have to be pickled for every candidate
+_worker_pot = None
+_worker_cancel = None
+
+def _initWorker(pot, cancel):
+    """
+    initializer for the worker processes of the transition state refinement pool
+    """
+    global _worker_pot, _worker_cancel
+    _worker_pot = pot
+    _worker_cancel = cancel
+
+def _stopIfCancelled(**kwargs):
+    return _worker_cancel.is_set()
+
 def _refineTSWrapper(inputs):
     """
     a stupid wrapper to allow _refineTS to be used with Pool.map which only supports one argument
+    
+    The only stop criterion used in the workers is the cancel flag.  The
+    duplicate check of LocalConnect (compare_exact) is not applied here,
+    because the workers cannot see the transition states found by the
+    other workers.
     """
-    return _refineTS(inputs[0], inputs[1], **inputs[2])
+    if _worker_cancel.is_set():
+        return False, None, None, None
+    coords, kwargs = inputs
+    return _refineTS(_worker_pot, coords, stop_criterion=_stopIfCancelled, **kwargs)
+
+def _createPool(pot, ncores):
+    """
+    return a pool of workers which each hold a copy of the potential and the
+    event which is used to cancel the remaining work
+    """
+    cancel = mp.Event()
+    pool = mp.Pool(ncores, initializer=_initWorker, initargs=(pot, cancel))
+    return pool, cancel
 
 
 class DoubleEndedConnectPar(DoubleEndedConnect):
@@ -35,6 +69,14 @@ class DoubleEndedConnectPar(DoubleEndedConnect):
     -----
     This class inherits from DoubleEndedConnect, so can accepts all those parameters as well.
     
+    During connect() the pool of workers used for the transition state
+    refinement is created once, the first time it is needed, and is shared
+    by all LocalConnectPar runs.  Each worker keeps a copy of the potential,
+    so the potential is only pickled once per worker.  The pool is closed
+    when connect() returns.  LocalConnectPar objects obtained outside of
+    connect() (e.g. by the gui) don't share the pool, they create and close
+    a pool for each refinement.
+    
     The routines that are done in parallel are::
     
     1. NEB : the potentials for each image are calculated in parallel
@@ -52,10 +94,39 @@ class DoubleEndedConnectPar(DoubleEndedConnect):
             self.ncores = kwargs.pop("ncores")
         except KeyError:
             self.ncores = 4
+        self._pool = None
+        self._pool_cancel = None
+        self._connecting = False
         return super(DoubleEndedConnectPar, self).__init__(*args, **kwargs)
 
+    def _getPool(self):
+        if self._pool is None:
+            self._pool, self._pool_cancel = _createPool(self.pot, self.ncores)
+        return self._pool, self._pool_cancel
+
+    def _closePool(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+            self._pool_cancel = None
+
     def _getLocalConnectObject(self):
-        return LocalConnectPar(self.pot, self.mindist, ncores=self.ncores, **self.local_connect_params)
+        # only connect() closes the shared pool, so don't create it otherwise
+        if self._connecting:
+            pool = self._getPool()
+        else:
+            pool = None
+        return LocalConnectPar(self.pot, self.mindist, ncores=self.ncores, 
+                               pool=pool, **self.local_connect_params)
+
+    def connect(self):
+        self._connecting = True
+        try:
+            return super(DoubleEndedConnectPar, self).connect()
+        finally:
+            self._connecting = False
+            self._closePool()
 
 
 class LocalConnectPar(LocalConnect):
@@ -69,6 +140,12 @@ class LocalConnectPar(LocalConnect):
         all required and optional parameters from LocalConnect are also accepted
     ncores :
         the number of cores to use in parallel runs
+    pool : tuple, optional
+        (pool, cancel) as returned by _createPool.  If not given a new pool is
+        created for each call to _refineTransitionStates
+    cancel_on_success : bool, optional
+        if True, the remaining transition state searches are abandoned as soon
+        as the first one succeeds
     
     See Also
     --------
@@ -86,6 +163,11 @@ class LocalConnectPar(LocalConnect):
     findTransitionStates : each transition state candidate from the NEB
         run is refined in parallel. 
     
+    Because all candidates are refined at the same time the early stop on
+    duplicate transition states (see compare_exact in LocalConnect) is not
+    used in parallel runs.  Every refinement runs until it converges or is
+    cancelled, and nduplicates stays zero.
+    
     """
     def __init__(self, *args, **kwargs):
         #self.ncores = ncores
@@ -93,6 +175,8 @@ class LocalConnectPar(LocalConnect):
             self.ncores = kwargs.pop("ncores")
         except KeyError:
             self.ncores = 4
+        self.pool = kwargs.pop("pool", None)
+        self.cancel_on_success = kwargs.pop("cancel_on_success", False)
         super(LocalConnectPar, self).__init__(*args, **kwargs)
         self.NEBparams["parallel"] = True
         self.NEBparams["ncores"] = self.ncores
@@ -112,18 +196,18 @@ class LocalConnectPar(LocalConnect):
             count += 1
             logger.info("\nrefining transition state from NEB climbing image: %s %s %s", count, "out of", nrefine)
             coords = neb.coords[i,:]
-            #get guess for initial eigenvector from NEB tangent
-            if True:
-                eigenvec0 = neb.tangent( neb.energies[i], neb.energies[i-1], neb.energies[i+1],
-                                         neb.distance(neb.coords[i,:], neb.coords[i-1,:])[1],
-                                         neb.distance(neb.coords[i,:], neb.coords[i+1,:])[1],
-                                        )
-
-            input_args.append((self.pot, coords, {"tsSearchParams":self.tsSearchParams, "eigenvec0":eigenvec0}))
+            kwargs = self._getTSGuess(neb, i)
+            kwargs["tsSearchParams"] = self.tsSearchParams
+            kwargs["pushoff_params"] = self.pushoff_params
+            input_args.append((coords, kwargs))
 
         #do all the transition state searches in parallel using a pool of workers
         logger.info("refining transition states in parallel on %s %s", self.ncores, "cores")
-        mypool = mp.Pool(self.ncores)
+        if self.pool is None:
+            mypool, cancel = _createPool(self.pot, self.ncores)
+        else:
+            mypool, cancel = self.pool
+        cancel.clear()
         try:
             #there is a bug in Python so that exceptions in multiprocessing.Pool aren't
             #handled correctly.  A fix is to add a timeout (.get(timeout))
@@ -139,6 +223,9 @@ class LocalConnectPar(LocalConnect):
                     tsret, m1ret, m2ret = ret[1:4]
                     self.res.new_transition_states.append( (tsret, m1ret, m2ret) )
                     ngood_ts += 1
+                    if self.cancel_on_success and not cancel.is_set():
+                        logger.info("transition state found, cancelling the remaining searches")
+                        cancel.set()
         except:
             #It's important to make sure the child processes are closed even
             #if when an exception is raised.  
@@ -148,8 +235,10 @@ class LocalConnectPar(LocalConnect):
             mypool.terminate()
             mypool.join()
             raise
-        mypool.close()
-        mypool.join()
+        cancel.clear()
+        if self.pool is None:
+            mypool.close()
+            mypool.join()
         
         logger.info("found %s %s %s %s", ngood_ts, "good transition states from", nrefine, "candidates")
         return ngood_ts > 0
@@ -161,6 +250,27 @@ class LocalConnectPar(LocalConnect):
 
 
 
+import unittest
+
+class TestConnectPar(unittest.TestCase):
+    def setUp(self):
+        from pygmin.systems import LJCluster
+        np.random.seed(0)
+        self.system = LJCluster(13)
+        self.db = self.system.create_database()
+        bh = self.system.get_basinhopping(database=self.db, outstream=None)
+        bh.run(20)
+
+    def test_cancel_on_success(self):
+        m1, m2 = self.db.minima()[:2]
+        connect = self.system.get_double_ended_connect(m1, m2, self.db, parallel=True,
+                        ncores=2, verbosity=-1,
+                        local_connect_params=dict(cancel_on_success=True))
+        connect.connect()
+        self.assertTrue(connect.success())
+        self.assertIsNone(connect._pool)
+        self.assertEqual(len(mp.active_children()), 0)
+
 if __name__ == "__main__":
     from pygmin.landscape.connect_min import test
     test(DoubleEndedConnectPar, natoms=28)
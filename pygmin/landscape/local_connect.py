@@ -1,4 +1,5 @@
 import logging
+import numpy as np
 
 from pygmin.optimize import Result
 from pygmin.transition_states import findTransitionState, minima_from_ts
@@ -8,7 +9,8 @@ __all__ = ["LocalConnect"]
 
 logger = logging.getLogger("pygmin.connect")
 
-def _refineTS(pot, coords, tsSearchParams=dict(), eigenvec0=None, pushoff_params=dict()):
+def _refineTS(pot, coords, tsSearchParams=dict(), eigenvec0=None, pushoff_params=dict(),
+              stop_criterion=None, **warm_start):
     """
     find nearest transition state to NEB climbing image.  Then fall
     off the transition state to find the associated minima.
@@ -17,11 +19,16 @@ def _refineTS(pot, coords, tsSearchParams=dict(), eigenvec0=None, pushoff_params
     to make it more easily parallelizable.      
     """
     #run ts search algorithm
-    kwargs = dict(tsSearchParams.items())
+    kwargs = dict(tsSearchParams.items() + warm_start.items())
+    if stop_criterion is not None:
+        kwargs["stop_criterion"] = stop_criterion
     ret = findTransitionState(coords, pot, eigenvec0=eigenvec0, **kwargs)
     
     #check to make sure it is a valid transition state 
     coords = ret.coords
+    if ret.stopped:
+        logger.info("transition state search was abandoned")
+        return False, ret, None, None
     if not ret.success:
         logger.info("transition state search failed")
         return False, ret, None, None
@@ -68,6 +75,26 @@ class LocalConnect(object):
     verbosity : int
         this controls how many status messages are printed.  (not really
         implemented yet)
+    compare_exact : callable, optional
+        `bool = compare_exact(coords1, coords2)` returns True if two
+        structures are identical.  If given, the refinement of a transition
+        state candidate is abandoned as soon as it matches a transition state
+        already found in this run.  The structures are only compared if the
+        energies agree within `duplicate_energy_tol`.  Candidates are only
+        compared with the transition states found by this object, not with
+        the ones already in the database.
+    duplicate_energy_tol : float, optional
+        energy tolerance used for detecting duplicate transition states
+    ts_warm_start : bool, optional
+        if True, the transition state search is started with the curvature
+        of the NEB path at the climbing image as an estimate of the lowest
+        eigenvalue and with the inverse Hessian diagonal from the NEB
+        optimization.  See eigenval0, eigenval_rtol and H0_transverse in
+        FindTransitionState.  Note that the first lowest eigenvector search
+        stops as soon as the Rayleigh quotient agrees with the finite
+        difference curvature along the path, often after a single step.  The
+        curvature estimate is trusted, the eigenvector is only refined
+        further in the following iterations of the transition state search.
     
     
     Notes
@@ -93,7 +120,9 @@ class LocalConnect(object):
                  NEBparams=dict(),
                  nrefine_max=100, reoptimize_climbing=0,
                  pushoff_params=dict(),
-                 create_neb=NEBDriver):
+                 create_neb=NEBDriver,
+                 compare_exact=None, duplicate_energy_tol=1e-3,
+                 ts_warm_start=False):
         self.pot = pot
         self.mindist = mindist
         self.tsSearchParams = tsSearchParams
@@ -108,7 +137,46 @@ class LocalConnect(object):
         self.res = Result()
         self.res.new_transition_states = []
         self.create_neb = create_neb
+        self.compare_exact = compare_exact
+        self.duplicate_energy_tol = duplicate_energy_tol
+        self.ts_warm_start = ts_warm_start
+        self.res.nduplicates = 0
+        
+    def _is_duplicate_ts(self, energy, coords):
+        """return True if coords is a transition state which has already been found"""
+        for tsret, m1ret, m2ret in self.res.new_transition_states:
+            if abs(energy - tsret.energy) > self.duplicate_energy_tol:
+                continue
+            if self.compare_exact(coords, tsret.coords):
+                return True
+        return False
+    
+    def _stop_if_duplicate(self, energy=None, coords=None, **kwargs):
+        """stop criterion for findTransitionState"""
+        return self._is_duplicate_ts(energy, coords)
         
+    def _getTSGuess(self, neb, i):
+        """
+        return the starting information for the transition state search
+        from NEB climbing image i
+        """
+        guess = dict()
+        #get guess for initial eigenvector from NEB tangent
+        guess["eigenvec0"] = neb.tangent( neb.energies[i], neb.energies[i-1], neb.energies[i+1],
+                                 neb.distance(neb.coords[i,:], neb.coords[i-1,:])[1],
+                                 neb.distance(neb.coords[i,:], neb.coords[i+1,:])[1],
+                                )
+        if self.ts_warm_start:
+            # finite difference curvature of the energy along the path
+            dleft = np.sqrt(neb.distance(neb.coords[i,:], neb.coords[i-1,:], grad=False)[0])
+            dright = np.sqrt(neb.distance(neb.coords[i,:], neb.coords[i+1,:], grad=False)[0])
+            slope_left = (neb.energies[i] - neb.energies[i-1]) / dleft
+            slope_right = (neb.energies[i+1] - neb.energies[i]) / dright
+            guess["eigenval0"] = 2. * (slope_right - slope_left) / (dleft + dright)
+            if neb.quench_H0 is not None:
+                guess["H0_transverse"] = neb.quench_H0
+        return guess
+
     def _refineTransitionStates(self, neb, climbing_images):
         """
         refine the transition state candidates.  If at least one is successful
@@ -118,20 +186,22 @@ class LocalConnect(object):
         nrefine = min(self.nrefine_max, len(climbing_images))
         count = 0
         success = False
+        stop_criterion = None
+        if self.compare_exact is not None:
+            stop_criterion = self._stop_if_duplicate
         for energy, i in climbing_images[:nrefine]:
             count += 1
             logger.info( "")
             logger.info( "refining transition state from NEB climbing image: %s %s %s", count, "out of", nrefine)
             coords = neb.coords[i,:]
-            #get guess for initial eigenvector from NEB tangent
-            if True:
-                eigenvec0 = neb.tangent( neb.energies[i], neb.energies[i-1], neb.energies[i+1],
-                                         neb.distance(neb.coords[i,:], neb.coords[i-1,:])[1],
-                                         neb.distance(neb.coords[i,:], neb.coords[i+1,:])[1],
-                                        )
+            guess = self._getTSGuess(neb, i)
             
             ret = _refineTS(self.pot, coords, tsSearchParams=self.tsSearchParams, 
-                                 eigenvec0=eigenvec0, pushoff_params=self.pushoff_params)
+                                 pushoff_params=self.pushoff_params,
+                                 stop_criterion=stop_criterion, **guess)
+            if ret[1].stopped:
+                logger.info("transition state candidate converged to an already known transition state")
+                self.res.nduplicates += 1
             ts_success = ret[0]
             if ts_success:
                 #the transition state is good, add it to the list
@@ -245,6 +315,91 @@ def test():
     local_connect = LocalConnect(pot, mindist)
     local_connect.connect(min1, min2)
 
+import unittest
+
+def _setUpLJ13(test):
+    """run an NEB between two LJ13 minima and store the first climbing image"""
+    from pygmin.systems import LJCluster
+    np.random.seed(0)
+    test.system = LJCluster(13)
+    test.pot = test.system.get_potential()
+    test.mindist = test.system.get_mindist()
+    db = test.system.create_database()
+    bh = test.system.get_basinhopping(database=db, outstream=None)
+    bh.run(20)
+    m1, m2 = db.minima()[:2]
+    dist, x1, x2 = test.mindist(m1.coords, m2.coords)
+    test.neb = NEBDriver(test.pot, x1, x2).run()
+    test.neb.MakeAllMaximaClimbing()
+    test.i = [i for i in range(test.neb.nimages) if test.neb.isclimbing[i]][0]
+
+class TestTSWarmStart(unittest.TestCase):
+    """the warm started transition state search must find the same saddle"""
+    def setUp(self):
+        _setUpLJ13(self)
+        lc = LocalConnect(self.pot, self.mindist, ts_warm_start=True)
+        self.guess = lc._getTSGuess(self.neb, self.i)
+        self.coords = self.neb.coords[self.i,:].copy()
+
+    def test_guess(self):
+        self.assertIn("eigenval0", self.guess)
+        self.assertIn("H0_transverse", self.guess)
+        self.assertLess(self.guess["eigenval0"], 0.)
+
+    def test_lowest_eigenvector(self):
+        from pygmin.transition_states import findLowestEigenVector
+        ret = findLowestEigenVector(self.coords, self.pot, eigenvec0=self.guess["eigenvec0"],
+                                    eigenval0=self.guess["eigenval0"], eigenval_rtol=0.05)
+        self.assertLess(ret.eigenval, 0.)
+
+    def test_same_saddle(self):
+        from pygmin.transition_states import FindTransitionState
+        from pygmin.utils.hessian import get_sorted_eig
+        warm = FindTransitionState(self.coords, self.pot, **self.guess).run()
+        cold = FindTransitionState(self.coords, self.pot, 
+                                   eigenvec0=self.guess["eigenvec0"]).run()
+        self.assertTrue(warm.success)
+        self.assertTrue(cold.success)
+        self.assertLess(warm.eigenval, 0.)
+        evals = get_sorted_eig(self.pot.getHessian(warm.coords))[0]
+        self.assertLess(evals[0], 0.)
+        self.assertGreater(evals[1], -1e-3)
+        self.assertAlmostEqual(warm.energy, cold.energy, 6)
+        self.assertLess(self.mindist(warm.coords, cold.coords)[0], 1e-3)
+
+class TestDuplicateTS(unittest.TestCase):
+    """two candidates converging to the same saddle must only be refined once"""
+    def setUp(self):
+        _setUpLJ13(self)
+        self.lc = LocalConnect(self.pot, self.mindist, 
+                               compare_exact=self.system.get_compare_exact())
+        self.eigenvec0 = self.lc._getTSGuess(self.neb, self.i)["eigenvec0"]
+        self.coords1 = self.neb.coords[self.i,:].copy()
+        self.coords2 = self.coords1 + np.random.uniform(-0.01, 0.01, self.coords1.shape)
+
+    def test_stopped(self):
+        ret = _refineTS(self.pot, self.coords1, eigenvec0=self.eigenvec0)
+        self.assertTrue(ret[0])
+        self.lc.res.new_transition_states.append(ret[1:4])
+        self.assertTrue(self.lc._is_duplicate_ts(ret[1].energy, ret[1].coords))
+        
+        ret = _refineTS(self.pot, self.coords2, eigenvec0=self.eigenvec0,
+                        stop_criterion=self.lc._stop_if_duplicate)
+        self.assertTrue(ret[1].stopped)
+        self.assertFalse(ret[0])
+        # no pushoff was done
+        self.assertIsNone(ret[2])
+        self.assertIsNone(ret[3])
+
+    def test_refine(self):
+        self.neb.coords[self.i + 1,:] = self.coords2
+        self.neb.energies[self.i + 1] = self.pot.getEnergy(self.coords2)
+        climbing_images = [(self.neb.energies[self.i], self.i), 
+                           (self.neb.energies[self.i + 1], self.i + 1)]
+        self.assertTrue(self.lc._refineTransitionStates(self.neb, climbing_images))
+        self.assertEqual(len(self.lc.res.new_transition_states), 1)
+        self.assertEqual(self.lc.res.nduplicates, 1)
+
 if __name__ == "__main__":
 #    logger.basicConfig(level=logger.DEBUG)
     test()
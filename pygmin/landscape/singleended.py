@@ -38,11 +38,12 @@ def find_escape_paths(minimum, potential, graph, ntries=1, push=1.e-2, push_minr
    
     for i in xrange(ntries):
         
-        x_ts, energy_ts, rms, tmp = _uphill_search(minimum.coords, search, push, push_minrms)
-        ret1, ret2 = minima_from_ts(potential, x_ts, displace=1e-2)
+        ret = _uphill_search(minimum.coords, search, push, push_minrms)
+        x_ts, energy_ts = ret.coords, ret.energy
+        ret1, ret2 = minima_from_ts(potential, x_ts, n=search.tau)
         
-        min1 = graph.addMinimum(ret1[1], ret1[0])
-        min2 = graph.addMinimum(ret2[1], ret2[0])
+        min1 = graph.addMinimum(ret1.energy, ret1.coords)
+        min2 = graph.addMinimum(ret2.energy, ret2.coords)
         
         if(not min1 is minimum and not min2 is minimum):
             print "Warning in single ended search: did not find initial minimum during quench from transition state"
@@ -4,6 +4,7 @@ import accept_tests.metropolis as metropolis
 import copy
 import numpy as np
 from pygmin.optimize import Result
+from pygmin.utils.benchmark import ProfilingPotential
 
 
 class MonteCarlo(object):
@@ -164,10 +165,15 @@ class MonteCarlo(object):
         return self.acceptstep, self.trial_coords, self.trial_energy
   
     def run(self, nsteps):
-        """do multiple iterations"""
+        """do multiple iterations
+        
+        If the potential is a ProfilingPotential its report is logged at the end
+        """
         #take nsteps
         for istep in xrange(nsteps):
             self.takeOneStep()
+        if isinstance(self.potential, ProfilingPotential):
+            self.potential.log_report()
     
     def takeOneStep(self):
         """one cycle of the routine
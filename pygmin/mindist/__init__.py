@@ -43,6 +43,7 @@ very quickly using the Hungarian algorithm (aka munkres) or shortest augmenting
     find_permutations_munkres
     find_permutations_hungarian
     find_permutations_OPTIM
+    find_permutations_auction
     
 
 rotational + permutational alignment
@@ -94,6 +95,9 @@ Utilities
    :toctree: generated/
 
     PointGroupOrderCluster
+    FingerprintAtomicCluster
+    CompareMinimaFingerprint
+    StructureCache
 
 
 OBSOLETE: translational alignment
@@ -114,3 +118,5 @@ from _minpermdist_policies import *
 from periodic_exact_match import ExactMatchPeriodic
 from _pointgrouporder import *
 from _wrapper_atomiccluster import *
+from _fingerprint import *
+from _structure_cache import *
@@ -0,0 +1,101 @@
+import numpy as np
+
+__all__ = ["FingerprintAtomicCluster", "CompareMinimaFingerprint"]
+
+class FingerprintAtomicCluster(object):
+    ''' cheap permutation invariant fingerprint of an atomic cluster
+
+    The fingerprint is the list of distances of the atoms from the center of
+    mass, sorted within each group of permutable atoms.  It is invariant under
+    translation, rotation, inversion and permutation of identical atoms, so
+    it can be used to reject candidates before doing a full exact match.
+
+    Parameters
+    ----------
+    permlist : optional
+        list of allowed permutations. If nothing is given, all atoms will be
+        considered as permutable.
+    tol : float, optional
+        tolerance of the exact match test this fingerprint is used with.
+
+    Notes
+    -----
+    If two structures are aligned such that |X1 - X2| < tol, then the
+    difference in distance from the center of mass of each atom is
+    bounded by the displacement of that atom.  Sorting within permutable
+    groups can only decrease the distance between the radii vectors, so
+    |fp1 - fp2| < tol as well.  The test in `may_match` therefore never
+    rejects a pair which `ExactMatchCluster` with the same tolerance would
+    accept.
+
+    See also
+    --------
+    ExactMatchCluster
+    '''
+    def __init__(self, permlist=None, tol=0.01):
+        self.permlist = permlist
+        self.tol = tol
+
+    def __call__(self, coords):
+        ''' return the fingerprint of coords '''
+        x = coords.reshape([-1,3])
+        x = x - x.sum(0) / len(x)
+        radii = np.sqrt(np.sum(x*x, axis=1))
+        if self.permlist is None:
+            return np.sort(radii)
+        for atomlist in self.permlist:
+            radii[atomlist] = np.sort(radii[atomlist])
+        return radii
+
+    def may_match(self, fp1, fp2):
+        ''' return False if two structures with these fingerprints cannot be an exact match '''
+        if fp1.shape != fp2.shape:
+            return False
+        return np.linalg.norm(fp1 - fp2) < self.tol
+
+class CompareMinimaFingerprint(object):
+    ''' compare two minima, using a fingerprint to reject candidates early
+
+    The fingerprint of a minimum is computed only once.  For minima which are
+    in the database it is cached by id, otherwise it is stored in the
+    attribute `_fingerprint` of the minimum.  The fingerprints are not saved
+    in the database.  The expensive exact match is only performed if the
+    fingerprints are compatible.
+
+    Parameters
+    ----------
+    compare_exact : callable
+        `bool = compare_exact(coords1, coords2)`
+    fingerprint :
+        fingerprint object, e.g. FingerprintAtomicCluster
+
+    See also
+    --------
+    pygmin.storage.Database, FingerprintAtomicCluster
+    '''
+    def __init__(self, compare_exact, fingerprint):
+        self.compare_exact = compare_exact
+        self.fingerprint = fingerprint
+        self._cache = dict()
+
+    def get_fingerprint(self, m):
+        ''' return the fingerprint of a minimum, computing it if necessary '''
+        mid = getattr(m, "_id", None)
+        if mid is None:
+            fp = getattr(m, "_fingerprint", None)
+            if fp is None:
+                fp = m._fingerprint = self.fingerprint(m.coords)
+            return fp
+        # the energy is part of the key in case the id of a removed minimum
+        # is reused
+        key = (mid, m.energy)
+        fp = self._cache.get(key)
+        if fp is None:
+            fp = self._cache[key] = self.fingerprint(m.coords)
+        return fp
+
+    def __call__(self, m1, m2):
+        if not self.fingerprint.may_match(self.get_fingerprint(m1),
+                                          self.get_fingerprint(m2)):
+            return False
+        return self.compare_exact(m1.coords, m2.coords)
@@ -61,12 +61,34 @@ class MeasurePolicy(object):
     def find_rotation(self, X1, X2):
         ''' find the best rotation matrix to bring structure 2 on 1 '''
         raise NotImplementedError
+    
+    def get_dist_lower_bound(self, X1, X2list):
+        ''' cheap lower bound for the distance after permutational alignment
+        
+        This is optional.  It is used to rank trial orientations without
+        solving the assignment problem for each of them.  X2list is a list 
+        of structures, an array of lower bounds is returned.
+        '''
+        raise NotImplementedError
 
 class TransformAtomicCluster(TransformPolicy):
-    ''' transformation rules for atomic clusters '''
+    ''' transformation rules for atomic clusters 
+    
+    The rotation is done through a preallocated (natoms,3) work buffer, so
+    no temporary arrays are created.  Because of the buffer an instance should
+    not be shared between objects which are used at the same time (e.g. in
+    different threads).  permute returns a new array, as the interface
+    requires.
+    '''
     
     def __init__(self, can_invert=True):
         self._can_invert = can_invert
+        self._work = np.zeros([0,3])
+    
+    def _get_work(self, natoms):
+        if self._work.shape[0] != natoms:
+            self._work = np.zeros([natoms,3])
+        return self._work
         
     def translate(self, X, d):
         Xtmp = X.reshape([-1,3])
@@ -74,23 +96,38 @@ class TransformAtomicCluster(TransformPolicy):
         
     def rotate(self, X, mx,):
         Xtmp = X.reshape([-1,3])
-        Xtmp = np.dot(mx, Xtmp.transpose()).transpose()
-        X[:] = Xtmp.reshape(X.shape)
+        work = self._get_work(Xtmp.shape[0])
+        np.dot(Xtmp, mx.transpose(), out=work)
+        X[:] = work.reshape(X.shape)
         
     def permute(self, X, perm):
-        return X.reshape(-1,3)[perm].flatten()
+        return X.reshape([-1,3]).take(perm, axis=0).reshape(X.shape)
         
     def can_invert(self):
         return self._can_invert
     
     def invert(self, X):
-        X[:] = -X
+        np.negative(X, out=X)
         
 class MeasureAtomicCluster(MeasurePolicy):
-    ''' measure rules for atomic clusters '''
+    ''' measure rules for atomic clusters 
+    
+    Parameters
+    ----------
+    permlist : optional
+        list of allowed permutations
+    permutation_algorithm : callable, optional
+        algorithm to solve the assignment problem, e.g. find_permutations_auction
+    permutation_kwargs : dict, optional
+        extra parameters for the permutation algorithm, e.g. dict(cutoff=2.)
+    '''
     
-    def __init__(self, permlist=None):
+    def __init__(self, permlist=None, permutation_algorithm=None, permutation_kwargs=None):
         self.permlist = permlist
+        self.permutation_algorithm = permutation_algorithm
+        if permutation_kwargs is None:
+            permutation_kwargs = dict()
+        self.permutation_kwargs = permutation_kwargs
     
     def get_com(self, X):
         X = np.reshape(X, [-1,3])
@@ -99,13 +136,39 @@ class MeasureAtomicCluster(MeasurePolicy):
         return com
 
     def get_dist(self, X1, X2):
-        return np.linalg.norm(X1.flatten()-X2.flatten())
+        dx = X1.ravel() - X2.ravel()
+        return np.sqrt(np.dot(dx, dx))
     
     def find_permutation(self, X1, X2):
-        return find_best_permutation(X1, X2, self.permlist)
+        return find_best_permutation(X1, X2, self.permlist, 
+                                     user_algorithm=self.permutation_algorithm,
+                                     **self.permutation_kwargs)
     
     def find_rotation(self, X1, X2):
         dist, mx = findrotation(X1, X2)
         return dist, mx
     
+    def get_dist_lower_bound(self, X1, X2list):
+        # every atom in X1 is assigned to some atom in X2 of the same group, so
+        # the sum over the nearest neighbor distances is a lower bound for
+        # the assignment.  The same is true the other way around.
+        x1 = np.reshape(X1, [-1,3])
+        x2 = np.array([np.reshape(X2, [-1,3]) for X2 in X2list])
+        if self.permlist is None:
+            permlist = [range(len(x1))]
+        else:
+            permlist = self.permlist
+        
+        permutable = np.zeros(len(x1), dtype=bool)
+        dist2 = np.zeros(len(x2))
+        for atomlist in permlist:
+            permutable[atomlist] = True
+            d2 = ((x1[np.newaxis,atomlist,np.newaxis,:] - x2[:,np.newaxis,atomlist,:])**2).sum(-1)
+            dist2 += np.maximum(d2.min(2).sum(1), d2.min(1).sum(1))
+        
+        fixed = np.logical_not(permutable)
+        if fixed.any():
+            dist2 += ((x1[np.newaxis,fixed,:] - x2[:,fixed,:])**2).sum(-1).sum(-1)
+        return np.sqrt(dist2)
+    
     
\ No newline at end of file
@@ -0,0 +1,103 @@
+import numpy as np
+from collections import OrderedDict
+
+__all__ = ["StructureCache"]
+
+class PreprocessedStructure(object):
+    ''' the part of a structure alignment which depends on only one structure
+
+    Attributes
+    ----------
+    x : np.array
+        coordinates with the center of mass at the origin.  This must not be
+        modified
+    com : np.array
+        center of mass of the original coordinates
+    radii : np.array
+        distance of each site from the center of mass
+    order : np.array
+        indices which sort radii
+    '''
+    def __init__(self, x, com, radii):
+        self.x = x
+        self.com = com
+        self.radii = radii
+        self.order = radii.argsort()
+
+class StructureCache(object):
+    ''' cache of preprocessed structures for MinPermDistCluster and ExactMatchCluster
+
+    When the same minimum is compared with many other minima (e.g. in
+    DoubleEndedConnect) the centering and the computation of the radial
+    shells used by StandardClusterAlignment only has to be done once per
+    minimum.
+
+    Parameters
+    ----------
+    max_size : int, optional
+        maximum number of structures to keep.  The least recently used
+        structure is removed if the cache is full.
+
+    Notes
+    -----
+    The keys are the ids of the minima.  The cache assumes that the coordinates
+    for a given id never change, so it must not be shared between different
+    databases.
+
+    Examples
+    --------
+
+    >>> mindist = MinPermDistAtomicCluster(cache=StructureCache())
+    >>> dist, x1, x2 = mindist(m1.coords, m2.coords, id1=m1._id, id2=m2._id)
+
+    See also
+    --------
+    MinPermDistCluster, ExactMatchCluster
+    '''
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self._cache = OrderedDict()
+        self.nhits = 0
+        self.nmisses = 0
+
+    def get(self, key, coords, preprocess):
+        ''' return the preprocessed structure for key, computing it if necessary
+
+        Parameters
+        ----------
+        key : hashable
+            id of the minimum.  If key is None the cache is not used
+        coords : np.array
+            the coordinates of the structure
+        preprocess : callable
+            `s = preprocess(coords)` returns the PreprocessedStructure
+        '''
+        if key is None:
+            return preprocess(coords)
+        try:
+            s = self._cache.pop(key)
+            self.nhits += 1
+        except KeyError:
+            s = preprocess(coords)
+            self.nmisses += 1
+            if len(self._cache) >= self.max_size:
+                self._cache.popitem(last=False)
+        self._cache[key] = s
+        return s
+
+    def remove(self, key):
+        ''' remove a structure from the cache '''
+        self._cache.pop(key, None)
+
+    def clear(self):
+        self._cache.clear()
+
+    def __len__(self):
+        return len(self._cache)
+
+def preprocess_structure(coords, measure, transform, get_radii):
+    ''' center coords and compute the radial shells '''
+    x = np.copy(coords)
+    com = measure.get_com(x)
+    transform.translate(x, -com)
+    return PreprocessedStructure(x, com, get_radii(x))
@@ -13,16 +13,24 @@ class MinPermDistAtomicCluster(MinPermDistCluster):
         considered as permutable. For no permutations give an empty list []
     can_invert : bool, optional
         also test for inversion
+    permutation_algorithm : callable, optional
+        algorithm to solve the assignment problem, e.g.
+        find_permutations_auction.  Default is the best one available
+    permutation_kwargs : dict, optional
+        extra parameters for the permutation algorithm
        
     See also
     --------
     
-    MinPermDistCluster
+    MinPermDistCluster, MeasureAtomicCluster
      
     '''
-    def __init__(self, permlist=None, can_invert=True, **kwargs):
+    def __init__(self, permlist=None, can_invert=True, permutation_algorithm=None,
+                 permutation_kwargs=None, **kwargs):
         transform=TransformAtomicCluster(can_invert=can_invert)
-        measure = MeasureAtomicCluster(permlist=permlist)
+        measure = MeasureAtomicCluster(permlist=permlist,
+                                       permutation_algorithm=permutation_algorithm,
+                                       permutation_kwargs=permutation_kwargs)
         
         MinPermDistCluster.__init__(self, transform=transform, measure=measure, **kwargs)
         
@@ -37,15 +45,23 @@ class ExactMatchAtomicCluster(ExactMatchCluster):
         considered as permutable. For no permutations give an empty list []
     can_invert : bool, optional
         also test for inversion
+    permutation_algorithm : callable, optional
+        algorithm to solve the assignment problem, e.g.
+        find_permutations_auction.  Default is the best one available
+    permutation_kwargs : dict, optional
+        extra parameters for the permutation algorithm
        
     See also
     --------
     
-    ExactMatchCluster
+    ExactMatchCluster, MeasureAtomicCluster
      
     '''
-    def __init__(self, permlist=None, can_invert=True, **kwargs):
+    def __init__(self, permlist=None, can_invert=True, permutation_algorithm=None,
+                 permutation_kwargs=None, **kwargs):
         transform=TransformAtomicCluster(can_invert=can_invert)
-        measure = MeasureAtomicCluster(permlist=permlist)
+        measure = MeasureAtomicCluster(permlist=permlist,
+                                       permutation_algorithm=permutation_algorithm,
+                                       permutation_kwargs=permutation_kwargs)
         
         ExactMatchCluster.__init__(self, transform=transform, measure=measure, **kwargs)
\ No newline at end of file
@@ -1,6 +1,7 @@
 import numpy as np
 from permutational_alignment import find_best_permutation
 from _minpermdist_policies import TransformAtomicCluster, MeasureAtomicCluster
+from _structure_cache import preprocess_structure
 import rmsfit
 
 __all__= ["StandardClusterAlignment", "ExactMatchCluster"]
@@ -31,6 +32,10 @@ class StandardClusterAlignment(object):
         accuracy of shell for atom candidates in standard alignment
     can_invert : boolean
         is an inversion possible?
+    radii1, radii2 : np.array, optional
+        precomputed distances of the atoms from the center
+    order1 : np.array, optional
+        precomputed indices which sort radii1
         
     Examples
     --------
@@ -39,7 +44,8 @@ class StandardClusterAlignment(object):
     >>     print "possible rotation:",rot,"inversion:",invert
     
     '''
-    def __init__(self, coords1, coords2, accuracy = 0.01, can_invert=True):
+    def __init__(self, coords1, coords2, accuracy = 0.01, can_invert=True,
+                 radii1=None, radii2=None, order1=None):
         x1 = coords1.reshape([-1,3]).copy()
         x2 = coords2.reshape([-1,3]).copy()
         
@@ -47,15 +53,24 @@ class StandardClusterAlignment(object):
         self.can_invert = can_invert
         
         # calculate distance of all atoms
-        R1 = np.sqrt(np.sum(x1*x1, axis=1))
-        R2 = np.sqrt(np.sum(x2*x2, axis=1))
+        if radii1 is None:
+            R1 = np.sqrt(np.sum(x1*x1, axis=1))
+        else:
+            R1 = radii1
+        if radii2 is None:
+            R2 = np.sqrt(np.sum(x2*x2, axis=1))
+        else:
+            R2 = radii2
         
         # at least 2 atoms are needed
         # get atom most outer atom
         
         # get 1. reference atom in configuration 1
         # use the atom with biggest distance to com
-        idx_sorted = R1.argsort()
+        if order1 is None:
+            idx_sorted = R1.argsort()
+        else:
+            idx_sorted = order1
         idx1_1 = idx_sorted[-1]
         
         # find second atom which is not in a line
@@ -183,6 +198,10 @@ class ExactMatchCluster(object):
             
         align_com: boolean, optional
             Flag if com should be removed before comparison
+        
+        cache: StructureCache, optional
+            cache for the preprocessed structures.  It is used if the ids
+            of the minima are passed when calling the object.
             
         Examples
         --------
@@ -195,31 +214,59 @@ class ExactMatchCluster(object):
           
     '''
     
-    def __init__(self, tol = 0.01, accuracy=0.01, transform=TransformAtomicCluster(), measure=MeasureAtomicCluster()):
+    def __init__(self, tol = 0.01, accuracy=0.01, transform=None, measure=None,
+                 cache=None):
+        if transform is None:
+            transform = TransformAtomicCluster()
+        if measure is None:
+            measure = MeasureAtomicCluster()
         self.accuracy = accuracy
         self.tol = tol
         self.transform = transform
         self.measure = measure
+        self.cache = cache
         
-    def standard_alignments(self, coords1, coords2):
+    def standard_alignments(self, coords1, coords2, **kwargs):
         return StandardClusterAlignment(coords1, coords2, accuracy = self.accuracy,
-                                   can_invert=self.transform.can_invert())
+                                   can_invert=self.transform.can_invert(), **kwargs)
 
+    def get_radii(self, x):
+        ''' distance from the center for the sites used in the standard alignment '''
+        x = x.reshape([-1,3])
+        return np.sqrt(np.sum(x*x, axis=1))
+    
+    def _preprocess(self, coords):
+        return preprocess_structure(coords, self.measure, self.transform, self.get_radii)
+    
+    def _get_structure(self, coords, key):
+        if self.cache is None:
+            return self._preprocess(coords)
+        return self.cache.get(key, coords, self._preprocess)
         
-    def __call__(self, coords1, coords2):
-        com1 = self.measure.get_com(coords1)
-        x1 = coords1.copy()
-        self.transform.translate(x1, -com1)
+    def __call__(self, coords1, coords2, id1=None, id2=None):
+        ''' return True if the structures are identical
         
-        com2 = self.measure.get_com(coords2)
-        x2 = coords2.copy()
-        self.transform.translate(x2, -com2)
+        id1, id2 are optional keys (e.g. the ids of the minima) for the
+        structure cache
+        '''
+        s1 = self._get_structure(coords1, id1)
+        s2 = self._get_structure(coords2, id2)
+        x1, x2 = s1.x, s2.x
         
-        for rot, invert in self.standard_alignments(x1, x2):
+        for rot, invert in self.standard_alignments(x1, x2, radii1=s1.radii, 
+                                                    radii2=s2.radii, order1=s1.order):
             if self.check_match(x1, x2, rot, invert):
                 return True
         return False
                         
+    def _trial_copy(self, x2):
+        ''' copy x2 into a preallocated work buffer '''
+        buf = getattr(self, "_x2_trial", None)
+        if buf is None or buf.shape != x2.shape:
+            buf = self._x2_trial = np.empty_like(x2)
+        buf[:] = x2
+        return buf
+    
     def check_match(self, x1, x2, rot, invert):
         ''' Make a more detailed comparison if the 2 structures match
         
@@ -236,7 +283,7 @@ class ExactMatchCluster(object):
             
         '''    
         # apply the rotation
-        x2_trial = x2.copy()
+        x2_trial = self._trial_copy(x2)
         if(invert):
             self.transform.invert(x2_trial)
         self.transform.rotate(x2_trial, rot)
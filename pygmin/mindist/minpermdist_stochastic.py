@@ -2,6 +2,7 @@ import numpy as np
 from exact_match import StandardClusterAlignment
 from pygmin.utils import rotations     
 from _minpermdist_policies import TransformAtomicCluster, MeasureAtomicCluster
+from _structure_cache import preprocess_structure
 
 __all__ = ["MinPermDistCluster"]
 
@@ -20,9 +21,19 @@ class MinPermDistCluster(object):
     tol : float, optional
         tolerance for an exact match to stop iterations
     transform : 
-        Transform policy which tells MinpermDist how to transform the given coordinates
+        Transform policy which tells MinpermDist how to transform the given coordinates.
+        Default is a new TransformAtomicCluster
     measure : 
         measure policy which tells minpermdist how to perform certains measures on the coordinates.
+        Default is a new MeasureAtomicCluster
+    niter_exact : int, optional
+        if given, all random rotations (and inversions) are generated at once and ranked by 
+        the cheap lower bound `measure.get_dist_lower_bound`.  The full permutational
+        alignment is only performed for the best niter_exact of them.  If the measure policy
+        does not implement the lower bound, all trials are checked.
+    cache : StructureCache, optional
+        cache for the centered structures and radial shells.  It is used
+        if the ids of the minima are passed when calling the object.
     
     Notes
     -----
@@ -47,6 +58,15 @@ class MinPermDistCluster(object):
         optimize permutations
         align rotation
         check_match
+    
+    With niter_exact the second loop becomes::
+    
+        generate niter random rotations
+        rank them by a permutation free lower bound of the distance
+        for the best niter_exact rotations:
+            optimize permutations
+            align rotation
+            check_match
         
     The minpermdist algorithm is generic and can act on various types of
     coordinates, e.g. carthesian, angle axis, .... The transform and measure
@@ -60,9 +80,15 @@ class MinPermDistCluster(object):
     
     """
     def __init__(self, niter=10, verbose=False, tol=0.01, accuracy=0.01,
-                 measure=MeasureAtomicCluster(), transform=TransformAtomicCluster()):
+                 measure=None, transform=None, niter_exact=None, cache=None):
+        if measure is None:
+            measure = MeasureAtomicCluster()
+        if transform is None:
+            transform = TransformAtomicCluster()
         
         self.niter = niter
+        self.niter_exact = niter_exact
+        self.cache = cache
         
         self.verbose = verbose
         self.measure = measure
@@ -70,9 +96,17 @@ class MinPermDistCluster(object):
         self.accuracy = accuracy
         self.tol = tol
         
+    def _trial_copy(self, x2):
+        ''' copy x2 into a preallocated work buffer '''
+        buf = getattr(self, "_x2_trial", None)
+        if buf is None or buf.shape != x2.shape:
+            buf = self._x2_trial = np.empty_like(x2)
+        buf[:] = x2
+        return buf
+    
     def check_match(self, x1, x2, rot, invert):
         ''' check a given rotation for a match '''
-        x2_trial = x2.copy()
+        x2_trial = self._trial_copy(x2)
         if(invert):
             self.transform.invert(x2_trial)
         self.transform.rotate(x2_trial, rot)
@@ -107,54 +141,101 @@ class MinPermDistCluster(object):
 
         return dist, self.x2_best
 
-    def _standard_alignments(self, x1, x2):
+    def _random_trials(self):
+        ''' return a list of random rotations and inversions to try '''
+        trials = []
+        for i in range(self.niter):
+            rot = rotations.aa2mx(rotations.random_aa())
+            trials.append((rot, False))
+            if(self.transform.can_invert()):
+                trials.append((rot, True))
+        return trials
+    
+    def _rank_trials(self, x1, x2, trials):
+        ''' sort the trials by a lower bound of the distance and keep the best niter_exact '''
+        x2_trials = []
+        for rot, invert in trials:
+            x2_trial = x2.copy()
+            if(invert):
+                self.transform.invert(x2_trial)
+            self.transform.rotate(x2_trial, rot)
+            x2_trials.append(x2_trial)
+        try:
+            bounds = self.measure.get_dist_lower_bound(x1, x2_trials)
+        except NotImplementedError:
+            return trials
+        
+        return [trials[i] for i in np.argsort(bounds)[:self.niter_exact]]
+
+    def _standard_alignments(self, x1, x2, **kwargs):
         ''' get iterator for standard alignments '''
         return StandardClusterAlignment(x1, x2, accuracy=self.accuracy, 
-                                                    can_invert=self.transform.can_invert())
-    def __call__(self, coords1, coords2):        
+                                                    can_invert=self.transform.can_invert(),
+                                                    **kwargs)
+    
+    def get_radii(self, x):
+        ''' distance from the center for the sites used in the standard alignment '''
+        x = x.reshape([-1,3])
+        return np.sqrt(np.sum(x*x, axis=1))
+    
+    def _preprocess(self, coords):
+        return preprocess_structure(coords, self.measure, self.transform, self.get_radii)
+    
+    def _get_structure(self, coords, key):
+        if self.cache is None:
+            return self._preprocess(coords)
+        return self.cache.get(key, coords, self._preprocess)
+
+    def __call__(self, coords1, coords2, id1=None, id2=None):        
         '''
         Parameters
         ----------
         coords1, coords2 : np.array 
             the structures to align.  X2 will be aligned with X1, both
             the center of masses will be shifted to the origin
+        id1, id2 : optional
+            keys for the structure cache, e.g. the ids of the minima
             
         Returns
         -------
         a tripple of (dist, coords1, coords2). coords1 are the unchanged coords1
         and coords2 are brought in best alignment with coords2
     '''
-    # we don't want to change the given coordinates
+    # we don't want to change the given coordinates.  The centered
+    # coordinates may be stored in the cache, so x1 and x2 must not be changed either
         check_inversion = False
-        x1 = np.copy(coords1)
-        x2 = np.copy(coords2)
-    
-        com1 = self.measure.get_com(x1)
-        self.transform.translate(x1, -com1)
-        com2 = self.measure.get_com(x2)
-        self.transform.translate(x2, -com2)
+        s1 = self._get_structure(coords1, id1)
+        s2 = self._get_structure(coords2, id2)
+        x1, x2 = s1.x, s2.x
 
-        self.com_shift = com1
+        self.com_shift = s1.com
         
         self.mxbest = np.identity(3)
         self.distbest = self.measure.get_dist(x1, x2)
         self.x2_best = x2.copy()
         
         if self.distbest < self.tol:
-            return self.distbest, x1, x2
+            return self.distbest, x1.copy(), x2.copy()
         
-        for rot, invert in self._standard_alignments(x1, x2):
+        for rot, invert in self._standard_alignments(x1, x2, radii1=s1.radii, 
+                                                     radii2=s2.radii, order1=s1.order):
             self.check_match(x1, x2, rot, invert)
             if self.distbest < self.tol:
                 dist, x2 = self.finalize_best_match(coords1)
                 return dist, coords1, x2
         
         # if we didn't find a perfect match here, try random rotations to optimize the match
-        for i in range(self.niter):
-            rot = rotations.aa2mx(rotations.random_aa())
-            self.check_match(x1, x2, rot, False)
-            if(self.transform.can_invert()):
-                self.check_match(x1, x2, rot, True)
+        if self.niter_exact is None:
+            for i in range(self.niter):
+                rot = rotations.aa2mx(rotations.random_aa())
+                self.check_match(x1, x2, rot, False)
+                if(self.transform.can_invert()):
+                    self.check_match(x1, x2, rot, True)
+        else:
+            for rot, invert in self._rank_trials(x1, x2, self._random_trials()):
+                self.check_match(x1, x2, rot, invert)
+                if self.distbest < self.tol:
+                    break
 
 #        self.transform.rotate(X2, mxbest)
 #        dist, perm = self.measure.find_permutation(X1, X2)
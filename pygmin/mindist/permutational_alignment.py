@@ -1,10 +1,9 @@
 import numpy as np
-import itertools
 #from munkres import make_cost_matrix
 
 __all__ = ["find_best_permutation", "optimize_permutations",
            "find_permutations_OPTIM", "find_permutations_munkres",
-           "find_permutations_hungarian"] 
+           "find_permutations_hungarian", "find_permutations_auction"] 
 
 have_minperm = False
 have_hungarian = False
@@ -39,8 +38,8 @@ elif have_munkres:
     def _find_permutations(*args, **kwargs):
         return find_permutations_munkres(*args, **kwargs)
 else:
-    raise BaseException("No Hungarian algorithm implementation found!"
-                        "Please compile minperm.f90 or install the hungarian or the munkres package")
+    def _find_permutations(*args, **kwargs):
+        return find_permutations_auction(*args, **kwargs)
 
 
 
@@ -49,11 +48,8 @@ else:
 def permuteArray(Xold, perm):
     #don't modify Xold
     Xnew = np.copy(Xold)
-    permsorted = sorted(perm)
-    for (iold, inew) in itertools.izip(permsorted, perm):
-        #print iold, "->", inew
-        Xnew[inew*3:inew*3+3] = Xold[iold*3:iold*3+3]
-
+    permsorted = np.sort(perm)
+    Xnew.reshape([-1,3])[perm] = Xold.reshape([-1,3])[permsorted]
     return Xnew
 
 
@@ -189,6 +185,172 @@ def find_permutations_OPTIM(X1, X2, box_lengths=None, make_cost_matrix=None):
     return dist, perm
 
 
+def _auction(cost, cand, eps_final, max_iter):
+    """
+    solve the assignment problem with the auction algorithm of Bertsekas
+    
+    cost[i,k] is the cost of assigning person i to object cand[i,k].  Missing
+    entries have infinite cost.  All unassigned persons bid at the same time
+    (Jacobi auction) and epsilon scaling is used.  The total cost is within
+    n*eps_final of the optimum.
+    
+    returns the object assigned to each person, or None if no assignment
+    was found in max_iter bidding rounds (e.g. because the sparse problem
+    has no feasible solution)
+    """
+    n, k = cost.shape
+    finite = np.isfinite(cost)
+    scale = cost[finite].max() - cost[finite].min() + eps_final
+    benefit = np.where(finite, -cost, -np.inf)
+    prices = np.zeros(n)
+    # an object which is the only option of a person costs at most this much
+    max_increment = (n + 1) * scale
+    
+    eps = max(scale / 4., eps_final)
+    niter = 0
+    while True:
+        assignment = -np.ones(n, dtype=int)
+        owner = -np.ones(n, dtype=int)
+        unassigned = np.arange(n)
+        while len(unassigned) > 0:
+            niter += 1
+            if niter > max_iter:
+                return None
+            
+            # find the best and second best object for each bidder
+            values = benefit[unassigned] - prices[cand[unassigned]]
+            if k > 1:
+                part = np.argpartition(-values, 1, axis=1)
+                rows = np.arange(len(unassigned))
+                ibest = part[:,0]
+                best = values[rows, ibest]
+                second = values[rows, part[:,1]]
+            else:
+                ibest = np.zeros(len(unassigned), dtype=int)
+                best = values[:,0]
+                second = -np.inf * np.ones(len(unassigned))
+            if not np.all(np.isfinite(best)):
+                return None
+            increment = np.minimum(best - second, max_increment) + eps
+            objects = cand[unassigned, ibest]
+            bids = prices[objects] + increment
+            
+            # each object goes to the highest bidder
+            order = np.lexsort((bids, objects))
+            last = np.ones(len(order), dtype=bool)
+            last[:-1] = objects[order[1:]] != objects[order[:-1]]
+            winners = unassigned[order[last]]
+            won = objects[order[last]]
+            
+            losers = owner[won]
+            assignment[losers[losers >= 0]] = -1
+            owner[won] = winners
+            assignment[winners] = won
+            prices[won] = bids[order[last]]
+            unassigned = np.where(assignment < 0)[0]
+
+        if eps <= eps_final:
+            return assignment
+        eps = max(eps / 4., eps_final)
+
+def find_permutations_auction(X1, X2, cutoff=None, box_lengths=None, eps=None,
+                              max_iter=None, make_cost_matrix=None):
+    """
+    find the best permutation of the atoms in X2 with a sparse auction algorithm
+    
+    The positions must already be reshaped to reflect the dimensionality of the system!
+    
+    Parameters
+    ----------
+    X1, X2 : 
+        the structures to align
+    cutoff : float, optional
+        only atoms closer than cutoff are considered for the assignment.  This 
+        makes the cost matrix sparse, which saves memory and time for large 
+        groups of permutable atoms.  If no assignment can be found within the
+        cutoff, the full cost matrix is used.  Default is to use the full cost
+        matrix.
+    box_lengths : float array, optional
+        box lengths for periodic boundary conditions
+    eps : float, optional
+        final bid increment.  The squared distance is within natoms*eps of 
+        the optimum.
+    max_iter : int, optional
+        maximum number of bidding rounds with the sparse cost matrix before
+        falling back to the full cost matrix.  If no perfect assignment 
+        exists within the cutoff the prices grow without bound, so this
+        should not be too large.
+    
+    Notes
+    -----
+    With a cutoff, the assignment is optimal only among the pairs within the
+    cutoff, which can be worse than the true optimum (by a few percent if the 
+    cutoff is close to the typical displacement).
+    
+    The auction algorithm (Bertsekas, Ann. Oper. Res. 14, 105 (1988)) only needs
+    numpy and scipy.  It is used if neither minperm.f90 nor the hungarian or 
+    munkres packages are available.  It is not a replacement for 
+    find_permutations_OPTIM, which is faster for all sizes: for 1000 atoms it
+    takes about 0.015 s for nearly matching structures (auction with cutoff 1:
+    0.017 s) and 0.08 s for unrelated ones (auction: 0.2 - 1 s).
+    
+    http://en.wikipedia.org/wiki/Auction_algorithm
+    """
+    if make_cost_matrix is not _make_cost_matrix and make_cost_matrix is not None:
+        raise RuntimeError("cannot use a custom cost matrix with find_permutations_auction")
+    
+    X1 = np.asarray(X1, dtype=float)
+    X2 = np.asarray(X2, dtype=float)
+    n = len(X1)
+    if max_iter is None:
+        max_iter = 10 * n + 1000
+    
+    if box_lengths is not None:
+        box_lengths = np.asarray(box_lengths, dtype=float)
+        X1 = X1 - np.floor(X1 / box_lengths) * box_lengths
+        X2 = X2 - np.floor(X2 / box_lengths) * box_lengths
+    
+    if cutoff is not None and cutoff > 0 and n > 1:
+        from scipy.spatial import cKDTree
+        if box_lengths is None:
+            tree = cKDTree(X2)
+        else:
+            tree = cKDTree(X2, boxsize=box_lengths)
+        neighbors = tree.query_ball_point(X1, cutoff)
+        nmax = max(len(nb) for nb in neighbors)
+        if min(len(nb) for nb in neighbors) > 0:
+            cand = np.zeros([n, nmax], dtype=int)
+            mask = np.zeros([n, nmax], dtype=bool)
+            for i, nb in enumerate(neighbors):
+                cand[i,:len(nb)] = nb
+                mask[i,:len(nb)] = True
+            dx = X1[:,np.newaxis,:] - X2[cand]
+            if box_lengths is not None:
+                dx -= np.round(dx / box_lengths) * box_lengths
+            cost = np.where(mask, (dx**2).sum(2), np.inf)
+            if eps is None:
+                eps = 1e-9 * cutoff**2 / n
+            assignment = _auction(cost, cand, eps, max_iter)
+            if assignment is not None:
+                dist = np.sqrt(np.sum((dx**2).sum(2)[np.arange(n), 
+                                      np.argmax(cand == assignment[:,np.newaxis], axis=1)]))
+                return dist, assignment
+    
+    # use the full cost matrix
+    dx = X1[:,np.newaxis,:] - X2[np.newaxis,:,:]
+    if box_lengths is not None:
+        dx -= np.round(dx / box_lengths) * box_lengths
+    cost = (dx**2).sum(2)
+    cand = np.tile(np.arange(n), (n,1))
+    if eps is None:
+        eps = 1e-9 * (cost.max() + 1e-300) / n
+    assignment = _auction(cost, cand, eps, 1000 * n + 1000)
+    if assignment is None:
+        raise RuntimeError("auction algorithm did not converge")
+    dist = np.sqrt(cost[np.arange(n), assignment].sum())
+    return dist, assignment
+
+
 def find_best_permutation(X1, X2, permlist=None, user_algorithm=None, 
                             reshape=True, user_cost_matrix=_make_cost_matrix, 
                             **kwargs):
@@ -241,6 +403,9 @@ def find_best_permutation(X1, X2, permlist=None, user_algorithm=None,
     
     hungarian : c++ code wrapped in python.  scales roughly like natoms**2.5
     
+    find_permutations_auction : numpy / scipy only.  It is the fallback if 
+    none of the others are available
+    
     munkres : completely in python. scales roughly like natoms**3.  very slow for natoms > 10
     
     in addition we have wrapped the OPTIM version for use in pygmin.  It uses the sparse 
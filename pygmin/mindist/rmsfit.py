@@ -56,11 +56,8 @@ def findrotation_kearsley(coords1, coords2, align_com=True):
         raise BaseException("dimension of arrays does not match")
     
     # reshape the arrays
-    x1 = coords1.flatten()
-    x2 = coords2.flatten()
-    
-    x1 = x1.reshape([-1,3])
-    x2 = x2.reshape([-1,3])
+    x1 = coords1.reshape([-1,3])
+    x2 = coords2.reshape([-1,3])
 #    
 #    # determine number of atoms
     natoms = x1.shape[0]
@@ -69,36 +66,27 @@ def findrotation_kearsley(coords1, coords2, align_com=True):
     if(align_com):
         com1 = np.sum(x1,axis=0) / float(natoms)
         com2 = np.sum(x2,axis=0) / float(natoms)
-        x1 = x1.copy() - com1
-        x2 = x2.copy() - com2
+        x1 = x1 - com1
+        x2 = x2 - com2
 
-    x1 = x1.flatten() 
-    x2 = x2.flatten()
-    
-    # TODO: this is very dirty!
     #########################################
     #Create matrix QMAT
     #########################################
 
+    XM, YM, ZM = (x1 - x2).transpose()
+    XP, YP, ZP = (x1 + x2).transpose()
+
     QMAT = np.zeros([4,4], np.float64)
-    for J1 in xrange(natoms):
-        J2 = 3*(J1) -1
-        XM = x1[J2+1] - x2[J2+1]
-        YM = x1[J2+2] - x2[J2+2]
-        ZM = x1[J2+3] - x2[J2+3]
-        XP = x1[J2+1] + x2[J2+1]
-        YP = x1[J2+2] + x2[J2+2]
-        ZP = x1[J2+3] + x2[J2+3]
-        QMAT[0,0] = QMAT[0,0] + XM**2 + YM**2 + ZM**2
-        QMAT[0,1] = QMAT[0,1] - YP*ZM + YM*ZP
-        QMAT[0,2] = QMAT[0,2] - XM*ZP + XP*ZM
-        QMAT[0,3] = QMAT[0,3] - XP*YM + XM*YP
-        QMAT[1,1] = QMAT[1,1] + YP**2 + ZP**2 + XM**2
-        QMAT[1,2] = QMAT[1,2] + XM*YM - XP*YP
-        QMAT[1,3] = QMAT[1,3] + XM*ZM - XP*ZP
-        QMAT[2,2] = QMAT[2,2] + XP**2 + ZP**2 + YM**2
-        QMAT[2,3] = QMAT[2,3] + YM*ZM - YP*ZP
-        QMAT[3,3] = QMAT[3,3] + XP**2 + YP**2 + ZM**2
+    QMAT[0,0] = np.dot(XM, XM) + np.dot(YM, YM) + np.dot(ZM, ZM)
+    QMAT[0,1] = - np.dot(YP, ZM) + np.dot(YM, ZP)
+    QMAT[0,2] = - np.dot(XM, ZP) + np.dot(XP, ZM)
+    QMAT[0,3] = - np.dot(XP, YM) + np.dot(XM, YP)
+    QMAT[1,1] = np.dot(YP, YP) + np.dot(ZP, ZP) + np.dot(XM, XM)
+    QMAT[1,2] = np.dot(XM, YM) - np.dot(XP, YP)
+    QMAT[1,3] = np.dot(XM, ZM) - np.dot(XP, ZP)
+    QMAT[2,2] = np.dot(XP, XP) + np.dot(ZP, ZP) + np.dot(YM, YM)
+    QMAT[2,3] = np.dot(YM, ZM) - np.dot(YP, ZP)
+    QMAT[3,3] = np.dot(XP, XP) + np.dot(YP, YP) + np.dot(ZM, ZM)
 
     QMAT[1,0] = QMAT[0,1]
     QMAT[2,0] = QMAT[0,2]
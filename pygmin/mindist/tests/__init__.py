@@ -1,2 +1,3 @@
 from minpermdist_stochastic_test import *
 from permutational_alignment_test import *
+from fingerprint_test import *
@@ -0,0 +1,84 @@
+import unittest
+import numpy as np
+from pygmin.mindist import FingerprintAtomicCluster, ExactMatchAtomicCluster, \
+    CompareMinimaFingerprint
+from pygmin.mindist.permutational_alignment import permuteArray
+from pygmin.utils import rotations
+
+class TestFingerprint(unittest.TestCase):
+    def setUp(self):
+        self.natoms = 13
+        self.permlist = [range(8), range(8, self.natoms)]
+        self.fingerprint = FingerprintAtomicCluster(permlist=self.permlist)
+        self.X1 = np.random.uniform(-1, 1, 3*self.natoms)
+    
+    def get_isomer(self, X):
+        mx = rotations.aa2mx(rotations.random_aa())
+        X2 = -np.dot(mx, X.reshape([-1,3]).transpose()).transpose().flatten()
+        X2 += 1.
+        for atomlist in self.permlist:
+            perm = list(atomlist)
+            np.random.shuffle(perm)
+            X2 = permuteArray(X2, perm)
+        return X2
+    
+    def test_isomer(self):
+        X2 = self.get_isomer(self.X1)
+        fp1 = self.fingerprint(self.X1)
+        fp2 = self.fingerprint(X2)
+        self.assertTrue(self.fingerprint.may_match(fp1, fp2))
+
+    def test_different(self):
+        X2 = np.random.uniform(-1, 1, 3*self.natoms)
+        fp1 = self.fingerprint(self.X1)
+        fp2 = self.fingerprint(X2)
+        self.assertFalse(self.fingerprint.may_match(fp1, fp2))
+    
+    def test_compare_minima(self):
+        class Min(object):
+            def __init__(self, coords):
+                self.coords = coords
+        compare = CompareMinimaFingerprint(ExactMatchAtomicCluster(permlist=self.permlist), 
+                                           self.fingerprint)
+        m1 = Min(self.X1)
+        m2 = Min(self.get_isomer(self.X1))
+        m3 = Min(np.random.uniform(-1, 1, 3*self.natoms))
+        self.assertTrue(compare(m1, m2))
+        self.assertFalse(compare(m1, m3))
+        self.assertIsNotNone(m1._fingerprint)
+        self.assertIsNotNone(m3._fingerprint)
+
+class TestSystemFingerprint(unittest.TestCase):
+    def test_tolerance(self):
+        from pygmin.systems import LJCluster
+        system = LJCluster(13)
+        fingerprint = system.get_fingerprint(ExactMatchAtomicCluster(tol=0.5))
+        self.assertEqual(fingerprint.tol, 0.5)
+
+    def test_periodic(self):
+        from pygmin.potentials.maxneib_blj import MaxNeibsBLJSystem
+        system = MaxNeibsBLJSystem(20, boxl=5.)
+        self.assertIsNone(system.get_fingerprint())
+        # a periodically shifted copy is a duplicate
+        db = system.create_database()
+        x = np.random.uniform(0, 5., 3 * 20)
+        m1 = db.addMinimum(-1., x)
+        m2 = db.addMinimum(-1., x + 2.5)
+        self.assertEqual(m1, m2)
+        self.assertEqual(len(db.minima()), 1)
+
+    def test_database(self):
+        from pygmin.systems import LJCluster
+        system = LJCluster(13)
+        db = system.create_database()
+        x = np.random.uniform(-1, 1, 3 * 13)
+        mx = rotations.aa2mx(rotations.random_aa())
+        x2 = np.dot(x.reshape(-1, 3), mx.transpose()).flatten()
+        m1 = db.addMinimum(-1., x)
+        m3 = db.addMinimum(-1., np.random.uniform(-1, 1, 3 * 13))
+        m2 = db.addMinimum(-1., x2)
+        self.assertEqual(m1, m2)
+        self.assertNotEqual(m1, m3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -31,6 +31,49 @@ class TestMinPermDistStochastic_BLJ(TestMinDist):
 
         self.runtest(X1, X2, MinPermDistCluster(measure=MeasureAtomicCluster(permlist=self.permlist)))
 
+    def testBLJ_batched(self):
+        X1 = np.copy(self.X1)
+        X2 = np.random.uniform(-1,1,[self.natoms*3])*(float(self.natoms))**(1./3)/2
+        ret = mylbfgs(X2, self.pot)
+        X2 = ret.coords
+
+        self.runtest(X1, X2, MinPermDistCluster(measure=MeasureAtomicCluster(permlist=self.permlist),
+                                                niter_exact=4))
+
+    def testBLJ_cache(self):
+        from pygmin.mindist import StructureCache
+        X1 = np.copy(self.X1)
+        X2 = np.random.uniform(-1,1,[self.natoms*3])*(float(self.natoms))**(1./3)/2
+        ret = mylbfgs(X2, self.pot)
+        X2 = ret.coords
+        
+        cache = StructureCache()
+        mindist = MinPermDistCluster(measure=MeasureAtomicCluster(permlist=self.permlist),
+                                     cache=cache)
+        mindist(X1, X2, id1=1, id2=2)
+        self.assertEqual(len(cache), 2)
+        self.runtest(X1, X2, lambda x1, x2: mindist(x1, x2, id1=1, id2=2))
+        self.assertEqual(cache.nhits, 2)
+        self.assertEqual(cache.nmisses, 2)
+
+    def test_lower_bound(self):
+        from pygmin.mindist import find_best_permutation
+        measure = MeasureAtomicCluster(permlist=self.permlist)
+        X2list = [np.random.uniform(-1,1,[self.natoms*3]) for i in range(5)]
+        bounds = measure.get_dist_lower_bound(self.X1, X2list)
+        for X2, bound in zip(X2list, bounds):
+            dist, perm = find_best_permutation(self.X1, X2, self.permlist)
+            X2 = X2.reshape(-1,3)[perm].flatten()
+            self.assertLessEqual(bound, np.linalg.norm(self.X1 - X2) + 1e-10)
+
+    def test_independent_policies(self):
+        # the default policies hold work buffers, so they must not be shared
+        from pygmin.mindist import ExactMatchCluster
+        m1, m2 = MinPermDistCluster(), MinPermDistCluster()
+        self.assertIsNot(m1.transform, m2.transform)
+        self.assertIsNot(m1.measure, m2.measure)
+        e1, e2 = ExactMatchCluster(), ExactMatchCluster()
+        self.assertIsNot(e1.transform, e2.transform)
 
     def testBLJ_isomer(self):
         """
@@ -1,7 +1,8 @@
 import unittest
 import numpy as np
 from pygmin.mindist.permutational_alignment import *
-from pygmin.mindist.permutational_alignment import  find_permutations_munkres, find_permutations_OPTIM
+from pygmin.mindist.permutational_alignment import  find_permutations_munkres, find_permutations_OPTIM, \
+    find_permutations_auction
 
 
 class PermutationTest(unittest.TestCase):
@@ -59,6 +60,52 @@ class PermutationTestBinary(unittest.TestCase):
         self.assertAlmostEqual(np.linalg.norm(coords1 - self.coords), 0.)
         self.assertAlmostEqual(np.linalg.norm(coords2[perm] - self.coords), 0.)
 
+
+class PermutationTestAuction(unittest.TestCase):
+    def setUp(self):
+        self.natoms = 100
+        self.X1 = np.random.uniform(0, 5, [self.natoms, 3])
+        self.perm = np.random.permutation(self.natoms)
+        self.X2 = self.X1[self.perm] + np.random.normal(0, 0.05, [self.natoms, 3])
+    
+    def check(self, **kwargs):
+        dist, perm = find_permutations_auction(self.X1, self.X2, **kwargs)
+        dist_optim, perm_optim = find_permutations_OPTIM(self.X1, self.X2)
+        dist_calc = np.linalg.norm(self.X1 - self.X2[perm])
+        self.assertAlmostEqual(dist, dist_calc, 6)
+        self.assertAlmostEqual(dist, np.linalg.norm(self.X1 - self.X2[perm_optim]), 6)
+        self.assertItemsEqual(perm, range(self.natoms))
+
+    def test_dense(self):
+        self.check()
+    
+    def test_sparse(self):
+        self.check(cutoff=1.)
+    
+    def test_sparse_infeasible(self):
+        # no neighbors within the cutoff, must fall back to the full cost matrix
+        self.check(cutoff=1e-3)
+    
+    def test_find_best_permutation(self):
+        permlist = [range(50), range(50, self.natoms)]
+        self.X2 = self.X1.copy()
+        for atomlist in permlist:
+            self.X2[atomlist] = self.X1[np.random.permutation(atomlist)]
+        dist, perm = find_best_permutation(self.X1, self.X2, permlist, 
+                                           user_algorithm=find_permutations_auction, 
+                                           cutoff=1.)
+        self.assertAlmostEqual(np.linalg.norm(self.X1 - self.X2[perm]), 0.)
+
+    def test_minpermdist(self):
+        from pygmin.mindist import MinPermDistAtomicCluster
+        mindist = MinPermDistAtomicCluster(permutation_algorithm=find_permutations_auction,
+                                           permutation_kwargs=dict(cutoff=1.))
+        self.assertIs(mindist.measure.permutation_algorithm, find_permutations_auction)
+        dist, perm = mindist.measure.find_permutation(self.X1.flatten(), self.X2.flatten())
+        dist_optim, perm_optim = find_permutations_OPTIM(self.X1, self.X2)
+        self.assertAlmostEqual(np.linalg.norm(self.X1 - self.X2[perm]),
+                               np.linalg.norm(self.X1 - self.X2[perm_optim]), 6)
+
         
 if __name__ == "__main__":
     unittest.main()
@@ -45,7 +45,8 @@ most lbfgs routines in that the don't use a line search.  Instead, both
 the step size and direction returned by the lbfgs routine are accepted subject
 to a constraint on the energy change.  If the energy rises more than a given amount then the 
 step size is reduce until the condition is satisfied.  Note: this is what makes
-lbfgs potentially fail with non-Hamiltonian systems.
+lbfgs potentially fail with non-Hamiltonian systems.  Alternatively a line search
+satisfying the strong Wolfe conditions can be used (``linesearch="wolfe"``).
 
 .. autosummary::
    :toctree: generated/
@@ -55,6 +56,22 @@ lbfgs potentially fail with non-Hamiltonian systems.
    MYLBFGS
    mylbfgs
    lbfgs_scipy
+   BatchLBFGS
+   lbfgs_batch
+
+Preconditioners
+---------------
+preconditioners for LBFGS (the `preconditioner` parameter).  They replace the
+scalar initial guess for the inverse Hessian by a matrix which captures the
+different stiffness of the coordinates.
+
+.. autosummary::
+    :toctree: generated/
+    
+    Preconditioner
+    DiagonalPreconditioner
+    MetricTensorPreconditioner
+    ExpPreconditioner
 
 Fire
 ----
@@ -63,6 +80,23 @@ Fire
     
     Fire
     fire
+    Fire2
+    fire2
+
+
+Instrumentation
+---------------
+The optimizers accept a list of events which are called after every
+iteration.  These tools reduce the cost of events and measure where the
+time of an optimization goes (the `instrumentation` parameter of LBFGS,
+MYLBFGS, Fire and Fire2).  Without an Instrumentation object the optimizers
+do no timing at all.
+
+.. autosummary::
+    :toctree: generated/
+    
+    ThrottledEvent
+    Instrumentation
 
 
 Other routines
@@ -83,7 +117,10 @@ These are not used very often and may be buggy.
 """
 
 from result import *
+from _instrumentation import *
+from _preconditioners import *
 from _lbfgs_py import *
 from _mylbfgs import *
+from _lbfgs_batch import *
 from _fire import *
 from _quench import *
@@ -9,8 +9,13 @@ import math
 import logging
 
 from pygmin.optimize import Result
+from _instrumentation import ThrottledEvent
+try:
+    from _fire_kernel import fire2_step as _fire2_step_compiled
+except ImportError:
+    _fire2_step_compiled = None
 
-__all__ = ["Fire"]
+__all__ = ["Fire", "Fire2"]
 
 _logger = logging.getLogger("pygmin.optimize")
 
@@ -68,7 +73,12 @@ class Fire(object):
             1. `coords`
             2. `energy`
             3. `rms`
-        
+
+        See ThrottledEvent for calling an event less often
+    instrumentation : Instrumentation object
+        if given, the number of iterations, gradient evaluations and event
+        calls are counted and the time spent in the phases "potential",
+        "step" and "events" is recorded
             
     
     
@@ -91,7 +101,8 @@ class Fire(object):
     def __init__(self, coords, potential, restart=None, logfile='-', trajectory=None,
                  dt=0.1, maxstep=0.5, dtmax=1., Nmin=5, finc=1.1, fdec=0.5,
                  astart=0.1, fa=0.99, a=0.1, iprint=-1,
-                 alternate_stop_criterion=None, events=None, logger=None):
+                 alternate_stop_criterion=None, events=None, logger=None,
+                 instrumentation=None):
         #Optimizer.__init__(self, atoms, restart, logfile, trajectory)
 
         self.dt = dt
@@ -118,9 +129,16 @@ class Fire(object):
             self.events = []
         else:
             self.events = events
+        self.instrumentation = instrumentation
         
     def initialize(self):
         self.v = None
+    
+    def attachEvent(self, event, frequency=1):
+        """add an event, to be called every frequency iterations"""
+        if frequency > 1:
+            event = ThrottledEvent(event, frequency)
+        self.events.append(event)
         
     def step(self,f):
         coords = self.coords
@@ -163,8 +181,14 @@ class Fire(object):
         step = 0
         res = Result()
         res.success = False
+        instr = self.instrumentation
         while step < steps:
+            if instr is not None:
+                t0 = instr.clock()
             E, f = self.potential.getEnergyGradient(self.coords)
+            if instr is not None:
+                t0 = instr.lap("potential", t0)
+                instr.count("getEnergyGradient")
             #self.call_observers()
             #print E
             if self.alternate_stop_criterion is None:
@@ -177,15 +201,23 @@ class Fire(object):
                 break
             self.step(-f)
             self.nsteps += 1
+            if instr is not None:
+                t0 = instr.lap("step", t0)
             rms = np.linalg.norm(f)/np.sqrt(len(f))
             if self.iprint > 0:
                 if step % self.iprint == 0:
                     self.logger.info("fire: %s E %s rms %s", step, E, rms)
-            for event in self.events:
-                event(coords=self.coords, energy=E, rms=rms)
+            if self.events:
+                for event in self.events:
+                    event(coords=self.coords, energy=E, rms=rms)
+                if instr is not None:
+                    instr.lap("events", t0)
+                    instr.count("events", len(self.events))
 
             step += 1
             
+        if instr is not None:
+            instr.count("iterations", step)
         res.nsteps = step
         res.nfev = step
         res.coords = self.coords
@@ -212,6 +244,276 @@ class Fire(object):
         return np.linalg.norm(forces)/math.sqrt(len(forces)) < self.fmax
 
 
+class Fire2(object):
+    """
+    FIRE 2.0 with per-atom step limiting, for one or many structures
+
+    This is a gradient only minimizer.  The energy is computed for the output
+    only, so it is suited to non-Hamiltonian systems like the NEB.  Compared
+    to Fire:
+
+    1. All work arrays are allocated once and updated in place.
+    2. The step of each atom (each group of `atom_dim` coordinates) is
+       limited to maxstep separately, rather than scaling the whole step by
+       the largest component.
+    3. The FIRE 2.0 modifications: semi-implicit Euler integration, an
+       inertia correction (move back half a step when the power F.v becomes
+       negative), a minimum time step, and optionally no decrease of the
+       time step during the first Ndelay steps.
+
+    If coords is a two dimensional array of shape (K, N) the K structures
+    are minimized together in lockstep.  The time step and mixing parameter
+    are kept separately for each structure, the gradients are computed with
+    pot.getEnergyGradientBatch() if the potential has it, and converged
+    structures are removed from the batch.
+
+    Parameters
+    ----------
+    coords : array
+        the starting configuration, or an array of shape (K, N) of starting
+        configurations
+    potential :
+        the potential object
+    dt, dtmax, dtmin : float
+        the initial, maximum and minimum time step.  The step limiting
+        does not prevent the dynamics from becoming unstable, so dt
+        should be small enough for the stiffest modes during the first
+        Ndelay steps
+    maxstep : float
+        the maximum displacement of an atom in one step
+    Nmin : int
+        the number of steps with positive power before dt is increased
+    Ndelay : int
+        dt is not decreased during the first Ndelay steps.  This is off by
+        default, because it lets bad starting structures (e.g. interpolated
+        NEB bands) blow up
+    finc, fdec : float
+        the factors by which dt is increased and decreased
+    astart, fa : float
+        the initial mixing parameter and the factor by which it decreases
+    atom_dim : int
+        the number of coordinates per atom.  The step size is limited for
+        each atom.  If the number of coordinates is not a multiple of
+        atom_dim each coordinate is limited separately
+    iprint : int
+        how often to print status information
+    events : list of callables
+        these are called after each iteration with keywords coords, energy
+        and rms.  They are only used for a single structure.  See
+        ThrottledEvent for calling an event less often
+    instrumentation : Instrumentation object
+        if given, the number of iterations, gradient evaluations and event
+        calls are counted and the time spent in the phases "potential",
+        "step" and "events" is recorded
+    compiled : bool
+        if True the step is computed with the compiled kernel
+        (_fire_kernel.f90) if it is available.  Otherwise the numpy
+        implementation is used.  Both give the same steps.
+    logger : logger object
+        messages will be passed to this logger rather than the default
+
+    Notes
+    -----
+    J. Guenole, W. G. Noehring, A. Vaid, F. Houlle, Z. Xie, A. Prakash and
+    E. Bitzek, "Assessment and optimization of the fast inertial relaxation
+    engine (FIRE) for energy minimization in atomistic simulations and its
+    implementation in LAMMPS", Comput. Mater. Sci. 175, 109584 (2020)
+    http://dx.doi.org/10.1016/j.commatsci.2020.109584
+
+    See Also
+    --------
+    Fire
+    fire2 : a function wrapper
+    """
+    def __init__(self, coords, potential, dt=0.05, dtmax=1., dtmin=1e-3, maxstep=0.5,
+                 Nmin=5, Ndelay=0, finc=1.1, fdec=0.5, astart=0.1, fa=0.99,
+                 atom_dim=3, iprint=-1, events=None, logger=None, compiled=True,
+                 instrumentation=None):
+        coords = np.array(coords, dtype=float)
+        self.batch = coords.ndim == 2
+        self.X = coords.reshape(-1, coords.shape[-1]).copy()
+        self.potential = potential
+        self.dtmax = dtmax
+        self.dtmin = dtmin
+        self.maxstep = maxstep
+        self.Nmin = Nmin
+        self.Ndelay = Ndelay
+        self.finc = finc
+        self.fdec = fdec
+        self.astart = astart
+        self.fa = fa
+        self.iprint = iprint
+        if events is None:
+            self.events = []
+        else:
+            self.events = events
+        if logger is None:
+            self.logger = _logger
+        else:
+            self.logger = logger
+        self.instrumentation = instrumentation
+
+        K, N = self.X.shape
+        self.N = N
+        if N % atom_dim != 0:
+            atom_dim = 1
+        self.atom_dim = atom_dim
+
+        # the state of each structure.  The arrays are compacted when
+        # structures are removed from the batch
+        self.index = np.arange(K)
+        self.v = np.zeros([K, N])
+        self.dt = np.ones(K) * dt
+        self.a = np.ones(K) * astart
+        self.Npos = np.zeros(K, dtype=np.int32)
+        self.nfev = np.zeros(K, dtype=int)
+        self._dr = np.zeros([K, N])  # work space for the step
+        self.results = [None] * K
+        
+        if compiled:
+            self._kernel = _fire2_step_compiled
+        else:
+            self._kernel = None
+
+    def _getEnergyGradient(self, X):
+        """return the energies and gradients of all rows of X"""
+        if len(X) > 1 and hasattr(self.potential, "getEnergyGradientBatch"):
+            return self.potential.getEnergyGradientBatch(X)
+        E = np.zeros(len(X))
+        G = np.zeros(X.shape)
+        for i in xrange(len(X)):
+            E[i], G[i,:] = self.potential.getEnergyGradient(X[i])
+        return E, G
+
+    def step(self, X, F, nstep):
+        """take one FIRE 2.0 step.  X is updated in place"""
+        if self._kernel is not None:
+            # the (K, N) arrays are passed transposed, as (N, K) arrays in
+            # Fortran order
+            self._kernel(X.T, self.v.T, F.T, self.dt, self.a, self.Npos, nstep,
+                         self.dtmax, self.dtmin, self.maxstep, self.Nmin,
+                         self.Ndelay, self.finc, self.fdec, self.astart,
+                         self.fa, self.atom_dim)
+            return
+        v = self.v
+        P = np.einsum("ij,ij->i", F, v)
+        uphill = P <= 0.
+        downhill = ~uphill
+
+        # adapt the time step and the mixing parameter
+        self.Npos[downhill] += 1
+        self.Npos[uphill] = 0
+        accelerate = downhill & (self.Npos > self.Nmin)
+        self.dt[accelerate] = np.minimum(self.dt[accelerate] * self.finc, self.dtmax)
+        self.a[accelerate] *= self.fa
+        if uphill.any():
+            if nstep >= self.Ndelay:
+                self.dt[uphill] = np.maximum(self.dt[uphill] * self.fdec, self.dtmin)
+                self.a[uphill] = self.astart
+            # the inertia correction: go back half a step and stop
+            X[uphill] -= 0.5 * self.dt[uphill,np.newaxis] * v[uphill]
+            v[uphill] = 0.
+
+        # semi-implicit Euler step with velocity mixing
+        dt = self.dt[:,np.newaxis]
+        v += dt * F
+        if downhill.any():
+            vnorm = np.sqrt(np.einsum("ij,ij->i", v, v))
+            fnorm = np.sqrt(np.einsum("ij,ij->i", F, F))
+            fnorm[fnorm == 0.] = 1.
+            mix = np.where(downhill, self.a, 0.)[:,np.newaxis]
+            v *= 1. - mix
+            v += (mix * (vnorm / fnorm)[:,np.newaxis]) * F
+
+        # limit the step of each atom to maxstep.  The velocity is scaled
+        # as well, otherwise atoms with a large initial force keep moving
+        # at maxstep per step and can leave the cluster
+        K = len(X)
+        dr = np.multiply(dt, v, out=self._dr[:K])
+        dr3 = dr.reshape(K, -1, self.atom_dim)
+        drnorm = np.sqrt(np.sum(dr3**2, axis=2))
+        big = drnorm > self.maxstep
+        if big.any():
+            scale = (self.maxstep / drnorm[big])[:,np.newaxis]
+            dr3[big] *= scale
+            v.reshape(K, -1, self.atom_dim)[big] *= scale
+        X += dr
+
+    def _retire(self, done, X, E, F, rms, nsteps, success):
+        """store the results of the structures in done and remove them from the batch"""
+        for i in np.where(done)[0]:
+            res = Result()
+            res.coords = X[i].copy()
+            res.energy = E[i]
+            res.grad = -F[i]
+            res.rms = rms[i]
+            res.nsteps = nsteps
+            res.nfev = self.nfev[i]
+            res.success = bool(success[i])
+            self.results[self.index[i]] = res
+        keep = ~done
+        self.index = self.index[keep]
+        self.v = self.v[keep]
+        self.dt = self.dt[keep]
+        self.a = self.a[keep]
+        self.Npos = self.Npos[keep]
+        self.nfev = self.nfev[keep]
+        return X[keep]
+
+    def run(self, fmax=1e-3, steps=100000):
+        """
+        run the minimization until the rms gradient is less than fmax or
+        the number of steps exceeds steps
+
+        Returns
+        -------
+        res : Result, or a list of Result objects if the input was a batch
+        """
+        X = self.X
+        sqrtN = np.sqrt(self.N)
+        instr = self.instrumentation
+        nstep = 0
+        while len(X) > 0:
+            if instr is not None:
+                t0 = instr.clock()
+                instr.count("getEnergyGradient", len(X))
+            E, G = self._getEnergyGradient(X)
+            if instr is not None:
+                t0 = instr.lap("potential", t0)
+            self.nfev += 1
+            F = np.negative(G, out=G)
+            rms = np.sqrt(np.einsum("ij,ij->i", F, F)) / sqrtN
+
+            if self.iprint > 0 and nstep % self.iprint == 0:
+                self.logger.info("fire2: %s E %s rms %s", nstep, E.mean(), rms.max())
+            if self.events and not self.batch:
+                for event in self.events:
+                    event(coords=X[0], energy=E[0], rms=rms[0])
+                if instr is not None:
+                    t0 = instr.lap("events", t0)
+                    instr.count("events", len(self.events))
+
+            converged = rms < fmax
+            if nstep >= steps:
+                done = np.ones(len(X), dtype=bool)
+            else:
+                done = converged
+            if done.any():
+                X = self._retire(done, X, E, F, rms, nstep, converged)
+                F = F[~done]
+                if len(X) == 0:
+                    break
+            self.step(X, F, nstep)
+            nstep += 1
+            if instr is not None:
+                instr.lap("step", t0)
+                instr.count("iterations")
+
+        if self.batch:
+            return self.results
+        return self.results[0]
+
+
 if __name__ == "__main__":
     import pygmin.potentials.lj as lj
     pot = lj.LJ()
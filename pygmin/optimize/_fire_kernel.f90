@@ -0,0 +1,62 @@
+!
+! one FIRE 2.0 step for K structures.  This is used by the python class Fire2
+! (pygmin/optimize/_fire.py).  All arrays are updated in place.  Column J of
+! X, V and F holds the coordinates, velocities and forces of structure J.
+!
+      SUBROUTINE FIRE2_STEP(X, V, F, DT, A, NPOS, NSTEP, DTMAX, DTMIN, MAXSTEP, &
+                            NMIN, NDELAY, FINC, FDEC, ASTART, FA, ATOMDIM, N, K)
+      IMPLICIT NONE
+      INTEGER, INTENT(IN) :: N, K, NSTEP, NMIN, NDELAY, ATOMDIM
+      DOUBLE PRECISION, INTENT(INOUT) :: X(N,K), V(N,K), DT(K), A(K)
+      DOUBLE PRECISION, INTENT(IN) :: F(N,K)
+      INTEGER, INTENT(INOUT) :: NPOS(K)
+      DOUBLE PRECISION, INTENT(IN) :: DTMAX, DTMIN, MAXSTEP, FINC, FDEC, ASTART, FA
+      INTEGER I, J
+      DOUBLE PRECISION P, VNORM, FNORM, R, DR(ATOMDIM)
+
+      DO J = 1, K
+!
+!        adapt the time step and the mixing parameter
+!
+         P = DOT_PRODUCT(F(:,J), V(:,J))
+         IF (P .GT. 0.0D0) THEN
+            NPOS(J) = NPOS(J) + 1
+            IF (NPOS(J) .GT. NMIN) THEN
+               DT(J) = MIN(DT(J) * FINC, DTMAX)
+               A(J) = A(J) * FA
+            ENDIF
+         ELSE
+            NPOS(J) = 0
+            IF (NSTEP .GE. NDELAY) THEN
+               DT(J) = MAX(DT(J) * FDEC, DTMIN)
+               A(J) = ASTART
+            ENDIF
+!           the inertia correction: go back half a step and stop
+            X(:,J) = X(:,J) - 0.5D0 * DT(J) * V(:,J)
+            V(:,J) = 0.0D0
+         ENDIF
+!
+!        semi-implicit Euler step with velocity mixing
+!
+         V(:,J) = V(:,J) + DT(J) * F(:,J)
+         IF (P .GT. 0.0D0) THEN
+            VNORM = SQRT(DOT_PRODUCT(V(:,J), V(:,J)))
+            FNORM = SQRT(DOT_PRODUCT(F(:,J), F(:,J)))
+            IF (FNORM .EQ. 0.0D0) FNORM = 1.0D0
+            V(:,J) = (1.0D0 - A(J)) * V(:,J) + (A(J) * VNORM / FNORM) * F(:,J)
+         ENDIF
+!
+!        limit the step of each atom to MAXSTEP and scale its velocity
+!        by the same factor
+!
+         DO I = 1, N, ATOMDIM
+            DR = DT(J) * V(I:I+ATOMDIM-1,J)
+            R = SQRT(DOT_PRODUCT(DR, DR))
+            IF (R .GT. MAXSTEP) THEN
+               DR = DR * (MAXSTEP / R)
+               V(I:I+ATOMDIM-1,J) = V(I:I+ATOMDIM-1,J) * (MAXSTEP / R)
+            ENDIF
+            X(I:I+ATOMDIM-1,J) = X(I:I+ATOMDIM-1,J) + DR
+         ENDDO
+      ENDDO
+      END SUBROUTINE FIRE2_STEP
@@ -0,0 +1,99 @@
+import time
+
+__all__ = ["Instrumentation", "ThrottledEvent"]
+
+
+class ThrottledEvent(object):
+    """
+    wrap an event so that it is only called every frequency-th time
+
+    Optimizers call their events after every iteration.  Events which do
+    expensive things, like copying the coordinates or updating a plot, can
+    be wrapped with this class to reduce their cost.
+
+    Parameters
+    ----------
+    event : callable
+        the event.  It is called with the keyword arguments passed to
+        __call__
+    frequency : int
+        the event is called on every frequency-th call, starting with the
+        first one
+
+    Examples
+    --------
+    >>> events = [ThrottledEvent(my_event, 10)]
+    >>> res = lbfgs_py(coords, pot, events=events)
+    """
+    def __init__(self, event, frequency=1):
+        if frequency < 1:
+            raise ValueError("frequency must be at least 1")
+        self.event = event
+        self.frequency = frequency
+        self.ncalls = 0
+
+    def __call__(self, **kwargs):
+        i = self.ncalls
+        self.ncalls += 1
+        if i % self.frequency == 0:
+            self.event(**kwargs)
+
+
+class Instrumentation(object):
+    """
+    counters and wall times of an optimization
+
+    An Instrumentation object can be passed to the optimizers (parameter
+    instrumentation).  They then count the number of iterations, energy and
+    gradient evaluations and event calls, and record the wall time spent in
+    each phase of an iteration (e.g. "step", "linesearch", "potential",
+    "events").  The same object can be passed to many optimizations to
+    accumulate the totals.  If no Instrumentation object is passed the
+    optimizers don't do any timing at all.
+
+    Attributes
+    ----------
+    counts : dict
+        the counters, by name
+    times : dict
+        the accumulated wall time in seconds, by phase
+
+    Examples
+    --------
+    >>> instr = Instrumentation()
+    >>> res = lbfgs_py(coords, pot, instrumentation=instr)
+    >>> print instr.report()
+    """
+    def __init__(self):
+        self.counts = dict()
+        self.times = dict()
+
+    def count(self, name, n=1):
+        """increase the counter name by n"""
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def clock(self):
+        """return the current wall time"""
+        return time.time()
+
+    def lap(self, phase, t0):
+        """add the time since t0 to phase and return the current time"""
+        t = time.time()
+        self.times[phase] = self.times.get(phase, 0.) + t - t0
+        return t
+
+    def reset(self):
+        """set all counters and times to zero"""
+        self.counts.clear()
+        self.times.clear()
+
+    def report(self):
+        """return a summary of the counters and times as a string"""
+        lines = []
+        total = sum(self.times.values())
+        for phase, t in sorted(self.times.items(), key=lambda item: -item[1]):
+            frac = t / total if total > 0. else 0.
+            lines.append("%-20s %10.4f s %6.1f%%" % (phase, t, 100. * frac))
+        for name, n in sorted(self.counts.items()):
+            lines.append("%-20s %10d" % (name, n))
+        return "\n".join(lines)
@@ -0,0 +1,273 @@
+import numpy as np
+import logging
+
+from pygmin.optimize import Result
+
+__all__ = ["BatchLBFGS"]
+
+_logger = logging.getLogger("pygmin.optimize")
+
+
+def _rowdot(a, b):
+    """the dot product of each row of a with the same row of b"""
+    return np.einsum("ij,ij->i", a, b)
+
+class BatchLBFGS(object):
+    """
+    minimize many independent structures at once with the LBFGS routine
+
+    This is the same algorithm as LBFGS, but K minimizations are advanced
+    in lockstep.  The positions, gradients and the LBFGS memory of all
+    structures are stored in stacked arrays of shape (K, N) and (M, K, N),
+    so each iteration costs a fixed number of numpy operations instead of a
+    number proportional to K.  The energies and gradients of all structures
+    are computed with one call to pot.getEnergyGradientBatch() if the
+    potential has it.  Structures are removed from the batch as soon as
+    they are converged.
+
+    Parameters
+    ----------
+    coords_list : list of arrays or array of shape (K, N)
+        the starting configurations.  They must all have the same length
+    pot :
+        the potential object
+    maxstep, maxErise, M, H0, nsteps, tol :
+        see LBFGS.  They apply to each structure separately
+    iprint : int
+        how often to print status information
+    logger : logger object
+        messages will be passed to this logger rather than the default
+
+    Notes
+    -----
+    The steps of each structure are the same as those of LBFGS (up to round
+    off errors), so this can be used as a drop in replacement for repeated
+    calls to lbfgs_py or mylbfgs.  This is worthwhile for small systems
+    where the time is dominated by the overhead of the optimizer rather than
+    the potential.
+
+    See Also
+    --------
+    LBFGS : minimize one structure
+    lbfgs_batch : a function wrapper
+    pygmin.potentials.BasePotential.getEnergyGradientBatch
+    """
+    def __init__(self, coords_list, pot, maxstep=0.1, maxErise=1e-4, M=4,
+                 H0=1., iprint=-1, nsteps=10000, tol=1e-6, logger=None):
+        self.X = np.array(coords_list, dtype=float)
+        if self.X.ndim != 2:
+            raise ValueError("coords_list must be a list of structures of equal size")
+        self.pot = pot
+        self.maxstep = maxstep
+        self.maxErise = maxErise
+        self.M = M
+        self.iprint = iprint
+        self.nsteps = nsteps
+        self.tol = tol
+        if logger is None:
+            self.logger = _logger
+        else:
+            self.logger = logger
+        if H0 is None:
+            H0 = 1.
+
+        K, N = self.X.shape
+        self.K = K
+        self.N = N
+
+        # the state of the structures which are still being minimized.  The
+        # arrays are compacted when structures are removed.
+        self.index = np.arange(K)  # the position of each row in coords_list
+        self.s = np.zeros([M,K,N])  # position updates (ring buffer)
+        self.y = np.zeros([M,K,N])  # gradient updates (ring buffer)
+        self.rho = np.zeros([M,K])
+        self.point = 0  # the number of steps taken, used to index the ring buffer
+        self.H0 = np.ones(K) * H0
+        self.k = np.zeros(K, dtype=int)
+        self.nfailed = np.zeros(K, dtype=int)
+        self.nfev = np.zeros(K, dtype=int)
+        self.Xold = self.X.copy()
+        self.Gold = np.zeros([K,N])
+
+        self.results = [None] * K
+
+    def _getEnergyGradient(self, X):
+        """return the energies and gradients of all rows of X"""
+        try:
+            getEnergyGradientBatch = self.pot.getEnergyGradientBatch
+        except AttributeError:
+            E = np.zeros(len(X))
+            G = np.zeros(X.shape)
+            for i in xrange(len(X)):
+                E[i], G[i,:] = self.pot.getEnergyGradient(X[i])
+            return E, G
+        return getEnergyGradientBatch(X)
+
+    def getStep(self, X, G):
+        """return the LBFGS steps for all structures"""
+        s = self.s
+        y = self.y
+        rho = self.rho
+        k = self.k
+        M = self.M
+        p = self.point
+
+        #we have a new X and G, save in s and y.  All structures share the
+        #same position in the ring buffer.  The entries of structures which
+        #have just been reset are never used
+        if p > 0:
+            km1 = (p - 1) % M
+            np.subtract(X, self.Xold, out=s[km1])
+            np.subtract(G, self.Gold, out=y[km1])
+            YS = _rowdot(s[km1], y[km1])
+            YY = _rowdot(y[km1], y[km1])
+            YS[YS == 0.] = 1.
+            YY[YY == 0.] = 1.
+            rho[km1] = 1. / YS
+            update = k > 0
+            self.H0[update] = YS[update] / YY[update]
+        self.Xold[:] = X
+        self.Gold[:] = G
+
+        # the two loop recursion.  j counts back from the newest entry.
+        # Entries which do not exist for a structure get a weight of zero.
+        nhist = np.minimum(k, M)
+        jmax = min(p, M)
+        q = G.copy()
+        a = np.zeros([M, len(X)])
+        for j in xrange(jmax):
+            i = (p - 1 - j) % M
+            w = rho[i] * (j < nhist)
+            a[j] = w * _rowdot(s[i], q)
+            q -= a[j,:,np.newaxis] * y[i]
+        z = q
+        z *= self.H0[:,np.newaxis]
+        for j in reversed(xrange(jmax)):
+            i = (p - 1 - j) % M
+            w = rho[i] * (j < nhist)
+            beta = w * _rowdot(y[i], z)
+            z += s[i] * (a[j] - beta)[:,np.newaxis]
+        stp = np.negative(z, out=z)
+
+        #make first guess for the step length cautious
+        first = k == 0
+        if first.any():
+            gnorm = np.sqrt(_rowdot(G[first], G[first]))
+            stp[first] *= np.minimum(gnorm, 1. / gnorm)[:,np.newaxis]
+
+        self.k += 1
+        self.point += 1
+        return stp
+
+    def adjustStepSize(self, X, E, G, stp):
+        """
+        take the steps, reducing the step size of each structure separately
+        until the energy does not rise by more than maxErise.  See LBFGS.adjustStepSize
+        """
+        # if the step is not downhill, reverse it
+        uphill = _rowdot(G, stp) > 0.
+        stp[uphill] *= -1.
+
+        stepsize = np.sqrt(_rowdot(stp, stp))
+        f = np.ones(len(X))
+        big = stepsize > self.maxstep
+        f[big] = self.maxstep / stepsize[big]
+
+        Xnew = X.copy()
+        Enew = E.copy()
+        Gnew = G.copy()
+        nincrease = np.zeros(len(X), dtype=int)
+        todo = np.arange(len(X))
+        while len(todo) > 0:
+            Xtrial = X[todo] + f[todo,np.newaxis] * stp[todo]
+            Etrial, Gtrial = self._getEnergyGradient(Xtrial)
+            self.nfev[todo] += 1
+            accept = Etrial - E[todo] <= self.maxErise
+
+            i = todo[accept]
+            Xnew[i] = Xtrial[accept]
+            Enew[i] = Etrial[accept]
+            Gnew[i] = Gtrial[accept]
+
+            todo = todo[~accept]
+            f[todo] /= 10.
+            nincrease[todo] += 1
+            failed = todo[nincrease[todo] > 10]
+            if len(failed) > 0:
+                # keep the old position and reset the memory
+                self.logger.warning("lbfgs_batch: having trouble finding a good step size for %d structures", len(failed))
+                self.nfailed[failed] += 1
+                self.k[failed] = 0
+                self.H0[failed] = 1.
+                todo = todo[nincrease[todo] <= 10]
+
+        self.stepsize = f * stepsize
+        return Xnew, Enew, Gnew
+
+    def _retire(self, done, X, E, G, rms, nsteps, success):
+        """store the results of the structures in done and remove them from the batch"""
+        for i in np.where(done)[0]:
+            res = Result()
+            res.coords = X[i].copy()
+            res.energy = E[i]
+            res.grad = G[i].copy()
+            res.rms = rms[i]
+            res.nsteps = nsteps
+            res.nfev = self.nfev[i]
+            res.H0 = self.H0[i]
+            res.success = success[i]
+            res.message = []
+            if self.nfailed[i] > 10:
+                res.message.append("problem with adjustStepSize")
+            self.results[self.index[i]] = res
+
+        keep = ~done
+        self.index = self.index[keep]
+        self.s = self.s[:,keep]
+        self.y = self.y[:,keep]
+        self.rho = self.rho[:,keep]
+        self.H0 = self.H0[keep]
+        self.k = self.k[keep]
+        self.nfailed = self.nfailed[keep]
+        self.nfev = self.nfev[keep]
+        self.Xold = self.Xold[keep]
+        self.Gold = self.Gold[keep]
+        return X[keep], E[keep], G[keep]
+
+    def run(self):
+        """
+        the main loop of the algorithm
+
+        Returns
+        -------
+        results : list of Result
+            one for each structure, in the same order as coords_list
+        """
+        sqrtN = np.sqrt(self.N)
+        X = self.X
+        E, G = self._getEnergyGradient(X)
+        self.nfev += 1
+        rms = np.sqrt(_rowdot(G, G)) / sqrtN
+
+        i = 1
+        while len(X) > 0:
+            stp = self.getStep(X, G)
+            X, E, G = self.adjustStepSize(X, E, G, stp)
+            rms = np.sqrt(_rowdot(G, G)) / sqrtN
+
+            if self.iprint > 0 and i % self.iprint == 0:
+                self.logger.info("lbfgs_batch: %s active %s max rms %s mean E %s",
+                                 i, len(X), rms.max(), E.mean())
+
+            converged = rms < self.tol
+            failed = self.nfailed > 10
+            if i >= self.nsteps - 1:
+                done = np.ones(len(X), dtype=bool)
+            else:
+                done = converged | failed
+            if done.any():
+                X, E, G = self._retire(done, X, E, G, rms, i, converged)
+                rms = rms[~done]
+            i += 1
+
+        return self.results
@@ -0,0 +1,60 @@
+!
+! LBFGS step direction on preallocated ring buffers.  This is used by the python
+! class LBFGS (pygmin/optimize/_lbfgs_py.py).  All arrays are passed in and
+! updated in place, so no memory is allocated per step.
+!
+      SUBROUTINE LBFGS_STEP(X, G, XOLD, GOLD, S, Y, RHO, ALPHA, H0IN, K, &
+                            STP, H0OUT, M, N)
+      IMPLICIT NONE
+      INTEGER, INTENT(IN) :: K, M, N
+      DOUBLE PRECISION, INTENT(IN) :: X(N), G(N), H0IN
+      DOUBLE PRECISION, INTENT(INOUT) :: XOLD(N), GOLD(N), S(N,M), Y(N,M)
+      DOUBLE PRECISION, INTENT(INOUT) :: RHO(M), ALPHA(M), STP(N)
+      DOUBLE PRECISION, INTENT(OUT) :: H0OUT
+      INTEGER I, J, KM1, NHIST
+      DOUBLE PRECISION YS, YY, BETA, GNORM
+!
+!     K is the number of previous steps.  If K > 0 the change in position and
+!     gradient since the last call are stored in column MOD(K-1,M)+1 of S and
+!     Y and the inverse Hessian diagonal H0 is updated according to
+!     Liu and Nocedal 1989, H0 = YS / YY
+!
+      H0OUT = H0IN
+      IF (K .GT. 0) THEN
+         KM1 = MOD(K-1, M) + 1
+         S(:,KM1) = X - XOLD
+         Y(:,KM1) = G - GOLD
+         YS = DOT_PRODUCT(S(:,KM1), Y(:,KM1))
+         IF (YS .EQ. 0.0D0) YS = 1.0D0
+         RHO(KM1) = 1.0D0 / YS
+         YY = DOT_PRODUCT(Y(:,KM1), Y(:,KM1))
+         IF (YY .EQ. 0.0D0) YY = 1.0D0
+         H0OUT = YS / YY
+      ENDIF
+      XOLD = X
+      GOLD = G
+!
+!     the two loop recursion, from the newest to the oldest entry and back
+!
+      NHIST = MIN(K, M)
+      STP = G
+      DO I = K-1, K-NHIST, -1
+         J = MOD(I, M) + 1
+         ALPHA(J) = RHO(J) * DOT_PRODUCT(S(:,J), STP)
+         STP = STP - ALPHA(J) * Y(:,J)
+      ENDDO
+      STP = STP * H0OUT
+      DO I = K-NHIST, K-1
+         J = MOD(I, M) + 1
+         BETA = RHO(J) * DOT_PRODUCT(Y(:,J), STP)
+         STP = STP + S(:,J) * (ALPHA(J) - BETA)
+      ENDDO
+      STP = -STP
+!
+!     make the first guess for the step length cautious
+!
+      IF (K .EQ. 0) THEN
+         GNORM = SQRT(DOT_PRODUCT(G, G))
+         IF (GNORM .GT. 0.0D0) STP = STP * MIN(GNORM, 1.0D0 / GNORM)
+      ENDIF
+      END SUBROUTINE LBFGS_STEP
@@ -4,6 +4,12 @@ import logging
 #from bfgs import lineSearch, BFGS
 from optimization_exceptions import LineSearchError
 from pygmin.optimize import Result
+from _linesearch import strong_wolfe_linesearch
+from _instrumentation import ThrottledEvent
+try:
+    from _lbfgs_kernel import lbfgs_step as _lbfgs_step_compiled
+except ImportError:
+    _lbfgs_step_compiled = None
 
 __all__ = ["LBFGS"]
 
@@ -41,7 +47,7 @@ class LBFGS(object):
         implementation of LBFGS takes all the inverse diagonal components to be the same. 
     events : list of callables
         these are called after each iteration.  events can also be added using
-        attachEvent()
+        attachEvent().  See ThrottledEvent for calling an event less often
     alternate_stop_criterion : callable
         this criterion will be used rather than rms gradiant to determine when
         to stop the iteration
@@ -49,6 +55,23 @@ class LBFGS(object):
         print debugging information
     logger : logger object
         messages will be passed to this logger rather than the default
+    compiled : bool
+        if True the step direction is computed with the compiled kernel
+        (_lbfgs_kernel.f90) if it is available.  Otherwise the numpy
+        implementation is used.  Both give the same steps.
+    linesearch : string
+        "backtrack" (the default) or "wolfe".  See Notes
+    c1, c2 : float
+        the parameters of the strong Wolfe conditions used if linesearch is
+        "wolfe"
+    preconditioner : Preconditioner object
+        if given, the approximation of the inverse Hessian is
+        H0 * preconditioner.solve() rather than H0 times the identity.  The
+        compiled kernel is not used in this case.  See Preconditioner
+    instrumentation : Instrumentation object
+        if given, the number of iterations, gradient evaluations and event
+        calls are counted and the time spent in the phases "step",
+        "linesearch" and "events" is recorded
          
     Notes
     -----
@@ -62,6 +85,23 @@ class LBFGS(object):
     
     3. take step
 
+    With linesearch="wolfe" step 2 is a line search for a step length which
+    satisfies the strong Wolfe conditions (see strong_wolfe_linesearch).  The
+    step can also be made longer, up to maxstep, and the curvature condition
+    guarantees that the LBFGS memory stays positive definite.  If the line
+    search fails the maxErise backtracking is used for that step.  The number
+    of energy evaluations of each line search is returned as
+    Result.linesearch_nfev.
+
+    With a preconditioner P the two loop recursion starts from H0 * P^-1
+    and H0 is updated as YS / dot(y, P^-1 y).  This is the preconditioned
+    LBFGS of e.g. Packwood et al, J. Chem. Phys. 144, 164109 (2016).
+
+    The position and gradient updates are stored in ring buffers of shape
+    (M, N) which are allocated once.  The compiled kernel updates them and
+    computes the step direction in place, so the only memory allocated per
+    iteration is for the new position.
+
     http://dx.doi.org/10.1007/BF01589116
     
     See Also
@@ -71,17 +111,22 @@ class LBFGS(object):
     
     """
     def __init__(self, X, pot, maxstep = 0.1, maxErise = 1e-4, M=4, 
-                 rel_energy = False, H0=1., events=[],
+                 rel_energy = False, H0=1., events=None,
                  alternate_stop_criterion=None, debug=False,
-                 iprint=-1, nsteps=10000, tol=1e-6, logger=None):
+                 iprint=-1, nsteps=10000, tol=1e-6, logger=None,
+                 compiled=True, linesearch="backtrack", c1=1e-4, c2=0.9,
+                 preconditioner=None, instrumentation=None):
         self.X = X
         self.pot = pot
-        e, self.G = self.pot.getEnergyGradient(self.X)
+        self.E, self.G = self.pot.getEnergyGradient(self.X)
         self.funcalls = 1
         self.maxstep = maxstep
         self.maxErise = maxErise
         self.rel_energy = rel_energy #use relative energy comparison for maxErise 
+        if events is None:
+            events = []
         self.events = events #a list of events to run during the optimization
+        self.instrumentation = instrumentation
         self.iprint = iprint
         self.nsteps = nsteps
         self.tol = tol
@@ -98,8 +143,13 @@ class LBFGS(object):
         N = self.N
         M = self.M
         
-        self.s = np.zeros([M,N])  #position updates
-        self.y = np.zeros([M,N])  #gradient updates
+        # ring buffers for the position and gradient updates.  They are
+        # allocated in Fortran order, so the compiled kernel can use them
+        # without copying.  self.s[i,:] is a row of the buffer
+        self._sF = np.zeros([N,M], order="F")
+        self._yF = np.zeros([N,M], order="F")
+        self.s = self._sF.transpose()  #position updates
+        self.y = self._yF.transpose()  #gradient updates
         self.a = np.zeros(M)  #approximation for the inverse hessian
         #self.beta = np.zeros(M) #working space
         
@@ -122,8 +172,21 @@ class LBFGS(object):
         
         self.stp = np.zeros(N)
 
-        self.Xold = self.X.copy()
-        self.Gold = self.G.copy()
+        self.Xold = np.array(self.X, dtype=float)
+        self.Gold = np.array(self.G, dtype=float)
+        
+        self.preconditioner = preconditioner
+        if compiled and preconditioner is None:
+            self._kernel = _lbfgs_step_compiled
+        else:
+            self._kernel = None
+        
+        if linesearch not in ["backtrack", "wolfe"]:
+            raise ValueError("unknown linesearch %s" % linesearch)
+        self.linesearch = linesearch
+        self.c1 = c1
+        self.c2 = c2
+        self.linesearch_nfev = []  # the energy evaluations of each iteration
         
         self.nfailed = 0
         self.nfail_reset = 0
@@ -140,22 +203,29 @@ class LBFGS(object):
         """
         self.G = G #saved for the line search
         
+        if self._kernel is not None:
+            self.H0 = self._kernel(X, G, self.Xold, self.Gold, self._sF, self._yF,
+                                   self.rho, self.a, self.H0, self.k, self.stp)
+            self.k += 1
+            return self.stp
+        
         s = self.s
         y = self.y
         a = self.a
         q = self.q
         rho = self.rho
         M = self.M
+        precon = self.preconditioner
+        if precon is not None:
+            precon.update(X)
         
         k = self.k
-        ki = k % M #the index corresponding to k
-        
         
         #we have a new X and G, save in s and y
         if k > 0:
             km1 = (k + M - 1) % M  #=k-1  cyclical
-            s[km1,:] = X - self.Xold
-            y[km1,:] = G - self.Gold
+            np.subtract(X, self.Xold, out=s[km1,:])
+            np.subtract(G, self.Gold, out=y[km1,:])
             
             YS = np.dot(s[km1,:], y[km1,:])
             if YS == 0.:
@@ -169,45 +239,48 @@ class LBFGS(object):
             # this is described in Liu and Nocedal 1989 
             # http://dx.doi.org/10.1007/BF01589116
             # note: for this step we assume H0 is always the identity
-            YY = np.dot( y[km1,:], y[km1,:] )
+            if precon is None:
+                YY = np.dot( y[km1,:], y[km1,:] )
+            else:
+                YY = np.dot( y[km1,:], precon.solve(y[km1,:]) )
             if YY == 0.:
                 self.logger.warning("warning: resetting YY to 1 in lbfgs %s", YY)
                 YY = 1.
             self.H0 = YS / YY
 
-        self.Xold[:] = X[:]
-        self.Gold[:] = G[:]
+        self.Xold[:] = X
+        self.Gold[:] = G
 
-        
-        q[:] = G[:]
-        myrange = [ i % M for i in range(max([0,k-M]), k, 1) ]
-        #print "myrange", myrange, ki, k
-        for i in reversed(myrange):
+        # the two loop recursion over the ring buffer, from the newest entry
+        # to the oldest and back
+        q[:] = G
+        kstart = max(0, k - M)
+        for j in xrange(k - 1, kstart - 1, -1):
+            i = j % M
             a[i] = rho[i] * np.dot( s[i,:], q )
             q -= a[i] * y[i,:]
         
-        #z[:] = self.H0[ki] * q[:]
-        z = q #q is not used anymore after this, so we can use it as workspace
+        if precon is None:
+            z = q #q is not used anymore after this, so we can use it as workspace
+        else:
+            z = precon.solve(q)
         z *= self.H0
-        for i in myrange:
+        for j in xrange(kstart, k):
+            i = j % M
             beta = rho[i] * np.dot( y[i,:], z )
             z += s[i,:] * (a[i] - beta)
         
-        self.stp[:] = -z[:]
+        np.negative(z, out=self.stp)
         
         if k == 0:
             #make first guess for the step length cautious
             gnorm = np.linalg.norm(G)
             self.stp *= min(gnorm, 1./gnorm)
         
-        #we now have the step direction.  now take the step
-        #self.takeStep(X, self.stp)
-        #print "step size", np.linalg.norm(self.stp)
-        
         self.k += 1
         return self.stp
 
-    def adjustStepSize(self, X, E, G, stp):
+    def adjustStepSize(self, X, E, G, stp, linesearch=None):
         """
         We now have a proposed step.  This function will make sure it is 
         a good step and then take it.
@@ -228,19 +301,26 @@ class LBFGS(object):
                 
         *The below is not implemented yet.  It's on the TODO list
         
+        If linesearch (default self.linesearch) is "wolfe" the step length is
+        determined by _wolfeStep instead.
         """
+        if linesearch is None:
+            linesearch = self.linesearch
+        if linesearch == "wolfe":
+            return self._wolfeStep(X, E, G, stp)
+        funcalls0 = self.funcalls
         f = 1.
-        X0 = X.copy()
-        G0 = G.copy()
+        # X and G are never modified in place, so they don't need to be copied
+        X0 = X
+        G0 = G
         E0 = E
         maxErise = self.maxErise
         
         if np.dot(G, stp) > 0:
             #print "overlap was negative, reversing step direction"
-            stp = -stp
-            self.stp = stp
+            stp *= -1.
         
-        stepsize = np.linalg.norm(stp)
+        stepsize = np.sqrt(np.dot(stp, stp))
         
         if f*stepsize > self.maxstep:
             f = self.maxstep / stepsize
@@ -293,13 +373,47 @@ class LBFGS(object):
             print G
             
         self.stepsize = f*stepsize
+        self.linesearch_nfev.append(self.funcalls - funcalls0)
         return X, E, G
     
+    def _wolfeStep(self, X, E, G, stp):
+        """
+        take a step with a step length satisfying the strong Wolfe conditions.
+        Fall back to adjustStepSize if the line search fails
+        """
+        if np.dot(G, stp) > 0:
+            stp *= -1.
+        stepsize = np.sqrt(np.dot(stp, stp))
+        if stepsize == 0. or np.dot(G, stp) == 0.:
+            return self.adjustStepSize(X, E, G, stp, linesearch="backtrack")
+        
+        alpha_max = self.maxstep / stepsize
+        ls = strong_wolfe_linesearch(self.pot, X, E, G, stp, alpha0=1.,
+                                     alpha_max=alpha_max, c1=self.c1, c2=self.c2)
+        nfev = ls.nfev
+        self.funcalls += nfev
+        alpha = ls.alpha
+        if alpha > 0.:
+            # if success is False the curvature condition is not satisfied,
+            # but the energy decreased, so the step is still good
+            self.stepsize = alpha * stepsize
+            self.linesearch_nfev.append(nfev)
+            return ls.coords, ls.energy, ls.grad
+        
+        if self.debug:
+            self.logger.info("wolfe line search failed, using backtracking")
+        Xnew, Enew, Gnew = self.adjustStepSize(X, E, G, stp, linesearch="backtrack")
+        self.linesearch_nfev[-1] += nfev
+        return Xnew, Enew, Gnew
+    
     def reset(self):
         self.H0 = 1.
         self.k = 0
     
-    def attachEvent(self, event):
+    def attachEvent(self, event, frequency=1):
+        """add an event, to be called every frequency iterations"""
+        if frequency > 1:
+            event = ThrottledEvent(event, frequency)
         self.events.append(event)
                 
     def run(self):
@@ -315,35 +429,44 @@ class LBFGS(object):
         #iprint =40
         X = self.X
         sqrtN = np.sqrt(self.N)
-        
+        instr = self.instrumentation
         
         i = 1
-        self.funcalls += 1
-        e, G = self.pot.getEnergyGradient(X)
-        rms = np.linalg.norm(G) / sqrtN
+        # the energy and gradient were computed in __init__
+        e, G = self.E, self.G
+        rms = np.sqrt(np.dot(G, G)) / sqrtN
         res.success = False
         while i < nsteps:
+            if instr is not None:
+                t0 = instr.clock()
             stp = self.getStep(X, G)
+            if instr is not None:
+                t0 = instr.lap("step", t0)
             
             try:
                 X, e, G = self.adjustStepSize(X, e, G, stp)
             except LineSearchError:
                 self.logger.error("problem with adjustStepSize, ending quench")
-                rms = np.linalg.norm(G) / sqrtN
+                rms = np.sqrt(np.dot(G, G)) / sqrtN
                 self.logger.error("    on failure: quench step %s %s %s %s", i, e, rms, self.funcalls)
                 res.message.append( "problem with adjustStepSize" )
                 break
-            #e, G = self.pot.getEnergyGradient(X)
+            if instr is not None:
+                t0 = instr.lap("linesearch", t0)
             
-            rms = np.linalg.norm(G) / sqrtN
+            rms = np.sqrt(np.dot(G, G)) / sqrtN
 
             
             if iprint > 0:
                 if i % iprint == 0:
                     self.logger.info("lbfgs: %s %s %s %s %s %s %s %s %s", i, "E", e, 
                                      "rms", rms, "funcalls", self.funcalls, "stepsize", self.stepsize)
-            for event in self.events:
-                event(coords=X, energy=e, rms=rms)
+            if self.events:
+                for event in self.events:
+                    event(coords=X, energy=e, rms=rms)
+                if instr is not None:
+                    instr.lap("events", t0)
+                    instr.count("events", len(self.events))
       
             if self.alternate_stop_criterion is None:
                 i_am_done = rms < self.tol
@@ -363,6 +486,10 @@ class LBFGS(object):
         res.rms = rms
         res.grad = G
         res.H0 = self.H0
+        res.linesearch_nfev = np.array(self.linesearch_nfev)
+        if instr is not None:
+            instr.count("iterations", i)
+            instr.count("getEnergyGradient", self.funcalls)
         return res
 
 #
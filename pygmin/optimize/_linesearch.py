@@ -0,0 +1,153 @@
+import numpy as np
+
+from pygmin.optimize import Result
+
+__all__ = ["strong_wolfe_linesearch"]
+
+
+def _cubicmin(a, fa, ga, b, fb, gb):
+    """
+    return the minimizer of the cubic which interpolates the function values
+    fa, fb and the derivatives ga, gb at a and b.  Return None if it doesn't
+    exist
+    """
+    if a == b:
+        return None
+    d1 = ga + gb - 3. * (fa - fb) / (a - b)
+    disc = d1**2 - ga * gb
+    if disc < 0.:
+        return None
+    d2 = np.sign(b - a) * np.sqrt(disc)
+    denom = gb - ga + 2. * d2
+    if denom == 0.:
+        return None
+    x = b - (b - a) * (gb + d2 - d1) / denom
+    if not np.isfinite(x):
+        return None
+    return x
+
+def strong_wolfe_linesearch(pot, X0, E0, G0, direction, alpha0=1., alpha_max=None,
+                            c1=1e-4, c2=0.9, maxiter=10):
+    """
+    find a step length along direction which satisfies the strong Wolfe conditions
+
+    The step length alpha is accepted if
+
+        E(alpha) <= E0 + c1 * alpha * dot(G0, direction)       (sufficient decrease)
+
+        |dot(G(alpha), direction)| <= c2 * |dot(G0, direction)|  (curvature)
+
+    The search starts at alpha0.  As long as the energy decreases and the
+    slope is still negative the step is extrapolated (up to alpha_max).  Once
+    an interval containing acceptable points is bracketed it is reduced using
+    safeguarded cubic interpolation.  Every trial point costs one call to
+    pot.getEnergyGradient() and the energies and gradients are used both for
+    the interpolation and as the result, so nothing is evaluated twice.
+
+    Parameters
+    ----------
+    pot : potential object
+    X0, E0, G0 :
+        the starting position, energy and gradient
+    direction : array
+        the search direction.  It must be downhill
+    alpha0 : float
+        the initial step length
+    alpha_max : float
+        the maximum step length.  If the energy is still decreasing at
+        alpha_max it is accepted
+    c1, c2 : float
+        the parameters of the strong Wolfe conditions, 0 < c1 < c2 < 1
+    maxiter : int
+        the maximum number of energy and gradient evaluations
+
+    Returns
+    -------
+    res : Result
+        with attributes alpha, coords, energy, grad, nfev and success.  If
+        success is False but alpha > 0 the returned point satisfies the
+        sufficient decrease condition only.  If alpha == 0 no acceptable point
+        was found and the starting point is returned.
+
+    Notes
+    -----
+    This follows algorithms 3.5 and 3.6 of Nocedal and Wright, Numerical
+    Optimization (2006), which is a simplified version of the More-Thuente
+    line search.
+
+    J. J. More and D. J. Thuente, ACM Trans. Math. Softw. 20, 286 (1994)
+    http://dx.doi.org/10.1145/192115.192132
+    """
+    dphi0 = np.dot(G0, direction)
+    if dphi0 >= 0.:
+        raise ValueError("the search direction is not downhill")
+    if alpha_max is None:
+        alpha_max = np.inf
+    alpha0 = min(alpha0, alpha_max)
+
+    nfev = [0]  # a list so it can be modified by evaluate()
+
+    def evaluate(alpha):
+        X = X0 + alpha * direction
+        E, G = pot.getEnergyGradient(X)
+        nfev[0] += 1
+        return X, E, G, np.dot(G, direction)
+
+    def accept(alpha, X, E, G, success=True):
+        res = Result()
+        res.alpha = alpha
+        res.coords = X
+        res.energy = E
+        res.grad = G
+        res.nfev = nfev[0]
+        res.success = success
+        return res
+
+    # the points are stored as (alpha, X, E, G, dphi)
+
+    def zoom(lo, hi):
+        """reduce the interval [lo, hi] until an acceptable point is found"""
+        while nfev[0] < maxiter:
+            a_lo, a_hi = lo[0], hi[0]
+            width = abs(a_hi - a_lo)
+            alpha = _cubicmin(a_lo, lo[2], lo[4], a_hi, hi[2], hi[4])
+            # don't get too close to the ends of the interval
+            if alpha is None or abs(alpha - a_lo) < 0.1 * width or abs(alpha - a_hi) < 0.1 * width:
+                alpha = 0.5 * (a_lo + a_hi)
+            point = (alpha,) + evaluate(alpha)
+            E, dphi = point[2], point[4]
+            if E > E0 + c1 * alpha * dphi0 or E >= lo[2]:
+                hi = point
+            else:
+                if abs(dphi) <= -c2 * dphi0:
+                    return accept(*point[:4])
+                if dphi * (a_hi - a_lo) >= 0.:
+                    hi = lo
+                lo = point
+        # no point satisfying the strong Wolfe conditions was found. lo is
+        # the best point with sufficient decrease
+        return accept(*lo[:4], success=False)
+
+    prev = (0., X0, E0, G0, dphi0)
+    alpha = alpha0
+    while nfev[0] < maxiter:
+        point = (alpha,) + evaluate(alpha)
+        E, dphi = point[2], point[4]
+        if E > E0 + c1 * alpha * dphi0 or (nfev[0] > 1 and E >= prev[2]):
+            return zoom(prev, point)
+        if abs(dphi) <= -c2 * dphi0:
+            return accept(*point[:4])
+        if dphi >= 0.:
+            return zoom(point, prev)
+        if alpha >= alpha_max:
+            # the energy is still decreasing, but we can't go further
+            return accept(*point[:4])
+
+        # extrapolate
+        anew = _cubicmin(prev[0], prev[2], prev[4], alpha, E, dphi)
+        if anew is None or anew < 2. * alpha or anew > 10. * alpha:
+            anew = 2. * alpha
+        prev = point
+        alpha = min(anew, alpha_max)
+
+    return accept(*prev[:4], success=False)
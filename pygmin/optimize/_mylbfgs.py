@@ -28,6 +28,8 @@ class MYLBFGS(LBFGS):
     """
     def __init__(self, X, pot, **lbfgs_py_kwargs):
         super(MYLBFGS, self).__init__(X, pot, **lbfgs_py_kwargs)
+        if self.preconditioner is not None:
+            raise NotImplementedError("MYLBFGS does not support preconditioners, use LBFGS")
         
         
         N = self.N
@@ -64,10 +66,10 @@ class MYLBFGS(LBFGS):
             #s = X - self.Xold
             #y = G - self.Gold
             #print "YS YY py", np.dot( y, s ), np.dot( y,y ), ISPT+NPT
-            self.W[ISPT+NPT : ISPT+NPT +N] = X - self.Xold
-            self.W[IYPT+NPT : IYPT+NPT +N] = G - self.Gold    
-        self.Xold = X.copy()
-        self.Gold = G.copy()
+            np.subtract(X, self.Xold, out=self.W[ISPT+NPT : ISPT+NPT +N])
+            np.subtract(G, self.Gold, out=self.W[IYPT+NPT : IYPT+NPT +N])
+        self.Xold[:] = X
+        self.Gold[:] = G
 
         
         #print self.iter, self.point
@@ -83,6 +85,12 @@ class MYLBFGS(LBFGS):
         
         return self.stp
 
+    def reset(self):
+        super(MYLBFGS, self).reset()
+        self.H0vec[:] = self.H0
+        self.iter = 0
+        self.point = 0
+
 
 #class LBFGS(MYLBFGS):
 #    """for backward compatibility """
@@ -0,0 +1,203 @@
+import numpy as np
+
+__all__ = ["Preconditioner", "DiagonalPreconditioner", "MetricTensorPreconditioner",
+           "ExpPreconditioner"]
+
+
+class Preconditioner(object):
+    """
+    base class for preconditioners of the LBFGS minimizer
+
+    A preconditioner is a symmetric positive definite matrix P which
+    approximates the Hessian (up to a constant factor).  LBFGS uses P^-1 in
+    place of the scalar initial guess for the inverse Hessian, H0.  The scale
+    of P doesn't matter, because H0 is still updated and multiplies P^-1.
+
+    Derived classes must implement solve().  update() is called at the
+    start of every LBFGS iteration and can be used to recompute P if the
+    coordinates have changed enough.
+
+    See Also
+    --------
+    LBFGS
+    pygmin.systems.BaseSystem.get_preconditioner
+    """
+    def update(self, coords):
+        """update the preconditioner for the new coordinates"""
+        pass
+
+    def solve(self, v):
+        """return P^-1 v"""
+        raise NotImplementedError
+
+
+class DiagonalPreconditioner(Preconditioner):
+    """
+    a constant diagonal preconditioner
+
+    Parameters
+    ----------
+    diag : array
+        the diagonal of P.  All elements must be positive
+    """
+    def __init__(self, diag):
+        self.diag = np.array(diag, dtype=float)
+        if np.any(self.diag <= 0.):
+            raise ValueError("the diagonal of the preconditioner must be positive")
+
+    def solve(self, v):
+        return v / self.diag
+
+
+class MetricTensorPreconditioner(Preconditioner):
+    """
+    a block diagonal preconditioner from the metric tensor
+
+    For curvilinear coordinates, such as the center of mass and angle axis
+    vectors of rigid bodies, the Hessian of a soft potential is roughly
+    proportional to the metric tensor.  The diagonal blocks of the metric
+    tensor (3x3 blocks for the translations and rotations of each rigid
+    body) are used as P.  The metric tensor depends on the rotations, so it
+    is recomputed when a coordinate has changed by more than recalc_tol.
+
+    Parameters
+    ----------
+    metric_tensor : callable
+        `g = metric_tensor(coords)` returns the metric tensor as an (N, N)
+        matrix, e.g. AATopology.metric_tensor
+    block_size : int
+        the size of the diagonal blocks.  With block_size=1 only the diagonal
+        is used
+    recalc_tol : float
+        the metric tensor is recomputed if a coordinate has changed by more
+        than this
+    c_stab : float
+        c_stab times the mean of the diagonal is added to the diagonal to make
+        sure that the blocks can be inverted
+
+    See Also
+    --------
+    pygmin.angleaxis.AATopology.metric_tensor
+    """
+    def __init__(self, metric_tensor, block_size=3, recalc_tol=0.1, c_stab=1e-3):
+        self.metric_tensor = metric_tensor
+        self.block_size = block_size
+        self.recalc_tol = recalc_tol
+        self.c_stab = c_stab
+        self.coords = None
+        self.nrecalc = 0
+
+    def update(self, coords):
+        if (self.coords is not None and len(coords) == len(self.coords) and
+                np.max(np.abs(coords - self.coords)) <= self.recalc_tol):
+            return
+        self.coords = coords.copy()
+        self.nrecalc += 1
+        bs = self.block_size
+        n = len(coords) / bs
+        g = self.metric_tensor(coords)
+        i = np.arange(n)
+        blocks = g.reshape(n, bs, n, bs)[i, :, i, :]
+        blocks += self.c_stab * np.mean(np.diag(g)) * np.eye(bs)
+        self.inverse_blocks = np.linalg.inv(blocks)
+
+    def solve(self, v):
+        bs = self.block_size
+        vblocks = v.reshape(-1, bs)
+        return np.einsum("ijk,ik->ij", self.inverse_blocks, vblocks).ravel()
+
+
+class ExpPreconditioner(Preconditioner):
+    """
+    the exponential preconditioner of Packwood et al for atomic systems
+
+    P is a weighted graph Laplacian of the neighbour list (acting equally on
+    the x, y and z coordinates)::
+
+        P_ij = -mu * exp(-A * (r_ij / r_nn - 1))   for r_ij < r_cut
+        P_ii = -sum_j P_ij + mu * c_stab
+
+    It has the sparsity pattern and roughly the long wavelength behaviour of
+    the Hessian of a pair potential, so it removes the ill conditioning
+    from soft collective motions of large systems.  P is recomputed when an
+    atom has moved more than recalc_tol and solved with a sparse LU
+    factorization.
+
+    Parameters
+    ----------
+    r_nn : float, optional
+        the typical nearest neighbour distance.  If not given it is the
+        median nearest neighbour distance of the first configuration
+    A : float
+        the decay of the weights
+    r_cut : float, optional
+        the cutoff of the neighbour list.  Default 2*r_nn
+    mu : float
+        the overall scale.  It does not affect LBFGS, because H0 is adapted
+    c_stab : float
+        stabilizes P against the zero translational eigenvalue
+    recalc_tol : float, optional
+        P is recomputed when an atom has moved more than this.  Default
+        0.1*r_nn
+    ndim : int
+        the number of dimensions
+
+    Notes
+    -----
+    D. Packwood, J. Kermode, L. Mones, N. Bernstein, J. Woolley, N. Gould,
+    C. Ortner and G. Csanyi, "A universal preconditioner for simulating
+    condensed phase materials", J. Chem. Phys. 144, 164109 (2016)
+    http://dx.doi.org/10.1063/1.4947024
+    """
+    def __init__(self, r_nn=None, A=3., r_cut=None, mu=1., c_stab=0.1,
+                 recalc_tol=None, ndim=3):
+        self.r_nn = r_nn
+        self.A = A
+        self.r_cut = r_cut
+        self.mu = mu
+        self.c_stab = c_stab
+        self.recalc_tol = recalc_tol
+        self.ndim = ndim
+        self.coords = None
+        self.nrecalc = 0
+
+    def _get_r_nn(self, x):
+        from scipy.spatial import cKDTree
+        d, i = cKDTree(x).query(x, k=2)
+        return np.median(d[:,1])
+
+    def update(self, coords):
+        x = coords.reshape(-1, self.ndim)
+        if self.coords is not None and len(coords) == len(self.coords):
+            dr = x - self.coords.reshape(-1, self.ndim)
+            if np.max(np.sum(dr**2, axis=1)) <= self.recalc_tol**2:
+                return
+        from scipy.spatial import cKDTree
+        import scipy.sparse
+        from scipy.sparse.linalg import splu
+
+        if self.r_nn is None:
+            self.r_nn = self._get_r_nn(x)
+        if self.r_cut is None:
+            self.r_cut = 2. * self.r_nn
+        if self.recalc_tol is None:
+            self.recalc_tol = 0.1 * self.r_nn
+        self.coords = coords.copy()
+        self.nrecalc += 1
+
+        natoms = len(x)
+        pairs = cKDTree(x).query_pairs(self.r_cut, output_type="ndarray")
+        i, j = pairs[:,0], pairs[:,1]
+        rij = np.sqrt(np.sum((x[i] - x[j])**2, axis=1))
+        w = self.mu * np.exp(-self.A * (rij / self.r_nn - 1.))
+        diag = np.zeros(natoms) + self.mu * self.c_stab
+        np.add.at(diag, i, w)
+        np.add.at(diag, j, w)
+        rows = np.concatenate([i, j, np.arange(natoms)])
+        cols = np.concatenate([j, i, np.arange(natoms)])
+        vals = np.concatenate([-w, -w, diag])
+        P = scipy.sparse.coo_matrix((vals, (rows, cols)), shape=(natoms, natoms))
+        self._lu = splu(P.tocsc())
+
+    def solve(self, v):
+        return self._lu.solve(v.reshape(-1, self.ndim)).ravel()
@@ -9,11 +9,12 @@ scipy.minimize would do a similar thing
 
 import numpy as np
 
-from pygmin.optimize import LBFGS, MYLBFGS, Fire, Result
+from pygmin.optimize import LBFGS, MYLBFGS, Fire, Fire2, Result, BatchLBFGS
+from pygmin.optimize import Instrumentation, ThrottledEvent
 from pygmin.potentials import BasePotential
 
 __all__ = ["lbfgs_scipy", "fire", "lbfgs_py", "mylbfgs", "cg", 
-           "steepest_descent", "bfgs_scipy"]
+           "steepest_descent", "bfgs_scipy", "lbfgs_batch", "fire2"]
 
 class _getEnergyGradientWrapper(BasePotential):
     """
@@ -93,6 +94,19 @@ def fire(coords, pot, tol=1e-3, nsteps=100000, **kwargs):
     res = opt.run(fmax=tol, steps=nsteps)
     return res
 
+def fire2(coords, pot, tol=1e-3, nsteps=100000, **kwargs):
+    """
+    A wrapper function for Fire2.  If coords is an array of shape (K, N)
+    the K structures are minimized together and a list of Result objects
+    is returned
+    """
+    if not hasattr(pot, "getEnergyGradient"):
+        # for compatibility with old quenchers.
+        # assume pot is a getEnergyGradient function
+        pot = _getEnergyGradientWrapper(pot)
+    opt = Fire2(coords, pot, **kwargs)
+    return opt.run(fmax=tol, steps=nsteps)
+
 def cg(coords, pot, iprint=-1, tol=1e-3, nsteps=5000, **kwargs):
     """
     a wrapper function for conjugate gradient routine in scipy
@@ -200,6 +214,17 @@ def mylbfgs(coords, pot, **kwargs):
     lbfgs = MYLBFGS(coords, pot, **kwargs)
     return lbfgs.run()
 
+def lbfgs_batch(coords_list, pot, **kwargs):
+    """
+    minimize many structures at once.  Returns a list of Result objects
+
+    See Also
+    --------
+    BatchLBFGS
+    """
+    lbfgs = BatchLBFGS(coords_list, pot, **kwargs)
+    return lbfgs.run()
+
 
 import unittest
 class TestMinimizers(unittest.TestCase):
@@ -234,18 +259,106 @@ class TestMinimizers(unittest.TestCase):
         self.assertAlmostEqual(self.E, res.energy, 4)
         self.check_attributes(res)
         
+    def test_lbfgs_py_python_kernel(self):
+        res = lbfgs_py(self.x0, self.pot, tol=1e-7, compiled=False)
+        self.assertTrue(res.success)
+        self.assertAlmostEqual(self.E, res.energy, 4)
+        self.check_attributes(res)
+        
+    def test_lbfgs_py_wolfe(self):
+        res = lbfgs_py(self.x0, self.pot, tol=1e-7, linesearch="wolfe")
+        self.assertTrue(res.success)
+        self.assertAlmostEqual(self.E, res.energy, 4)
+        self.check_attributes(res)
+        self.assertEqual(len(res.linesearch_nfev), res.nsteps)
+        self.assertEqual(res.linesearch_nfev.sum() + 1, res.nfev)
+        
+    def test_lbfgs_py_preconditioned(self):
+        from pygmin.optimize import ExpPreconditioner, DiagonalPreconditioner
+        for precon in [ExpPreconditioner(), DiagonalPreconditioner(np.ones(self.x0.size) * 2.)]:
+            res = lbfgs_py(self.x0, self.pot, tol=1e-7, preconditioner=precon)
+            self.assertTrue(res.success)
+            self.assertAlmostEqual(self.E, res.energy, 4)
+            self.check_attributes(res)
+        self.assertRaises(NotImplementedError, mylbfgs, self.x0, self.pot,
+                          preconditioner=precon)
+        
+    def test_lbfgs_batch(self):
+        # a second partially minimized structure
+        x0 = lbfgs_py(self.system.get_random_configuration(), self.pot, tol=1e-1).coords
+        results = lbfgs_batch([self.x0, x0], self.pot, tol=1e-7)
+        self.assertEqual(len(results), 2)
+        res = results[0]
+        self.assertTrue(res.success)
+        self.assertAlmostEqual(self.E, res.energy, 4)
+        self.check_attributes(res)
+        self.assertTrue(results[1].success)
+
+        # each structure takes the same steps as with lbfgs_py
+        results = lbfgs_batch([self.x0, x0], self.pot, tol=1e-7, nsteps=20)
+        for x, res in zip([self.x0, x0], results):
+            res2 = lbfgs_py(x, self.pot, tol=1e-7, nsteps=20)
+            self.assertLess(np.max(np.abs(res.coords - res2.coords)), 1e-8)
+            self.assertAlmostEqual(res.energy, res2.energy, 8)
+        
     def test_mylbfgs(self):
         res = mylbfgs(self.x0, self.pot, tol=1e-7)
         self.assertTrue(res.success)
         self.assertAlmostEqual(self.E, res.energy, 4)
         self.check_attributes(res)
     
+    def test_mylbfgs_wolfe(self):
+        res = mylbfgs(self.x0, self.pot, tol=1e-7, linesearch="wolfe")
+        self.assertTrue(res.success)
+        self.assertAlmostEqual(self.E, res.energy, 4)
+        self.check_attributes(res)
+    
     def test_fire(self):
         res = fire(self.x0, self.pot, tol=1e-7)
         self.assertTrue(res.success)
         self.assertAlmostEqual(self.E, res.energy, 4)
         self.check_attributes(res)
     
+    def test_fire2(self):
+        # fire2 sometimes falls into a different minimum than lbfgs, so
+        # only check that it converged downhill
+        res = fire2(self.x0, self.pot, tol=1e-7)
+        self.assertTrue(res.success)
+        self.assertLess(res.energy, self.E0)
+        self.assertLess(res.rms, 1e-7)
+        self.check_attributes(res)
+    
+    def test_fire2_python_kernel(self):
+        res = fire2(self.x0, self.pot, tol=1e-7, compiled=False)
+        self.assertTrue(res.success)
+        self.check_attributes(res)
+        res2 = fire2(self.x0, self.pot, tol=1e-7)
+        self.assertAlmostEqual(res2.energy, res.energy, 6)
+        self.assertEqual(res2.nfev, res.nfev)
+    
+    def test_fire2_batch(self):
+        x0 = self.system.get_random_configuration()
+        results = fire2(np.array([self.x0, x0]), self.pot, tol=1e-7)
+        self.assertEqual(len(results), 2)
+        for x, res in zip([self.x0, x0], results):
+            self.assertTrue(res.success)
+            self.check_attributes(res)
+            res2 = fire2(x, self.pot, tol=1e-7)
+            self.assertAlmostEqual(res2.energy, res.energy, 6)
+    
+    def test_instrumentation(self):
+        for quench in [lbfgs_py, mylbfgs, fire, fire2]:
+            instr = Instrumentation()
+            energies = []
+            event = ThrottledEvent(lambda energy=None, **kwargs: energies.append(energy), 3)
+            res = quench(self.x0, self.pot, tol=1e-4, events=[event],
+                         instrumentation=instr)
+            self.assertTrue(res.success)
+            self.assertEqual(len(energies), (event.ncalls + 2) // 3)
+            self.assertEqual(instr.counts["events"], event.ncalls)
+            self.assertGreater(instr.counts["getEnergyGradient"], instr.counts["iterations"])
+            self.assertIn("step", instr.times)
+    
     def test_lbfgs_scipy(self):
         res = lbfgs_scipy(self.x0, self.pot, tol=1e-7)
         self.assertTrue(res.success)
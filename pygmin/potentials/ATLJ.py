@@ -1,10 +1,9 @@
 import numpy as np #to access np.exp() not built int exp
-from scipy import weave
-from scipy.weave import converters
 
 from pygmin.potentials import LJ
 from pygmin.potentials import BasePotential
 import fortran.AT as ATfort
+import fortran.AT_cutoff as ATcutoff
 
 __all__ = ["ATLJ"]
 
@@ -18,74 +17,86 @@ class ATLJ(BasePotential):
     where t1, t2, t3 are the internal angles of the triangle ijk
     
     Z > 0 stabilizes linear vs. triangular geometries 
+
+    By default the three body term is summed over all triplets, which costs
+    O(N**3).  If rcut is given, only the triplets whose three distances are
+    all shorter than rcut contribute.  They are found from a neighbor list,
+    so the cost grows linearly with the number of atoms.  The term of each
+    triplet is multiplied by f(rij) * f(rik) * f(rjk), where the switching
+    function f goes smoothly from 1 at rswitch to 0 at rcut, so the energy
+    and gradient stay continuous.  The lennard jones part is never cut off.
+
+    Parameters
+    ----------
+    eps, sig : float
+        the lennard jones parameters
+    Z : float
+        the strength of the Axilrod-Teller term
+    rcut : float, optional
+        the cutoff of the three body term
+    rswitch : float, optional
+        where the switching function starts.  The default is 0.8 * rcut
+    rskin : float
+        the skin of the neighbor list.  The list is rebuilt when an atom has
+        moved more than rskin / 2
     """
-    def __init__(self, eps=1.0, sig=1.0, Z=1.):
+    def __init__(self, eps=1.0, sig=1.0, Z=1., rcut=None, rswitch=None, rskin=0.5):
         """ simple lennard jones potential"""
         self.sig = sig
         self.eps = eps
         self.Z = Z
         self.lj = LJ(self.sig, self.eps)
 
-    
-    def getEnergyWeave(self, coords):
-        """
-        use weave inline
+        self.rcut = rcut
+        if rcut is not None:
+            if rswitch is None:
+                rswitch = 0.8 * rcut
+            if not 0. <= rswitch < rcut:
+                raise ValueError("rswitch must be between 0 and rcut")
+        self.rswitch = rswitch
+        self.rskin = rskin
+        self.nlist_builds = 0
+        self._oldcoords = None
+
+    def _build_list(self, x):
         """
-        Elj = self.lj.getEnergy(coords)
-        
-        natoms = coords.size/3
-        coords = np.reshape(coords, [natoms,3])
-        energy=0.
-        Z = self.Z
-        #support_code
-        code = """
-        double drij[3];
-        double drik[3];
-        double drjk[3];
-        energy = 0.;
-        for (int i=0; i < natoms; ++i){
-            for (int j=0; j<i; ++j){
-                for (int k=0; k<j; ++k){
-                
-                    double rij = 0.;
-                    double rik = 0.;
-                    double rjk = 0.;
-        
-                    for (int d=0; d<3; ++d){
-                        drij[d] = coords(i,d) - coords(j,d);
-                        rij += drij[d]*drij[d];
-                    }
-                    for (int d=0; d<3; ++d){
-                        drjk[d] = coords(j,d) - coords(k,d);
-                        rjk += drjk[d]*drjk[d];
-                    }
-                    for (int d=0; d<3; ++d){
-                        drik[d] = coords(i,d) - coords(k,d);
-                        rik += drik[d]*drik[d];
-                    }
-                    
-                    rij = sqrt(rij);
-                    rjk = sqrt(rjk);
-                    rik = sqrt(rik);
-                    
-                    double ctijk = ( -(drij[0]*drjk[0] + drij[1]*drjk[1] + drij[2]*drjk[2]) / (rij * rjk) );
-                    double ctjki = (  (drjk[0]*drik[0] + drjk[1]*drik[1] + drjk[2]*drik[2]) / (rjk * rik) );
-                    double ctkij = (  (drik[0]*drij[0] + drik[1]*drij[1] + drik[2]*drij[2]) / (rik * rij) );
-
-                    double r3 = rij*rjk*rik;
-                    energy += Z*(1. + 3. * ctijk * ctjki * ctkij) / (r3*r3*r3);
-                }
-            }
-        }
-        return_val= energy;
+        build the neighbor list for the positions x, shape (natoms, 3)
+
+        The neighbors j > i of atom i are nlist[nstart[i]:nstart[i+1]]
         """
-        energy = weave.inline(code, ["coords", "energy", "Z", "natoms"], type_converters=converters.blitz, verbose=2)
-        #print "fast energy", Elj, energy
-        energy += Elj
-        return energy
+        from scipy.spatial import cKDTree
+        natoms = len(x)
+        pairs = cKDTree(x).query_pairs(self.rcut + self.rskin, output_type="ndarray")
+        # query_pairs returns the pairs with i < j
+        pairs = pairs[np.argsort(pairs[:,0], kind="mergesort")]
+        self._nlist = np.array(pairs[:,1], dtype=np.int32)
+        self._nstart = np.array(np.searchsorted(pairs[:,0], np.arange(natoms + 1)),
+                                dtype=np.int32)
+        self._oldcoords = x.copy()
+        self.nlist_builds += 1
 
+    def _update_list(self, coords):
+        x = coords.reshape(-1, 3)
+        if self._oldcoords is None or len(x) != len(self._oldcoords):
+            self._build_list(x)
+            return
+        if np.max(np.sum((x - self._oldcoords)**2, axis=1)) > (0.5 * self.rskin)**2:
+            self._build_list(x)
 
+    def getEnergyGradientCutoff(self, coords, gtest=True):
+        """
+        return the energy and gradient with the three body term summed over
+        the neighbor triplets within the cutoff
+        """
+        self._update_list(coords)
+        e, grad = ATcutoff.at_triplets(coords, self._nstart, self._nlist, self.Z,
+                                       self.rcut, self.rswitch, gtest)
+        if not gtest:
+            return e + self.lj.getEnergy(coords), None
+        elj, gradlj = self.lj.getEnergyGradient(coords)
+        return e + elj, grad + gradlj
 
+    
     def getEnergySlow(self, coords):
         Elj = self.lj.getEnergy(coords)
         
@@ -129,10 +140,14 @@ class ATLJ(BasePotential):
         return e + elj, grad + gradlj
 
     def getEnergy(self, coords):
+        if self.rcut is not None:
+            return self.getEnergyGradientCutoff(coords, gtest=False)[0]
         return self.getEnergyFortran(coords)
     
     def getEnergyGradient(self, coords):
         #return self.getEnergyGradientNumerical(coords)
+        if self.rcut is not None:
+            return self.getEnergyGradientCutoff(coords)
         return self.getEnergyGradientFortran(coords)
 
 import unittest
@@ -149,10 +164,6 @@ class TestATLJ(unittest.TestCase):
         
         atlj = ATLJ(Z=3.)
         e2 = atlj.getEnergySlow(coords)
-#        e1 = atlj.getEnergyWeave(coords)
-#        #print "%g - %g = %g" % (e1, e2, e1-e2)
-#        self.assertTrue( abs(e1 - e2) < 1e-12, "ATLJ: two energy methods give different results: %g - %g = %g" % (e1, e2, e1-e2) )
-
         
         e1 = atlj.getEnergyFortran(coords)
         #print "%g - %g = %g" % (e1, e2, e1-e2)
@@ -177,6 +188,33 @@ class TestATLJ(unittest.TestCase):
         maxrel = np.max( np.abs( (Gf-Gn)/(Gf+Gn)*2. ))
         print "maximum relative difference in gradients",  maxdiff, maxdiff/maxnorm
         self.assertTrue( maxdiff/maxnorm < 1e-4, "ATLJ: gradient differs from numerical gradient by %g" % (maxdiff) )
+
+    def testCutoffAllTriplets(self):
+        # with a cutoff larger than the cluster all triplets contribute fully
+        natoms = 10
+        coords = np.random.uniform(-1,1,natoms*3)*2
+        atlj = ATLJ(Z=3., rcut=100., rswitch=99.)
+        e1, g1 = atlj.getEnergyGradient(coords)
+        e2, g2 = atlj.getEnergyGradientFortran(coords)
+        self.assertAlmostEqual(e1, atlj.getEnergySlow(coords), 8)
+        self.assertAlmostEqual(e1, atlj.getEnergy(coords), 10)
+        self.assertLess(np.max(np.abs(g1 - g2)), 1e-8)
+
+    def testCutoffGradient(self):
+        natoms = 40
+        from pygmin.optimize import mylbfgs as quench
+        coords = np.random.uniform(-1,1,natoms*3)*2
+        coords = quench(coords, LJ(), tol=1.).coords
+        atlj = ATLJ(Z=3., rcut=1.8)
+        e, G = atlj.getEnergyGradient(coords)
+        Gn = atlj.NumericalDerivative(coords, eps=1e-6)
+        self.assertLess(np.max(np.abs(G - Gn)) / np.max(np.abs(G)), 1e-5)
+        # moving the atoms far enough rebuilds the neighbor list
+        coords = coords + np.random.uniform(-0.3, 0.3, coords.shape)
+        e, G = atlj.getEnergyGradient(coords)
+        Gn = atlj.NumericalDerivative(coords, eps=1e-6)
+        self.assertLess(np.max(np.abs(G - Gn)) / np.max(np.abs(G)), 1e-5)
+        self.assertEqual(atlj.nlist_builds, 2)
         
 
 
@@ -227,7 +265,6 @@ def main():
 
     
     #print lj.getEnergyGradient(coords)
-    #print lj.getEnergyGradientWeave(coords)
 
 if __name__ == "__main__":
     #main()
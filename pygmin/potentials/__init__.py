@@ -34,6 +34,7 @@ these are potentials that exist completely within the pygmin package
     LJ
     LJCut
     LJpshift
+    MultiSpeciesLJ
     ATLJ
     XYModel
     HeisenbergModel
@@ -64,6 +65,7 @@ from heisenberg_spin import *
 from heisenberg_spin_RA import *
 from ljpshiftfast import *
 from ljcut import *
+from multispecies_lj import *
 #from potential import *
 #from salt import *
 from soft_sphere import *
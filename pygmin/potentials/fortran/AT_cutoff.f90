@@ -0,0 +1,100 @@
+!
+! Axilrod-Teller triple-dipole term with a cutoff, summed over the triplets
+! of a neighbor list.  This is used by the python class ATLJ
+! (pygmin/potentials/ATLJ.py).
+!
+! The neighbors of atom I are NLIST(NSTART(I)+1 : NSTART(I+1)), numbered
+! from 0 and all larger than I - 1, so that every triplet I < J < K is
+! visited once.  A triplet contributes if all three distances are shorter
+! than RCUT.  Its energy is multiplied by F(RIJ) * F(RIK) * F(RJK), where
+! the switching function F goes smoothly from 1 at RSWITCH to 0 at RCUT.
+!
+! The energy of a triplet is written in terms of the squared distances
+! U = RIJ**2, V = RIK**2, W = RJK**2
+!
+!    ZSTAR * ( (UVW)**(-3/2) + 3/8 (U+V-W)(U+W-V)(V+W-U) (UVW)**(-5/2) )
+!
+      SUBROUTINE AT_TRIPLETS(X, NSTART, NLIST, ZSTAR, RCUT, RSWITCH, GTEST, &
+                             E, GRAD, NATOMS, NNEIB)
+      IMPLICIT NONE
+      INTEGER, INTENT(IN) :: NATOMS, NNEIB
+      DOUBLE PRECISION, INTENT(IN) :: X(3*NATOMS)
+      INTEGER, INTENT(IN) :: NSTART(NATOMS+1), NLIST(NNEIB)
+      DOUBLE PRECISION, INTENT(IN) :: ZSTAR, RCUT, RSWITCH
+      LOGICAL, INTENT(IN) :: GTEST
+      DOUBLE PRECISION, INTENT(OUT) :: E, GRAD(3*NATOMS)
+      INTEGER I, J, K, JJ, KK
+      DOUBLE PRECISION RIJ(3), RIK(3), RJK(3), U, V, W, RCUT2
+      DOUBLE PRECISION FIJ, FIK, FJK, DFIJ, DFIK, DFJK, S
+      DOUBLE PRECISION A, B, C, P, P32, P52, ET, DU, DV, DW
+
+      RCUT2 = RCUT**2
+      E = 0.0D0
+      GRAD(:) = 0.0D0
+      DO I = 1, NATOMS
+         DO JJ = NSTART(I) + 1, NSTART(I+1)
+            J = NLIST(JJ) + 1
+            RIJ(:) = X(3*J-2:3*J) - X(3*I-2:3*I)
+            U = DOT_PRODUCT(RIJ, RIJ)
+            IF (U .GE. RCUT2) CYCLE
+            CALL SWITCHING(U, RCUT, RSWITCH, FIJ, DFIJ)
+            DO KK = JJ + 1, NSTART(I+1)
+               K = NLIST(KK) + 1
+               RIK(:) = X(3*K-2:3*K) - X(3*I-2:3*I)
+               V = DOT_PRODUCT(RIK, RIK)
+               IF (V .GE. RCUT2) CYCLE
+               RJK(:) = X(3*K-2:3*K) - X(3*J-2:3*J)
+               W = DOT_PRODUCT(RJK, RJK)
+               IF (W .GE. RCUT2) CYCLE
+               CALL SWITCHING(V, RCUT, RSWITCH, FIK, DFIK)
+               CALL SWITCHING(W, RCUT, RSWITCH, FJK, DFJK)
+               S = FIJ * FIK * FJK
+
+               A = U + V - W
+               B = U + W - V
+               C = V + W - U
+               P = U * V * W
+               P32 = 1.0D0 / (P * SQRT(P))
+               P52 = P32 / P
+               ET = ZSTAR * (P32 + 0.375D0 * A * B * C * P52)
+               E = E + ET * S
+               IF (.NOT. GTEST) CYCLE
+!
+!              the derivatives with respect to U, V and W
+!
+               DU = ZSTAR * (-1.5D0 * P32 / U &
+                    + 0.375D0 * P52 * (B*C + A*C - A*B - 2.5D0 * A * B * C / U))
+               DV = ZSTAR * (-1.5D0 * P32 / V &
+                    + 0.375D0 * P52 * (B*C - A*C + A*B - 2.5D0 * A * B * C / V))
+               DW = ZSTAR * (-1.5D0 * P32 / W &
+                    + 0.375D0 * P52 * (-B*C + A*C + A*B - 2.5D0 * A * B * C / W))
+               DU = 2.0D0 * (DU * S + ET * DFIJ * FIK * FJK)
+               DV = 2.0D0 * (DV * S + ET * FIJ * DFIK * FJK)
+               DW = 2.0D0 * (DW * S + ET * FIJ * FIK * DFJK)
+               GRAD(3*I-2:3*I) = GRAD(3*I-2:3*I) - DU * RIJ(:) - DV * RIK(:)
+               GRAD(3*J-2:3*J) = GRAD(3*J-2:3*J) + DU * RIJ(:) - DW * RJK(:)
+               GRAD(3*K-2:3*K) = GRAD(3*K-2:3*K) + DV * RIK(:) + DW * RJK(:)
+            ENDDO
+         ENDDO
+      ENDDO
+      END SUBROUTINE AT_TRIPLETS
+!
+! the switching function F(r) and dF / d(r**2) for the squared distance R2.
+! F = 1 - T**2 (3 - 2 T) with T = (r - RSWITCH) / (RCUT - RSWITCH)
+!
+      SUBROUTINE SWITCHING(R2, RCUT, RSWITCH, F, DF)
+      IMPLICIT NONE
+      DOUBLE PRECISION, INTENT(IN) :: R2, RCUT, RSWITCH
+      DOUBLE PRECISION, INTENT(OUT) :: F, DF
+      DOUBLE PRECISION R, T
+
+      IF (R2 .LE. RSWITCH**2) THEN
+         F = 1.0D0
+         DF = 0.0D0
+         RETURN
+      ENDIF
+      R = SQRT(R2)
+      T = (R - RSWITCH) / (RCUT - RSWITCH)
+      F = 1.0D0 - T**2 * (3.0D0 - 2.0D0 * T)
+      DF = -6.0D0 * T * (1.0D0 - T) / ((RCUT - RSWITCH) * 2.0D0 * R)
+      END SUBROUTINE SWITCHING
@@ -0,0 +1,87 @@
+!
+! energy and gradient of the multi species lennard jones potential
+! (pygmin/potentials/multispecies_lj.py).  The parameters of each pair of
+! species are looked up in the tables EPS4 (4*eps), SIG6, SIG12, RCUT2, A and B
+! of shape (NTYPES, NTYPES).  TYPES holds the species of each atom, numbered
+! from 0.  The pair energy is
+!
+!    EPS4 * (SIG12 / r**12 - SIG6 / r**6) + A * r**2 + B     for r**2 < RCUT2
+!
+!
+! all pairs
+!
+      SUBROUTINE MSLJ_ALL(X, TYPES, EPS4, SIG6, SIG12, RCUT2, A, B, &
+                          PERIODIC, BOXL, GTEST, E, GRAD, NATOMS, NTYPES)
+      IMPLICIT NONE
+      INTEGER, INTENT(IN) :: NATOMS, NTYPES
+      DOUBLE PRECISION, INTENT(IN) :: X(3*NATOMS)
+      INTEGER, INTENT(IN) :: TYPES(NATOMS)
+      DOUBLE PRECISION, INTENT(IN), DIMENSION(NTYPES,NTYPES) :: EPS4, SIG6, SIG12, RCUT2, A, B
+      LOGICAL, INTENT(IN) :: PERIODIC, GTEST
+      DOUBLE PRECISION, INTENT(IN) :: BOXL(3)
+      DOUBLE PRECISION, INTENT(OUT) :: E, GRAD(3*NATOMS)
+      INTEGER I, J, TI, TJ
+      DOUBLE PRECISION DR(3), R2, IR2, IR6, G
+
+      E = 0.0D0
+      GRAD(:) = 0.0D0
+      DO I = 1, NATOMS
+         TI = TYPES(I) + 1
+         DO J = I+1, NATOMS
+            TJ = TYPES(J) + 1
+            DR(:) = X(3*J-2:3*J) - X(3*I-2:3*I)
+            IF (PERIODIC) DR(:) = DR(:) - BOXL(:) * ANINT(DR(:) / BOXL(:))
+            R2 = DOT_PRODUCT(DR, DR)
+            IF (R2 .GE. RCUT2(TI,TJ)) CYCLE
+            IR2 = 1.0D0 / R2
+            IR6 = IR2**3
+            E = E + EPS4(TI,TJ) * IR6 * (SIG12(TI,TJ) * IR6 - SIG6(TI,TJ)) &
+                  + A(TI,TJ) * R2 + B(TI,TJ)
+            IF (GTEST) THEN
+               G = EPS4(TI,TJ) * IR6 * IR2 * (6.0D0 * SIG6(TI,TJ) - 12.0D0 * SIG12(TI,TJ) * IR6) &
+                   + 2.0D0 * A(TI,TJ)
+               GRAD(3*J-2:3*J) = GRAD(3*J-2:3*J) + G * DR(:)
+               GRAD(3*I-2:3*I) = GRAD(3*I-2:3*I) - G * DR(:)
+            ENDIF
+         ENDDO
+      ENDDO
+      END SUBROUTINE MSLJ_ALL
+!
+! the pairs (IPAIR(K), JPAIR(K)) of a neighbor list, numbered from 0
+!
+      SUBROUTINE MSLJ_PAIRS(X, TYPES, IPAIR, JPAIR, EPS4, SIG6, SIG12, RCUT2, A, B, &
+                            PERIODIC, BOXL, GTEST, E, GRAD, NATOMS, NTYPES, NPAIRS)
+      IMPLICIT NONE
+      INTEGER, INTENT(IN) :: NATOMS, NTYPES, NPAIRS
+      DOUBLE PRECISION, INTENT(IN) :: X(3*NATOMS)
+      INTEGER, INTENT(IN) :: TYPES(NATOMS), IPAIR(NPAIRS), JPAIR(NPAIRS)
+      DOUBLE PRECISION, INTENT(IN), DIMENSION(NTYPES,NTYPES) :: EPS4, SIG6, SIG12, RCUT2, A, B
+      LOGICAL, INTENT(IN) :: PERIODIC, GTEST
+      DOUBLE PRECISION, INTENT(IN) :: BOXL(3)
+      DOUBLE PRECISION, INTENT(OUT) :: E, GRAD(3*NATOMS)
+      INTEGER I, J, K, TI, TJ
+      DOUBLE PRECISION DR(3), R2, IR2, IR6, G
+
+      E = 0.0D0
+      GRAD(:) = 0.0D0
+      DO K = 1, NPAIRS
+         I = IPAIR(K) + 1
+         J = JPAIR(K) + 1
+         TI = TYPES(I) + 1
+         TJ = TYPES(J) + 1
+         DR(:) = X(3*J-2:3*J) - X(3*I-2:3*I)
+         IF (PERIODIC) DR(:) = DR(:) - BOXL(:) * ANINT(DR(:) / BOXL(:))
+         R2 = DOT_PRODUCT(DR, DR)
+         IF (R2 .GE. RCUT2(TI,TJ)) CYCLE
+         IR2 = 1.0D0 / R2
+         IR6 = IR2**3
+         E = E + EPS4(TI,TJ) * IR6 * (SIG12(TI,TJ) * IR6 - SIG6(TI,TJ)) &
+               + A(TI,TJ) * R2 + B(TI,TJ)
+         IF (GTEST) THEN
+            G = EPS4(TI,TJ) * IR6 * IR2 * (6.0D0 * SIG6(TI,TJ) - 12.0D0 * SIG12(TI,TJ) * IR6) &
+                + 2.0D0 * A(TI,TJ)
+            GRAD(3*J-2:3*J) = GRAD(3*J-2:3*J) + G * DR(:)
+            GRAD(3*I-2:3*I) = GRAD(3*I-2:3*I) - G * DR(:)
+         ENDIF
+      ENDDO
+      END SUBROUTINE MSLJ_PAIRS
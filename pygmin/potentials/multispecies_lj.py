@@ -0,0 +1,376 @@
+import numpy as np
+
+from pygmin.potentials import BasePotential
+try:
+    from fortran.multispecies_lj import mslj_all, mslj_pairs
+except ImportError:
+    mslj_all = mslj_pairs = None
+
+__all__ = ["MultiSpeciesLJ", "make_blj"]
+
+
+class MultiSpeciesLJ(BasePotential):
+    """
+    lennard jones potential for any number of species with a table of pair parameters
+
+    The interaction of atoms i and j of species a and b is::
+
+        V(r) = 4 eps_ab [(sig_ab / r)**12 - (sig_ab / r)**6] + A_ab r**2 + B_ab    for r < rcut_ab
+
+    and zero beyond the cutoff rcut_ab = rcut * sig_ab.  The constants A and
+    B depend on `shift`.  All pair parameters are looked up in (ntypes,
+    ntypes) tables, so glass formers with any number of components can be
+    modelled without a new potential class.  The energy and gradient are
+    computed by a compiled loop over the pairs (fortran/multispecies_lj.f90)
+    if it is available, otherwise with numpy on arrays of all interacting
+    pairs.  The Hessian is always computed with numpy.
+
+    Parameters
+    ----------
+    types : array of int
+        the species of each atom, numbered from 0 to ntypes - 1.  Not all
+        species need to be present
+    eps, sig : array
+        the (ntypes, ntypes) tables of the pair parameters.  They must be
+        symmetric
+    rcut : float or array
+        the cutoff in units of sig_ab, a scalar or a (ntypes, ntypes) table
+    shift : string
+        how the potential is shifted at the cutoff
+
+        * "quadratic" (default): A and B are chosen so that the energy and
+          the force go to zero at the cutoff.  This is the potential of
+          LJpshift
+        * "energy": A = 0 and the energy goes to zero at the cutoff
+        * "none": the potential is truncated
+    boxl : float or array, optional
+        if given, the system is in a periodic box of this size and the
+        minimum image convention is used
+    neighbor_list : bool
+        if True, only the pairs closer than rcut_ab + rskin are kept in a
+        list (built with scipy.spatial.cKDTree) which is rebuilt when an atom
+        has moved more than rskin / 2.  This makes the cost linear in the
+        number of atoms.  Otherwise all pairs are considered
+    rskin : float
+        the skin of the neighbor list
+    compiled : bool
+        if False the energy and gradient are computed with numpy even if the
+        compiled loop is available
+
+    Examples
+    --------
+    A three component mixture
+
+    >>> eps = [[1., 1.5, 1.2], [1.5, 0.5, 0.8], [1.2, 0.8, 0.7]]
+    >>> sig = [[1., 0.8, 0.9], [0.8, 0.88, 0.85], [0.9, 0.85, 0.95]]
+    >>> types = [0] * 60 + [1] * 25 + [2] * 15
+    >>> pot = MultiSpeciesLJ(types, eps, sig, boxl=4.5, neighbor_list=True)
+
+    See Also
+    --------
+    make_blj : the binary Kob-Andersen mixture of LJpshift
+    LJpshift
+    """
+    def __init__(self, types, eps, sig, rcut=2.5, shift="quadratic", boxl=None,
+                 neighbor_list=False, rskin=0.5, compiled=True):
+        self.types = np.array(types, dtype=int)
+        self.natoms = len(self.types)
+        self.eps = np.array(eps, dtype=float)
+        self.sig = np.array(sig, dtype=float)
+        if self.eps.ndim != 2 or self.eps.shape[0] != self.eps.shape[1]:
+            raise ValueError("eps must be a square table")
+        ntypes = self.eps.shape[0]
+        if self.sig.shape != (ntypes, ntypes):
+            raise ValueError("sig must be a table of shape (%d, %d)" % (ntypes, ntypes))
+        if np.any(self.types < 0) or np.any(self.types >= ntypes):
+            raise ValueError("the species must be numbered from 0 to %d" % (ntypes - 1))
+        if (np.any(self.eps != self.eps.transpose())
+                or np.any(self.sig != self.sig.transpose())):
+            raise ValueError("eps and sig must be symmetric")
+        self.ntypes = ntypes
+        self.rcut = np.ones([ntypes, ntypes]) * rcut * self.sig
+        self.shift = shift
+
+        # the parameter tables, (ntypes, ntypes)
+        sig6 = self.sig**6
+        self._eps4 = 4. * self.eps
+        self._sig6 = sig6
+        self._sig12 = sig6**2
+        self._rcut2 = self.rcut**2
+        sigrc6 = sig6 / self.rcut**6
+        sigrc12 = sigrc6**2
+        if shift == "quadratic":
+            self._A = self._eps4 * (6. * sigrc12 - 3. * sigrc6) / self.rcut**2
+            self._B = self._eps4 * (4. * sigrc6 - 7. * sigrc12)
+        elif shift == "energy":
+            self._A = np.zeros([ntypes, ntypes])
+            self._B = -self._eps4 * (sigrc12 - sigrc6)
+        elif shift == "none":
+            self._A = np.zeros([ntypes, ntypes])
+            self._B = np.zeros([ntypes, ntypes])
+        else:
+            raise ValueError("unknown shift %s" % shift)
+
+        if boxl is None:
+            self.boxl = None
+            self.periodic = False
+        else:
+            self.boxl = np.ones(3) * boxl
+            self.periodic = True
+
+        self.neighbor_list = neighbor_list
+        self.rskin = rskin
+        self.nlist_builds = 0
+        self._oldcoords = None
+        # the pairs are built on first use
+        self._i = None
+        self._j = None
+
+        self.compiled = compiled and mslj_all is not None
+        if self.compiled:
+            self._ftypes = np.array(self.types, dtype=np.int32)
+            self._fboxl = self.boxl if self.periodic else np.ones(3)
+            self._ftables = [np.asfortranarray(t) for t in
+                             (self._eps4, self._sig6, self._sig12, self._rcut2,
+                              self._A, self._B)]
+
+    def _set_pairs(self, i, j):
+        """store the pairs and look up their parameters"""
+        self._i = i
+        self._j = j
+        if self.compiled:
+            self._fi = np.array(i, dtype=np.int32)
+            self._fj = np.array(j, dtype=np.int32)
+        ti = self.types[i]
+        tj = self.types[j]
+        self._pair_eps4 = self._eps4[ti, tj]
+        self._pair_sig6 = self._sig6[ti, tj]
+        self._pair_sig12 = self._sig12[ti, tj]
+        self._pair_rcut2 = self._rcut2[ti, tj]
+        self._pair_A = self._A[ti, tj]
+        self._pair_B = self._B[ti, tj]
+
+    def _build_list(self, x):
+        """build the neighbor list for the positions x, shape (natoms, 3)"""
+        from scipy.spatial import cKDTree
+        rlist = self.rcut.max() + self.rskin
+        if self.periodic:
+            tree = cKDTree(x % self.boxl, boxsize=self.boxl)
+        else:
+            tree = cKDTree(x)
+        pairs = tree.query_pairs(rlist, output_type="ndarray")
+        # keep only the pairs within the cutoff of their own type plus the skin
+        i, j = pairs[:,0], pairs[:,1]
+        r2 = np.sum(self._minimum_image(x[j] - x[i])**2, axis=1)
+        rlist2 = (self.rcut[self.types[i], self.types[j]] + self.rskin)**2
+        keep = r2 < rlist2
+        self._set_pairs(i[keep], j[keep])
+        self._oldcoords = x.copy()
+        self.nlist_builds += 1
+
+    def _update_list(self, x):
+        if self._oldcoords is None:
+            self._build_list(x)
+            return
+        dx = self._minimum_image(x - self._oldcoords)
+        if np.max(np.sum(dx**2, axis=1)) > (0.5 * self.rskin)**2:
+            self._build_list(x)
+
+    def _update_pairs(self, x):
+        if self.neighbor_list:
+            self._update_list(x)
+        elif self._i is None:
+            i, j = np.triu_indices(self.natoms, 1)
+            self._set_pairs(i, j)
+
+    def _compiled_energy_gradient(self, coords, gtest):
+        if self.neighbor_list:
+            self._update_list(coords.reshape(-1, 3))
+            args = [self._ftypes, self._fi, self._fj]
+            kernel = mslj_pairs
+        else:
+            args = [self._ftypes]
+            kernel = mslj_all
+        args += self._ftables + [self.periodic, self._fboxl, gtest]
+        return kernel(coords, *args)
+
+    def _minimum_image(self, dr):
+        if self.periodic:
+            dr -= self.boxl * np.rint(dr / self.boxl)
+        return dr
+
+    def _pair_terms(self, coords):
+        """
+        return the separation vectors, squared distances and parameters of
+        the interacting pairs
+        """
+        x = coords.reshape(-1, 3)
+        self._update_pairs(x)
+        i, j = self._i, self._j
+        dr = self._minimum_image(x[j] - x[i])
+        r2 = np.einsum("ij,ij->i", dr, dr)
+        inside = r2 < self._pair_rcut2
+        if inside.all():
+            return (i, j, dr, r2, self._pair_eps4, self._pair_sig6,
+                    self._pair_sig12, self._pair_A, self._pair_B)
+        return (i[inside], j[inside], dr[inside], r2[inside],
+                self._pair_eps4[inside], self._pair_sig6[inside],
+                self._pair_sig12[inside], self._pair_A[inside],
+                self._pair_B[inside])
+
+    def getEnergy(self, coords):
+        if self.compiled:
+            return self._compiled_energy_gradient(coords, False)[0]
+        i, j, dr, r2, eps4, sig6, sig12, A, B = self._pair_terms(coords)
+        ir6 = 1. / r2**3
+        return np.sum(eps4 * ir6 * (sig12 * ir6 - sig6) + A * r2 + B)
+
+    def _energy_gradient_pairs(self, coords):
+        i, j, dr, r2, eps4, sig6, sig12, A, B = self._pair_terms(coords)
+        ir2 = 1. / r2
+        ir6 = ir2**3
+        E = np.sum(eps4 * ir6 * (sig12 * ir6 - sig6) + A * r2 + B)
+        # g = dV/dr / r, the gradient with respect to x_j is g * dr
+        g = eps4 * ir6 * ir2 * (6. * sig6 - 12. * sig12 * ir6) + 2. * A
+        return E, i, j, dr, r2, g, (eps4, sig6, sig12, ir2, ir6)
+
+    def getEnergyGradient(self, coords):
+        if self.compiled:
+            return self._compiled_energy_gradient(coords, True)
+        E, i, j, dr, r2, g, terms = self._energy_gradient_pairs(coords)
+        f = g[:,np.newaxis] * dr
+        natoms = self.natoms
+        grad = np.zeros([natoms, 3])
+        for k in xrange(3):
+            grad[:,k] = (np.bincount(j, f[:,k], minlength=natoms)
+                         - np.bincount(i, f[:,k], minlength=natoms))
+        return E, grad.ravel()
+
+    def getEnergyGradientHessian(self, coords):
+        E, i, j, dr, r2, g, terms = self._energy_gradient_pairs(coords)
+        eps4, sig6, sig12, ir2, ir6 = terms
+        natoms = self.natoms
+        f = g[:,np.newaxis] * dr
+        grad = np.zeros([natoms, 3])
+        for k in xrange(3):
+            grad[:,k] = (np.bincount(j, f[:,k], minlength=natoms)
+                         - np.bincount(i, f[:,k], minlength=natoms))
+
+        # the second derivative of each pair with respect to x_j is
+        # g * I + h * outer(dr, dr), with h = (dg/dr) / r
+        h = eps4 * ir6 * ir2**2 * (168. * sig12 * ir6 - 48. * sig6)
+        blocks = h[:,np.newaxis,np.newaxis] * dr[:,:,np.newaxis] * dr[:,np.newaxis,:]
+        blocks += g[:,np.newaxis,np.newaxis] * np.eye(3)
+        hess = np.zeros([natoms, 3, natoms, 3])
+        hess_diag = np.zeros([natoms, 3, 3])
+        np.add.at(hess_diag, i, blocks)
+        np.add.at(hess_diag, j, blocks)
+        np.subtract.at(hess, (i, slice(None), j), blocks)
+        np.subtract.at(hess, (j, slice(None), i), blocks)
+        atoms = np.arange(natoms)
+        hess[atoms,:,atoms,:] += hess_diag
+        return E, grad.ravel(), hess.reshape(3 * natoms, 3 * natoms)
+
+    def getHessian(self, coords):
+        return self.getEnergyGradientHessian(coords)[2]
+
+
+def make_blj(natoms, ntypeA, rcut=2.5, epsBB=0.5, sigBB=0.88, epsAB=1.5, sigAB=0.8,
+             **kwargs):
+    """
+    return the binary Kob-Andersen lennard jones mixture as a MultiSpeciesLJ
+
+    The parameters are the same as for LJpshift.  The first ntypeA atoms are
+    of type A.  Additional keyword arguments are passed to MultiSpeciesLJ.
+    """
+    types = np.zeros(natoms, dtype=int)
+    types[ntypeA:] = 1
+    eps = [[1., epsAB], [epsAB, epsBB]]
+    sig = [[1., sigAB], [sigAB, sigBB]]
+    return MultiSpeciesLJ(types, eps, sig, rcut=rcut, **kwargs)
+
+
+import unittest
+class TestMultiSpeciesLJ(unittest.TestCase):
+    def setUp(self):
+        from pygmin.optimize import mylbfgs
+        from pygmin.potentials.ljpshift import LJpshift
+        self.natoms = 20
+        self.ntypeA = 16
+        np.random.seed(0)
+        self.blj = LJpshift(self.natoms, self.ntypeA)
+        self.pot = make_blj(self.natoms, self.ntypeA)
+        x = np.random.uniform(-1, 1, 3 * self.natoms) * 1.5
+        self.coords = mylbfgs(x, self.blj, tol=1.).coords
+
+    def test_energy_gradient(self):
+        e, g = self.blj.getEnergyGradient(self.coords)
+        e1, g1 = self.pot.getEnergyGradient(self.coords)
+        self.assertAlmostEqual(e, e1, 8)
+        self.assertAlmostEqual(e, self.pot.getEnergy(self.coords), 8)
+        self.assertLess(np.max(np.abs(g - g1)), 1e-8)
+
+    def test_periodic_neighbor_list(self):
+        from pygmin.potentials.ljpshift import LJpshift
+        natoms = 64
+        boxl = 4.
+        x0 = np.random.uniform(0, boxl, 3 * natoms)
+        blj = LJpshift(natoms, 51, boxl=boxl)
+        for compiled in [True, False]:
+            pot = make_blj(natoms, 51, boxl=boxl, neighbor_list=True,
+                           compiled=compiled)
+            x = x0.copy()
+            for k in range(3):
+                e, g = blj.getEnergyGradient(x)
+                e1, g1 = pot.getEnergyGradient(x)
+                self.assertLess(abs(e - e1) / abs(e), 1e-10)
+                self.assertLess(np.max(np.abs(g - g1)) / np.max(np.abs(g)), 1e-8)
+                x = x + np.random.uniform(-0.2, 0.2, x.shape)
+            self.assertGreater(pot.nlist_builds, 1)
+
+    def test_compiled(self):
+        pot = make_blj(self.natoms, self.ntypeA, compiled=False)
+        e, g = pot.getEnergyGradient(self.coords)
+        e1, g1 = self.pot.getEnergyGradient(self.coords)
+        self.assertAlmostEqual(e, e1, 10)
+        self.assertLess(np.max(np.abs(g - g1)), 1e-10)
+        self.assertAlmostEqual(e, pot.getEnergy(self.coords), 10)
+
+    def test_hessian(self):
+        e, g, hess = self.pot.getEnergyGradientHessian(self.coords)
+        nhess = self.pot.NumericalHessian(self.coords, eps=1e-6)
+        self.assertLess(np.max(np.abs(hess - nhess)) / np.max(np.abs(hess)), 1e-5)
+
+    def test_three_species(self):
+        eps = [[1., 1.5, 1.2], [1.5, 0.5, 0.8], [1.2, 0.8, 0.7]]
+        sig = [[1., 0.8, 0.9], [0.8, 0.88, 0.85], [0.9, 0.85, 0.95]]
+        np.random.seed(1)
+        types = np.random.randint(0, 3, self.natoms)
+        types[:3] = [0, 1, 2]
+        for shift in ["quadratic", "energy", "none"]:
+            pot = MultiSpeciesLJ(types, eps, sig, shift=shift)
+            e, g = pot.getEnergyGradient(self.coords)
+            gnum = pot.NumericalDerivative(self.coords, eps=1e-6)
+            self.assertLess(np.max(np.abs(g - gnum)) / np.max(np.abs(g)), 1e-5)
+
+    def test_missing_species(self):
+        # a three species table used with only species 0 and 1
+        eps = [[1., 1.5, 1.2], [1.5, 0.5, 0.8], [1.2, 0.8, 0.7]]
+        sig = [[1., 0.8, 0.9], [0.8, 0.88, 0.85], [0.9, 0.85, 0.95]]
+        types = [0] * self.ntypeA + [1] * (self.natoms - self.ntypeA)
+        pot = MultiSpeciesLJ(types, eps, sig)
+        self.assertEqual(pot.ntypes, 3)
+        e, g = pot.getEnergyGradient(self.coords)
+        e1, g1 = self.pot.getEnergyGradient(self.coords)
+        self.assertAlmostEqual(e, e1, 10)
+        self.assertLess(np.max(np.abs(g - g1)), 1e-10)
+
+    def test_bad_types(self):
+        eps = [[1., 1.5], [1.5, 0.5]]
+        sig = [[1., 0.8], [0.8, 0.88]]
+        self.assertRaises(ValueError, MultiSpeciesLJ, [0, 1, -1], eps, sig)
+        self.assertRaises(ValueError, MultiSpeciesLJ, [0, 1, 2], eps, sig)
+        self.assertRaises(ValueError, MultiSpeciesLJ, [0, 1], eps, [[1.]])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -24,6 +24,31 @@ class BasePotential(object):
         """return the energy and gradient at the given coordinates"""
         return self.getEnergyGradientNumerical(coords)
 
+    def getEnergyGradientBatch(self, coords):
+        """return the energies and gradients of many structures
+        
+        Parameters
+        ----------
+        coords : array, shape (K, N)
+            one structure per row
+        
+        Returns
+        -------
+        energies : array, shape (K,)
+        gradients : array, shape (K, N)
+        
+        Notes
+        -----
+        This is used by BatchLBFGS.  The default implementation calls
+        getEnergyGradient for each structure.  Potentials which can evaluate
+        many structures more efficiently at once should overload it.
+        """
+        energies = np.zeros(len(coords))
+        gradients = np.zeros(np.shape(coords))
+        for i in xrange(len(coords)):
+            energies[i], gradients[i,:] = self.getEnergyGradient(coords[i])
+        return energies, gradients
+
     def getEnergyGradientNumerical(self, coords):
         return self.getEnergy(coords), self.NumericalDerivative(coords, 1e-8)
             
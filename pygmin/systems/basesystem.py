@@ -1,14 +1,16 @@
 import tempfile
 
-from pygmin.landscape import DoubleEndedConnect, DoubleEndedConnectPar
+from pygmin.landscape import DoubleEndedConnect, DoubleEndedConnectPar, \
+    SingleEndedExplorer
 from pygmin import basinhopping
 from pygmin.storage import Database
 from pygmin.takestep import RandomDisplacement, AdaptiveStepsizeTemperature
 from pygmin.utils.xyz import write_xyz
-from pygmin.optimize import mylbfgs
+from pygmin.optimize import mylbfgs, lbfgs_py
 from pygmin.transition_states._nebdriver import NEBDriver
 from pygmin.transition_states import FindTransitionState
 from pygmin.thermodynamics import logproduct_freq2, normalmodes
+from pygmin.mindist import CompareMinimaFingerprint
 
 __all__ = ["BaseParameters", "Parameters", "dict_copy_update", "BaseSystem"]
 
@@ -62,6 +64,8 @@ class Parameters(BaseParameters):
         self.double_ended_connect.local_connect_params.tsSearchParams = BaseParameters(FindTransitionState.params())
         self.double_ended_connect.local_connect_params.NEBparams = BaseParameters(NEBDriver.params())
         
+        self.single_ended_explorer = BaseParameters()
+        
         #self.double_ended_connect.local_connect_params.tsSearchParams.lowestEigenvectorQuenchParams = BaseParameters()
         #self.double_ended_connect.local_connect_params.tsSearchParams.tangentSpaceQuenchParams = BaseParameters()     
 
@@ -90,6 +94,7 @@ class BaseSystem(object):
     #. get_takestep : optional
     #. get_random_configuration : optional
     #. get_compare_exact : optional
+    #. get_fingerprint : optional
 
     Connecting Minima and Transition State Searches::
 
@@ -148,11 +153,40 @@ class BaseSystem(object):
         quencher = self.get_minimizer()
         return quencher(coords)
     
-    def get_minimizer(self, **kwargs):
-        """return a function to minimize the structure"""
-        pot = self.get_potential()
+    def get_preconditioner(self):
+        """return a preconditioner for the LBFGS minimizer, or None
+        
+        The default is None (no preconditioner).  Systems with badly
+        conditioned coordinates should override this.  The preconditioner
+        is not used unless it is put in the parameters, e.g.
+        
+            system.params.structural_quench_params.preconditioner = system.get_preconditioner()
+        
+        See Also
+        --------
+        pygmin.optimize.Preconditioner
+        """
+        return None
+    
+    def get_minimizer(self, pot=None, **kwargs):
+        """return a function to minimize the structure
+        
+        The default is mylbfgs.  If a preconditioner is passed (or set in
+        params.structural_quench_params) the preconditioned lbfgs_py is used
+        instead.  The potential is pot if given (e.g. a ProfilingPotential),
+        otherwise a new one from get_potential()
+        
+        See Also
+        --------
+        get_preconditioner
+        """
+        if pot is None:
+            pot = self.get_potential()
         kwargs = dict_copy_update(self.params["structural_quench_params"], kwargs)        
-        return lambda coords: mylbfgs(coords, pot, **kwargs)
+        if kwargs.get("preconditioner") is None:
+            kwargs.pop("preconditioner", None)
+            return lambda coords: mylbfgs(coords, pot, **kwargs)
+        return lambda coords: lbfgs_py(coords, pot, **kwargs)
     
     def get_compare_exact(self):
         """object that returns True if two structures are exact.
@@ -165,13 +199,42 @@ class BaseSystem(object):
         """
         raise NotImplementedError
 
+    def get_fingerprint(self, compare_exact=None):
+        """object which computes a cheap fingerprint of a structure
+        
+        The fingerprint is used to quickly reject candidates before calling
+        compare_exact, so it must be consistent with it (same tolerance).
+        Return None if there is no fingerprint for compare_exact.
+        It must be callable as::
+        
+            fp = fingerprint(coords)
+        
+        and have a method `fingerprint.may_match(fp1, fp2)` which returns 
+        False only if the two structures cannot be identical.
+        
+        See Also
+        --------
+        pygmin.mindist.FingerprintAtomicCluster
+        """
+        raise NotImplementedError
+
     def get_compare_minima(self):
         """a wrapper for compare exact so in input can be in 
-        Minimum Form"""
+        Minimum Form
+        
+        If the system defines get_fingerprint the fingerprints are cached
+        and used to avoid calling compare exact
+        """
         compare = self.get_compare_exact()
         if compare is None:
             return None
-        return lambda m1, m2: compare(m1.coords, m2.coords)
+        try:
+            fingerprint = self.get_fingerprint(compare)
+        except NotImplementedError:
+            fingerprint = None
+        if fingerprint is None:
+            return lambda m1, m2: compare(m1.coords, m2.coords)
+        return CompareMinimaFingerprint(compare, fingerprint)
     
     def create_database(self, *args, **kwargs):
         """return a new database object
@@ -221,16 +284,20 @@ class BaseSystem(object):
         return tsAdaptive
 
     def get_basinhopping(self, database=None, takestep=None, coords=None, add_minimum=None,
-                         **kwargs):
+                         pot=None, **kwargs):
         """return the basinhopping object with takestep
         and accept step already implemented
         
+        If pot is given it is used for the basinhopping and the quench,
+        otherwise a new potential is created
+        
         See Also
         --------
         pygmin.basinhopping
         """
         kwargs = dict_copy_update(self.params["basinhopping"], kwargs)
-        pot = self.get_potential()
+        if pot is None:
+            pot = self.get_potential()
         if coords is None:
             coords = self.get_random_configuration()
         if takestep is None:
@@ -239,7 +306,7 @@ class BaseSystem(object):
             if database is None:
                 database = self.create_database()
             add_minimum = database.minimum_adder()
-        bh = basinhopping.BasinHopping(coords, pot, takestep, quench=self.get_minimizer(),
+        bh = basinhopping.BasinHopping(coords, pot, takestep, quench=self.get_minimizer(pot=pot),
                                        storage=add_minimum,
                                        **kwargs)
         return bh
@@ -274,15 +341,21 @@ class BaseSystem(object):
         """
         raise NotImplementedError
     
-    def get_double_ended_connect(self, min1, min2, database, parallel=False, **kwargs):
+    def get_double_ended_connect(self, min1, min2, database, parallel=False, pot=None,
+                                 **kwargs):
         """return a DoubleEndedConnect object
+        
+        If pot is given it is used instead of a new potential, e.g. a
+        ProfilingPotential.  With parallel=True each worker gets a copy, so
+        only the calls made in this process are counted
     
         See Also
         --------
         pygmin.landscape
         """
         kwargs = dict_copy_update(self.params["double_ended_connect"], kwargs)
-        pot = self.get_potential()
+        if pot is None:
+            pot = self.get_potential()
         mindist = self.get_mindist()
         
         #attach the function which orthogonalizes to known zero eigenvectors.
@@ -302,12 +375,44 @@ class BaseSystem(object):
             
             if not "orthogZeroEigs" in tssp:
                 tssp["orthogZeroEigs"] = self.get_orthogonalize_to_zero_eigenvectors()
-                
+
+        #attach the function which detects duplicate transition states
+        lcp = kwargs["local_connect_params"]
+        if not "compare_exact" in lcp:
+            try:
+                lcp["compare_exact"] = self.get_compare_exact()
+            except NotImplementedError:
+                pass
+
         if parallel:
             return DoubleEndedConnectPar(min1, min2, pot, mindist, database, **kwargs)
         else:
             return DoubleEndedConnect(min1, min2, pot, mindist, database, **kwargs)
     
+    def get_single_ended_explorer(self, database, **kwargs):
+        """return a SingleEndedExplorer object
+    
+        See Also
+        --------
+        pygmin.landscape
+        """
+        kwargs = dict_copy_update(self.params["single_ended_explorer"], kwargs)
+        pot = self.get_potential()
+        
+        #attach the function which orthogonalizes to known zero eigenvectors
+        tssp = kwargs["tsSearchParams"] = BaseParameters(kwargs.get("tsSearchParams", dict()))
+        if not "orthogZeroEigs" in tssp:
+            tssp["orthogZeroEigs"] = self.get_orthogonalize_to_zero_eigenvectors()
+        
+        #attach the function which detects duplicate transition states
+        if not "compare_exact" in kwargs:
+            try:
+                kwargs["compare_exact"] = self.get_compare_exact()
+            except NotImplementedError:
+                pass
+        
+        return SingleEndedExplorer(pot, database, **kwargs)
+    
     #
     # the following functions used for getting thermodynamic information about the minima 
     #
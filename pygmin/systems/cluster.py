@@ -4,7 +4,7 @@ from pygmin.systems import BaseSystem
 from pygmin.potentials import LJ
 from pygmin.transition_states import orthogopt
 from pygmin.mindist import MinPermDistAtomicCluster, ExactMatchAtomicCluster, \
-    PointGroupOrderCluster
+    PointGroupOrderCluster, FingerprintAtomicCluster
 from pygmin.landscape import smoothPath
 from pygmin.transition_states import create_NEB
 
@@ -36,6 +36,22 @@ class AtomicCluster(BaseSystem):
         permlist = self.get_permlist()
         return ExactMatchAtomicCluster(permlist=permlist, **kwargs)
     
+    def get_fingerprint(self, compare_exact=None):
+        """return the sorted radial distribution used to filter candidates
+        before calling compare exact
+        
+        The permlist and tolerance are taken from compare_exact (default
+        get_compare_exact()).  The fingerprint is only valid for
+        ExactMatchAtomicCluster, for any other compare_exact (e.g. a periodic
+        one) None is returned.
+        """
+        if compare_exact is None:
+            compare_exact = self.get_compare_exact()
+        if type(compare_exact) is not ExactMatchAtomicCluster:
+            return None
+        return FingerprintAtomicCluster(permlist=compare_exact.measure.permlist,
+                                        tol=compare_exact.tol)
+    
     def get_mindist(self, **kwargs):
         """return a function which puts two structures in best alignment.
         
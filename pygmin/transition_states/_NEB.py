@@ -6,7 +6,7 @@ import logging
 
 from pygmin.transition_states import InterpolatedPath
 from pygmin.optimize import Result
-from pygmin.optimize import mylbfgs
+from pygmin.optimize import mylbfgs, fire2
         
 __all__ = ["NEB",]
 
@@ -60,7 +60,8 @@ class NEB(object):
         each image.  This can be used to keep neighbor lists from being rebuilt
         over and over again.
     quenchRoutine : callable
-        the quench routine to use in optimizing the band
+        the quench routine to use in optimizing the band.  The default is
+        mylbfgs.  fire2, which uses only the gradient, can be used instead
     quenchParams :
         parameters passed to the quench routine. The default tolerance for quench is 1e-4
     save_energies : bool
@@ -70,9 +71,21 @@ class NEB(object):
     verbose : integer
         verbosity level
     events : list of callables
-        list of callback functions called just before getEnergyGradient returns
+        list of callback functions called just before getEnergyGradient
+        returns.  See pygmin.optimize.ThrottledEvent for calling an event
+        less often
     use_minimizer_callback: boolean, optional
         use the callback function of theminimizer to adjust k, it is not recommended to change this to false
+    vectorize : bool, optional
+        if True (default) and `distance` is the cartesian distance, the
+        tangents and spring forces are computed for the whole band at once
+        rather than image by image.  The result is the same.
+    instrumentation : pygmin.optimize.Instrumentation, optional
+        if given, the gradient evaluations of the images and the event
+        calls are counted and the time spent in getEnergyGradient is
+        recorded in the phases "potential", "band forces" and "events".
+        To instrument the minimizer as well, pass a separate object in
+        quenchParams
 
     Notes
     -----
@@ -89,8 +102,10 @@ class NEB(object):
                  k=100.0, adjustk_freq=0, adjustk_tol=0.1,adjustk_factor=1.05,
                  with_springenergy=False, dneb=True,
                  copy_potential=False, quenchParams=dict(), quenchRoutine=None,
-                 save_energies=False, verbose=-1, events=None, use_minimizer_callback=True):
+                 save_energies=False, verbose=-1, events=None, use_minimizer_callback=True,
+                 vectorize=True, instrumentation=None):
         self.distance = distance
+        self.vectorize = vectorize
         self.potential = potential
         self.k = k
         self.verbose = verbose
@@ -100,6 +115,7 @@ class NEB(object):
             self.events = []
         else:
             self.events = events
+        self.instrumentation = instrumentation
         
         nimages = len(path)
         self.nimages = nimages
@@ -143,6 +159,10 @@ class NEB(object):
         
         self.distances = np.zeros(self.nimages - 1)
         self.rms = 0.
+        self.quench_H0 = None
+        
+        # work array holding the whole band, including the end points
+        self._band = self.coords.copy()
 
     def optimize(self, quenchRoutine=None,
                  **kwargs):
@@ -157,7 +177,11 @@ class NEB(object):
         following, but we can't rely on the energy for, e.g. determining
         step size, which is the default behavior for many optimizers.  This
         can be worked around by choosing a small step size and a large
-        maxErise, or by using an optimizer that uses only gradients.
+        maxErise, or by using an optimizer that uses only gradients, such as
+        fire2.  The LBFGS parameters maxErise, M, H0 and rel_energy are
+        ignored for fire2.  fire2 is not the default: in DoubleEndedConnect
+        it needed more gradient evaluations than mylbfgs, and it has no
+        inverse Hessian estimate (quench_H0) for the transition state search.
 
         scipy.lbfgs_b seems to work with NEB pretty well, but lbfgs_py and
         mylbfgs tend to fail.  If you must use one of those try, e.g.
@@ -175,6 +199,9 @@ class NEB(object):
         quenchParams = dict([("nsteps", 300)] +
                             self.quenchParams.items() +
                             kwargs.items())
+        if quenchRoutine is fire2:
+            for key in ["maxErise", "M", "H0", "rel_energy"]:
+                quenchParams.pop(key, None)
 
         if quenchParams.has_key("iprint"):
             self.iprint = quenchParams["iprint"]
@@ -192,6 +219,8 @@ class NEB(object):
 #            qres = qres[4]
         
         self.active[:,:] = qres.coords.reshape(self.active.shape)
+        # the inverse Hessian diagonal of the minimizer, if it has one
+        self.quench_H0 = getattr(qres, "H0", None)
         if self.copy_potential:
             for i in xrange(0,self.nimages):
                 pot = self.potential_list[i]
@@ -211,10 +240,22 @@ class NEB(object):
             
         return res
 
+    def set_path(self, path):
+        """
+        replace the images of the band without changing the number of images
+        
+        This is used to reinterpolate the band between optimizations without
+        constructing a new NEB object.  The energies of the images are updated
+        on the next call to getEnergyGradient.
+        """
+        assert len(path) == self.nimages
+        for i, x in enumerate(path):
+            self.coords[i,:] = x
+
     def _getRealEnergyGradient(self, coordsall):
         # calculate real energy and gradient along the band. energy is needed for tangent
         # construction
-        realgrad = np.zeros(coordsall.shape)
+        realgrad = self._get_work("_realgrad", *coordsall.shape)
         if self.copy_potential:
             for i in xrange(1, self.nimages-1):
                 pot = self.potential_list[i]
@@ -237,29 +278,39 @@ class NEB(object):
             coordinates of the whole neb active images (no end points)
         """
         # make array access a bit simpler, create array which contains end images
-        tmp = self.coords.copy()
+        tmp = self._band
+        tmp[0,:] = self.coords[0,:]
+        tmp[-1,:] = self.coords[-1,:]
         tmp[1:self.nimages-1,:] = coords1d.reshape(self.active.shape)
-        grad = np.zeros(self.active.shape)
+        instr = self.instrumentation
+        if instr is not None:
+            t0 = instr.clock()
 
         # calculate real energy and gradient along the band. energy is needed for tangent
         # construction
         realgrad = self._getRealEnergyGradient(tmp)
+        if instr is not None:
+            t0 = instr.lap("potential", t0)
+            instr.count("getEnergyGradient", self.nimages - 2)
 
-        #print "Spring forces"
         # the total energy of images, band is neglected
         E = sum(self.energies)
-        Eneb = 0
-        # build forces for all images
-        for i in xrange(1, self.nimages-1):
-            En, grad[i-1,:] = self.NEBForce(
-                    self.isclimbing[i],
-                    [self.energies[i],tmp[i, :]],
-                    [self.energies[i-1],tmp[i-1, :]],
-                    [self.energies[i+1],tmp[i+1, :]],
-                    realgrad[i,:],
-                    i
-                    )
-            Eneb += En
+        if self.vectorize and self.distance is distance_cart:
+            Eneb, grad = self._band_forces(tmp, realgrad)
+        else:
+            grad = np.zeros(self.active.shape)
+            Eneb = 0
+            # build forces for all images
+            for i in xrange(1, self.nimages-1):
+                En, grad[i-1,:] = self.NEBForce(
+                        self.isclimbing[i],
+                        [self.energies[i],tmp[i, :]],
+                        [self.energies[i-1],tmp[i-1, :]],
+                        [self.energies[i+1],tmp[i+1, :]],
+                        realgrad[i,:],
+                        i
+                        )
+                Eneb += En
         if self.iprint > 0:
             if self.getEnergyCount % self.iprint == 0 and self.save_energies:
                 self.printState()
@@ -267,16 +318,103 @@ class NEB(object):
         #print "ENeb = ", Eneb
         if not self.use_minimizer_callback:
             self._step(coords1d)
+        if instr is not None:
+            t0 = instr.lap("band forces", t0)
         
-        rms = np.linalg.norm(grad) / np.sqrt(self.active.size)
-        
-        for event in self.events:
-            event(path=tmp, energies=self.energies,
-                       distances=self.distances, stepnum=self.getEnergyCount, rms=rms)
+        if self.events:
+            rms = np.linalg.norm(grad) / np.sqrt(self.active.size)
+            for event in self.events:
+                event(path=tmp, energies=self.energies,
+                           distances=self.distances, stepnum=self.getEnergyCount, rms=rms)
+            if instr is not None:
+                instr.lap("events", t0)
+                instr.count("events", len(self.events))
             
         return E+Eneb, grad.reshape(grad.size)
         #return 0., grad.reshape(grad.size)
 
+    def _band_forces(self, band, realgrad):
+        """
+        Calculate the NEB forces for all images at once
+        
+        This is the same as calling NEBForce for each image, but the tangents,
+        spring forces and DNEB projections are computed on the
+        (nimages, ndof) array.  It is only valid for the cartesian distance.
+        
+        Returns
+        -------
+        Eneb : float
+            the spring energy, zero if with_springenergy is False
+        grad : np.array
+            the NEB gradient for the active images, shape (nimages-2, ndof)
+        """
+        # d[i] = x_{i+1} - x_i.  The gradient to the left image of image i is
+        # d[i-1] and the gradient to the right image is -d[i]
+        d = np.subtract(band[1:], band[:-1], out=self._get_work("_d", band.shape[0]-1, band.shape[1]))
+        dnorm = np.sqrt(np.einsum("ij,ij->i", d, d))
+        self.distances[:] = dnorm
+        dleft = d[:-1]
+        dright = d[1:]
+        
+        # uphill tangent, see NEB.tangent
+        central = self.energies[1:-1]
+        left = self.energies[:-2]
+        right = self.energies[2:]
+        vmax = np.maximum(np.abs(central - left), np.abs(central - right))
+        vmin = np.minimum(np.abs(central - left), np.abs(central - right))
+        extremum = ((central >= left) & (central >= right)) | ((central <= left) & (central <= right))
+        swap = central <= left
+        vmax, vmin = np.where(swap, vmin, vmax), np.where(swap, vmax, vmin)
+        left_higher = left > right
+        wleft = np.where(extremum, np.where(left_higher, vmax, vmin), left_higher)
+        wright = np.where(extremum, np.where(left_higher, vmin, vmax), ~left_higher)
+        
+        t = self._get_work("_t", len(central), band.shape[1])
+        np.multiply(wleft[:,np.newaxis], dleft, out=t)
+        t += wright[:,np.newaxis] * dright
+        t /= np.sqrt(np.einsum("ij,ij->i", t, t))[:,np.newaxis]
+        
+        # spring gradient
+        if self.dneb:
+            gspring = self.k * (dleft - dright)
+        else:
+            gspring = (self.k * (dnorm[:-1] - dnorm[1:]))[:,np.newaxis] * t
+        
+        greal = realgrad[1:-1]
+        
+        # project out the parallel part of the real gradient and add the
+        # parallel part of the spring
+        gperp = greal - np.einsum("ij,ij->i", greal, t)[:,np.newaxis] * t
+        gs_par = np.einsum("ij,ij->i", gspring, t)[:,np.newaxis] * t
+        grad = gperp + gs_par
+        
+        if self.dneb:
+            # double nudging
+            gs_perp = gspring - gs_par
+            grad += gs_perp
+            grad -= (np.einsum("ij,ij->i", gs_perp, gperp) /
+                     np.einsum("ij,ij->i", gperp, gperp))[:,np.newaxis] * gperp
+        
+        climbing = np.array(self.isclimbing[1:-1], dtype=bool)
+        if climbing.any():
+            gc = greal[climbing]
+            tc = t[climbing]
+            grad[climbing] = gc - 2. * np.einsum("ij,ij->i", gc, tc)[:,np.newaxis] * tc
+        
+        Eneb = 0.
+        if self.with_springenergy:
+            Es = 0.5 * np.einsum("ij,ij->i", gspring, gspring) / self.k
+            Eneb = np.sum(Es[~climbing])
+        return Eneb, grad
+    
+    def _get_work(self, name, n, m):
+        """return a preallocated work array of shape (n, m)"""
+        work = getattr(self, name, None)
+        if work is None or work.shape != (n, m):
+            work = np.zeros([n, m])
+            setattr(self, name, work)
+        return work
+
     def tangent_old(self, central, left, right, gleft, gright):
         """
         Old tangent construction based on average of neighbouring images
@@ -357,7 +495,7 @@ class NEB(object):
         
         t = self.tangent(image[0],left[0],right[0], g_left, g_right)
         if(isclimbing):
-            return greal - 2.*np.dot(greal, t) * t
+            return 0., greal - 2.*np.dot(greal, t) * t
 
         if self.dneb:
             g_spring = self.k*(g_left + g_right)
@@ -473,6 +611,10 @@ class NEB(object):
         import copy        
         neb = copy.copy(self)
         neb.coords = neb.coords.copy()
+        neb._band = neb.coords.copy()
+        neb._d = None
+        neb._t = None
+        neb._realgrad = None
         neb.energies = neb.energies.copy()
         neb.isclimbing = copy.deepcopy(neb.isclimbing)
         
@@ -487,6 +629,52 @@ class NEB(object):
 # only testing stuff below here
 #
 
+import unittest
+
+class TestNEBVectorize(unittest.TestCase):
+    """the vectorized band forces must agree with the loop over NEBForce"""
+    def setUp(self):
+        from pygmin.systems import LJCluster
+        from interpolate import InterpolatedPath
+        np.random.seed(0)
+        system = LJCluster(13)
+        self.pot = system.get_potential()
+        x1 = system.get_random_minimized_configuration().coords
+        x2 = system.get_random_minimized_configuration().coords
+        dist, x1, x2 = system.get_mindist()(x1, x2)
+        self.path = [x.copy() for x in InterpolatedPath(x1, x2, 10)]
+        # move the images off the straight line
+        for x in self.path[1:-1]:
+            x += np.random.uniform(-0.05, 0.05, x.shape)
+
+    def check(self, climbing=False, **kwargs):
+        results = []
+        for vectorize in [True, False]:
+            neb = NEB(self.path, self.pot, k=100., vectorize=vectorize, **kwargs)
+            if climbing:
+                neb.MakeHighestImageClimbing()
+                neb.isclimbing[2] = True
+            E, grad = neb.getEnergyGradient(neb.active.ravel().copy())
+            results.append((E, grad, neb.distances.copy()))
+        (E1, g1, d1), (E2, g2, d2) = results
+        self.assertAlmostEqual(E1, E2, 8)
+        self.assertLess(np.max(np.abs(g1 - g2)), 1e-8)
+        self.assertLess(np.max(np.abs(d1 - d2)), 1e-10)
+
+    def test_dneb(self):
+        self.check(dneb=True)
+
+    def test_no_dneb(self):
+        self.check(dneb=False)
+
+    def test_climbing(self):
+        self.check(dneb=True, climbing=True)
+        self.check(dneb=False, climbing=True)
+
+    def test_springenergy(self):
+        self.check(with_springenergy=True)
+        self.check(with_springenergy=True, dneb=False, climbing=True)
+
 import nebtesting as test
 
 def nebtest(MyNEB=NEB, nimages=22):
@@ -16,6 +16,7 @@ Local transition state search
     
     FindTransitionState
     findTransitionState
+    BofillTransitionState
 
 Lowest eigenvalue search
 ++++++++++++++++++++++++
@@ -34,6 +35,7 @@ The user should interact via the driver class:
     :toctree: generated/
     
     NEBDriver
+    GrowingStringDriver
 
 In the backend, the work is done by the following functions. 
 
@@ -82,6 +84,8 @@ from _NEB_parallel import *
 from dimer import *
 from find_lowest_eig import *
 from transition_state_refinement import *
+from _quasi_newton_ts import *
 from tstools import *
 from _NEB_wrapper import *
 from _nebdriver import *
+from _growing_string import *
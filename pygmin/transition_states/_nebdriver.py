@@ -3,8 +3,9 @@ import numpy as np
 
 from pygmin.transition_states import NEB, NEBPar
 from pygmin.transition_states._NEB import distance_cart
-from interpolate import InterpolatedPath, interpolate_linear
+from interpolate import InterpolatedPath, interpolate_linear, interpolate_spline
 from pygmin.utils.events import Signal
+from pygmin.optimize import ThrottledEvent
 
 all = ["NEBDriver"]
 
@@ -56,6 +57,15 @@ class NEBDriver(object):
         adjust number of images on reinterpolate to match image density
     adaptive_niter : bool
         adjust number of iterations if nimages is adjusted
+    spline : bool
+        if True, reinterpolate the path with a cubic spline through the
+        images rather than piecewise linear.  This is only used with
+        the cartesian distance, otherwise the interpolator is used.
+    image_energy_weight : float
+        if positive, the images are not placed equidistantly on reinterpolation.
+        The image density along the path is proportional to
+        1 + image_energy_weight * (E - Emin) / (Emax - Emin), so more
+        images are placed near the energy maxima
     factor : int
         The number of images is multiplied by this factor.  If the number of 
         images is already at it's maximum, then the number of iterations is 
@@ -69,6 +79,10 @@ class NEBDriver(object):
         the function used to do the path interpolation for the NEB
     NEBquenchParams : dict
         parameters passed to the minimizer
+    update_frequency : int
+        update_event is raised only every update_frequency gradient
+        evaluations of the band.  If nothing is connected to update_event
+        when run() is called the band doesn't raise any events at all
     kwargs : keyword options
         additional options are passed to the NEB class
         
@@ -84,7 +98,9 @@ class NEBDriver(object):
                  verbose=0, factor=1., NEBquenchParams=None, adjustk_freq=0, 
                  adjustk_tol=0.1, adjustk_factor=1.05, dneb=True,
                  reinterpolate=0, adaptive_nimages = False, adaptive_niter=False,
-                 interpolator=interpolate_linear, distance=distance_cart, parallel=False, ncores=4, **kwargs):
+                 spline=False, image_energy_weight=0.,
+                 interpolator=interpolate_linear, distance=distance_cart, parallel=False, ncores=4,
+                 update_frequency=1, **kwargs):
         
         self.potential = potential
         self.interpolator = interpolator
@@ -96,6 +112,7 @@ class NEBDriver(object):
         self.image_density = image_density
         self.iter_density = iter_density
         self.update_event = Signal()
+        self.update_frequency = update_frequency
         self.coords1 = coords1
         self.coords2 = coords2   
         self.reinterpolate = reinterpolate
@@ -104,6 +121,8 @@ class NEBDriver(object):
         self.k = k
         self.adaptive_images = adaptive_nimages
         self.adaptive_niter = adaptive_niter
+        self.spline = spline
+        self.image_energy_weight = image_energy_weight
         
         self._kwargs["adjustk_freq"]=adjustk_freq
         self._kwargs["adjustk_tol"]=adjustk_tol
@@ -136,6 +155,8 @@ class NEBDriver(object):
         params["reinterpolate"] = obj.reinterpolate
         params["adaptive_nimages"] = obj.adaptive_images
         params["adaptive_niter"] = obj.adaptive_niter
+        params["spline"] = obj.spline
+        params["image_energy_weight"] = obj.image_energy_weight
         
         params["verbose"] = obj.verbose
         params["NEBquenchParams"] = obj.quenchParams.copy()
@@ -180,9 +201,7 @@ class NEBDriver(object):
         nimages = len(self.path)
         #if nimages is already max_images then increasing the number
         #of images with factor will have no effect.  so double the number of steps instead
-        niter = int(self.iter_density * self.nimages)
-        if self.factor > 1. and self.nimages == self.max_images and self.max_images > 0:
-            niter *= self.factor
+        niter = self._get_niter(self.nimages)
         
         quenchParams["nsteps"] = niter    
         
@@ -197,13 +216,19 @@ class NEBDriver(object):
         
         self.niter = niter
         k = self.last_k
+        neb = None
         while True:       
-            neb = self._nebclass(self.path, self.potential, k=k,
-                      quenchParams=quenchParams, verbose=self.verbose,
-                      distance=self.distance, **self._kwargs)
-            self.neb = neb
-            
-            neb.events.append(self._process_event)
+            if neb is not None and self._nebclass is NEB and len(self.path) == neb.nimages:
+                # reuse the band, only the images have changed
+                neb.set_path(self.path)
+            else:
+                neb = self._nebclass(self.path, self.potential, k=k,
+                          quenchParams=quenchParams, verbose=self.verbose,
+                          distance=self.distance, **self._kwargs)
+                self.neb = neb
+                if self.update_event.has_slots():
+                    neb.events.append(ThrottledEvent(self._process_event,
+                                                     self.update_frequency))
             res = neb.optimize()
             self.last_k=neb.k
             
@@ -223,7 +248,7 @@ class NEBDriver(object):
             distances = []
             for i in xrange(len(res.path)-1):           
                 distances.append(np.sqrt(self.distance(res.path[i], res.path[i+1])[0]))
-            path = self._reinterpolate(res.path, distances)
+            path = self._reinterpolate(res.path, distances, res.energy)
             self.path = path
             if self.adaptive_niter:
                 self.niter = int(self.iter_density * len(path))
@@ -233,43 +258,64 @@ class NEBDriver(object):
                 logger.info("NEB reinterpolating path, %d images, niter is %d"%(len(path),self.niter))
         
         
-    def generate_path(self, coords1, coords2):
+    def _get_niter(self, nimages):
+        niter = int(self.iter_density * nimages)
+        if self.factor > 1. and nimages == self.max_images and self.max_images > 0:
+            niter *= self.factor
+        return niter
+
+    def _get_nimages(self, coords1, coords2):
         #determine the number of images to use
         dist, tmp = self.distance(coords1, coords2)
         dist=np.sqrt(dist)
         nimages = int(max(1., dist) * self.image_density * self.factor)
         if self.max_images > 0:
             nimages = min(nimages, self.max_images)
+        return nimages
+
+    def generate_path(self, coords1, coords2):
+        nimages = self._get_nimages(coords1, coords2)
         path = InterpolatedPath(coords1, coords2, nimages, interpolator=self.interpolator)
 
         return [x for x in path]
 
-    def _reinterpolate(self, path, distances):
+    def _reinterpolate(self, path, distances, energies=None):
         acc_dist = np.sum(distances)
         nimages = len(path)
         if self.adaptive_images:
             nimages = int(int(max(1., acc_dist) * self.image_density * self.factor))
         if self.max_images > 0:
             nimages = int(min(nimages, self.max_images))
-            
-        newpath = []
-        newpath.append(path[0].copy())
         
-        icur=0
-        s_cur = 0.
-        s_next=distances[icur]
+        # arc length of the old images and the new images
+        s = np.zeros(len(path))
+        s[1:] = np.cumsum(distances)
+        snew = self._image_positions(s, energies, nimages)
         
-        for i in xrange(1,nimages-1):
-            s = float(i)*acc_dist / (nimages-1)
-            while s > s_next:
-                icur+=1
-                s_cur = s_next
-                s_next+=distances[icur]
-            
-            t = (s - s_cur)/(s_next - s_cur)
-            newpath.append(self.interpolator(path[icur], path[icur+1], t))
+        if self.spline and self.distance is distance_cart and np.all(np.diff(s) > 0):
+            newpath = list(interpolate_spline(s, np.array(path), snew[1:-1]))
+        else:
+            newpath = []
+            icur = np.clip(np.searchsorted(s, snew[1:-1], side="right") - 1, 0, len(path)-2)
+            for sn, i in zip(snew[1:-1], icur):
+                t = (sn - s[i]) / (s[i+1] - s[i])
+                newpath.append(self.interpolator(path[i], path[i+1], t))
+        newpath.insert(0, path[0].copy())
         newpath.append(path[-1].copy())
         return newpath
+    
+    def _image_positions(self, s, energies, nimages):
+        """return the arc lengths at which to place the new images"""
+        w = np.ones(len(s))
+        if self.image_energy_weight > 0. and energies is not None:
+            energies = np.asarray(energies)
+            erange = energies.max() - energies.min()
+            if erange > 0.:
+                w += self.image_energy_weight * (energies - energies.min()) / erange
+        # cumulative weighted arc length (trapezoidal rule)
+        W = np.zeros(len(s))
+        W[1:] = np.cumsum(0.5 * (w[1:] + w[:-1]) * np.diff(s))
+        return np.interp(np.linspace(0., W[-1], nimages), W, s)
        
     def _process_event(self, path=None, energies=None, distances=None, stepnum=None, rms=None):
         self.update_event(path=path, energies=energies,
@@ -284,4 +330,65 @@ class NEBDriver(object):
         self.update_event(path=res.path, energies=res.energy,
                        distances=np.array(distances), stepnum=res.nsteps,
                        rms=res.rms, k=self.neb.k, event="final")
-        
\ No newline at end of file
+
+import unittest
+
+class TestReinterpolate(unittest.TestCase):
+    """reinterpolation of a path with an energy barrier in the middle"""
+    def setUp(self):
+        np.random.seed(0)
+        self.s = np.cumsum(np.append(0., np.random.uniform(0.5, 1.5, 14)))
+        self.s /= self.s[-1]
+        self.path = [np.array([np.cos(x), np.sin(x)]) for x in self.s]
+        self.distances = np.array([np.linalg.norm(self.path[i+1] - self.path[i]) 
+                                   for i in range(len(self.path)-1)])
+        self.energies = np.exp(-((self.s - 0.5) / 0.1)**2)
+
+    def reinterpolate(self, **kwargs):
+        neb = NEBDriver(None, self.path[0], self.path[-1], **kwargs)
+        return neb, neb._reinterpolate(self.path, self.distances, self.energies)
+
+    def count_near_maximum(self, newpath):
+        x = np.array([np.arctan2(y[1], y[0]) for y in newpath])
+        return np.sum(np.abs(x - 0.5) < 0.15)
+
+    def check_end_points(self, newpath):
+        self.assertEqual(len(newpath), len(self.path))
+        self.assertTrue(np.all(newpath[0] == self.path[0]))
+        self.assertTrue(np.all(newpath[-1] == self.path[-1]))
+
+    def test_uniform(self):
+        neb, newpath = self.reinterpolate()
+        self.check_end_points(newpath)
+        d = [np.linalg.norm(newpath[i+1] - newpath[i]) for i in range(len(newpath)-1)]
+        self.assertLess(np.max(d) - np.min(d), 1e-3)
+
+    def test_image_positions(self):
+        neb = NEBDriver(None, self.path[0], self.path[-1], image_energy_weight=4.)
+        snew = neb._image_positions(self.s, self.energies, 15)
+        self.assertEqual(snew[0], self.s[0])
+        self.assertAlmostEqual(snew[-1], self.s[-1], 14)
+        self.assertTrue(np.all(np.diff(snew) > 0.))
+        ds = np.diff(snew)
+        imax = np.argmin(np.abs(snew[:-1] + 0.5 * ds - 0.5))
+        self.assertLess(ds[imax], ds[0])
+        self.assertLess(ds[imax], ds[-1])
+
+    def test_energy_weight(self):
+        neb, uniform = self.reinterpolate()
+        for spline in [False, True]:
+            neb, newpath = self.reinterpolate(image_energy_weight=4., spline=spline)
+            self.check_end_points(newpath)
+            self.assertGreater(self.count_near_maximum(newpath), 
+                               self.count_near_maximum(uniform))
+
+    def test_spline(self):
+        neb, newpath = self.reinterpolate(spline=True)
+        self.check_end_points(newpath)
+        s = np.append(0., np.cumsum(self.distances))
+        snew = neb._image_positions(s, self.energies, len(self.path))
+        spline = interpolate_spline(s, np.array(self.path), snew[1:-1])
+        self.assertLess(np.max(np.abs(np.array(newpath[1:-1]) - spline)), 1e-14)
+
+if __name__ == "__main__":
+    unittest.main()
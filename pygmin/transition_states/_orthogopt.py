@@ -1,10 +1,18 @@
 import numpy as np
 
 from _orthogoptf import orthogopt as orthogoptf
-from pygmin.transition_states.zeroev import zeroEV_translation, zeroEV_rotation
+from pygmin.transition_states.zeroev import zeroEV_translation, zeroEV_rotation, \
+    zeroEV_cluster, ZeroEVBasisCache
 
 __all__ = ["orthogopt", "orthogopt_translation_only"]
 
+# for large clusters the projection onto a cached orthonormal basis is
+# faster than the iterative fortran orthogonalization.  For small clusters
+# the python overhead of the cache lookup dominates.
+_cache_min_atoms = 150
+_cluster_basis_cache = ZeroEVBasisCache(zeroEV_cluster)
+_translation_basis_cache = ZeroEVBasisCache(zeroEV_translation)
+
 def orthogopt(v, coords, norm=False, translation_only=False):
     """
     make a vector orthogonal to eigenvectors of the Hessian corresponding to overall 
@@ -25,7 +33,22 @@ def orthogopt(v, coords, norm=False, translation_only=False):
     -------
     v : 
         the orthogonalized vector
+
+    Notes
+    -----
+    For clusters with more than 150 atoms v is projected onto the
+    orthonormal basis of the zero eigenvectors, which is cached for the
+    last few structures (see ZeroEVBasisCache).  This is faster when the
+    same structure is used many times, as in the lowest eigenvector search.
     """
+    if len(coords) >= 3 * _cache_min_atoms:
+        if translation_only:
+            _translation_basis_cache.orthogonalize(v, coords)
+        else:
+            _cluster_basis_cache.orthogonalize(v, coords)
+        if norm:
+            v /= np.linalg.norm(v)
+        return v
     orthogoptf(v, coords, norm, translation_only)
     return v
 
@@ -148,6 +171,25 @@ class TestOrthogopt(unittest.TestCase):
             #print np.dot(u, vec)
             self.assertAlmostEqual(0., np.dot(u, vec), 5)
 
+    def test_cached(self):
+        """test orthogopt for large clusters, which uses the cached basis"""
+        from pygmin.transition_states import zeroEV_cluster
+        natoms = 200
+        coords = np.random.uniform(-3,3,natoms*3)
+        for i in range(2):
+            vec = np.random.uniform(-1,1,natoms*3)
+            vec = orthogopt(vec, coords, norm=True)
+            self.assertAlmostEqual(1., np.linalg.norm(vec), 7)
+            for u in zeroEV_cluster(coords):
+                self.assertAlmostEqual(0., np.dot(u, vec), 7)
+        
+        vec = np.random.uniform(-1,1,natoms*3)
+        vec = orthogopt_translation_only(vec, coords)
+        for u in zeroEV_translation(coords):
+            self.assertAlmostEqual(0., np.dot(u, vec), 7)
+        for u in zeroEV_rotation(coords):
+            self.assertNotAlmostEqual(0., np.dot(u, vec), 5)
+
     def test_translation_only(self):
         """test orthogopt with translations only""" 
         from pygmin.transition_states import zeroEV_cluster
@@ -0,0 +1,334 @@
+import numpy as np
+import logging
+
+from pygmin.optimize import Result
+from pygmin.potentials import BasePotential
+from pygmin.transition_states import orthogopt, orthogopt_translation_only
+from pygmin.transition_states.zeroev import zeroEV_cluster, zeroEV_translation, \
+    ZeroEVBasisCache, _orthonormal_basis
+from pygmin.transition_states.transition_state_refinement import FindTransitionState
+
+__all__ = ["BofillTransitionState"]
+
+logger = logging.getLogger("pygmin.connect.findTS")
+
+def _hessian_nfev(pot, ndof):
+    """
+    return the number of gradient evaluations of pot.getEnergyGradientHessian
+    
+    Potentials which don't override getEnergyGradientHessian use the
+    numerical Hessian of BasePotential, which takes 2*ndof gradient
+    evaluations.  All others are assumed to compute it analytically.
+    """
+    method = getattr(type(pot), "getEnergyGradientHessian", None)
+    if getattr(method, "im_func", None) is BasePotential.getEnergyGradientHessian.im_func:
+        return 1 + 2 * ndof
+    return 1
+
+def _zeroEV_from_orthogonalizer(orthogZeroEigs):
+    """
+    return a function which computes the zero eigenvectors removed by orthogZeroEigs
+    
+    The zero eigenvectors span the vectors v - orthogZeroEigs(v, coords).  They
+    are found by applying orthogZeroEigs to random vectors until one of them is
+    linearly dependent on the previous ones.  This takes a few more calls than
+    there are zero eigenvectors, rather than one call per degree of freedom.
+    """
+    def zeroEV(coords):
+        random_state = np.random.RandomState(0)
+        vecs = []
+        while len(vecs) < coords.size:
+            v = random_state.normal(size=coords.shape)
+            vecs.append(v - orthogZeroEigs(v.copy(), coords))
+            basis = _orthonormal_basis(vecs, coords.size)
+            if len(basis) < len(vecs):
+                return list(basis)
+        return list(_orthonormal_basis(vecs, coords.size))
+    return zeroEV
+
+class BofillTransitionState(FindTransitionState):
+    """
+    quasi-Newton transition state search with a Bofill updated Hessian
+
+    This is an alternative to the hybrid eigenvector following of
+    FindTransitionState for systems with up to a few hundred degrees of
+    freedom.  The full Hessian is computed once at the starting point.  It
+    is then updated after each step with the Bofill update, which mixes the
+    symmetric rank one and Powell symmetric Broyden updates and does not
+    enforce a positive definite Hessian.  The step is a partitioned rational
+    function optimization (P-RFO) step which maximizes along one mode and
+    minimizes along all others.  Each step takes only one gradient
+    evaluation and convergence is quadratic near the saddle point.
+
+    Parameters
+    ----------
+    coords, pot :
+        see FindTransitionState
+    trust_radius : float
+        the maximum step size
+    kwargs :
+        all other parameters are passed to FindTransitionState.  tol,
+        nsteps, event, stop_criterion, eigenvec0, orthogZeroEigs and iprint
+        are used.  The parameters for the lowest eigenvector search are used
+        for the final check of the lowest eigenvalue.
+
+    Notes
+    -----
+    The known zero eigenvectors are projected out of the gradient and the
+    Hessian at each step.  For orthogopt and orthogopt_translation_only the
+    zero eigenvectors are known (zeroEV_cluster, zeroEV_translation).  For any
+    other orthogZeroEigs they are found by applying it to a few random
+    vectors.  The orthonormal basis is kept in a ZeroEVBasisCache.
+
+    nfev counts gradient evaluations.  If the potential has no analytic
+    Hessian, the initial numerical Hessian counts as 2*ndof + 1.
+
+    If eigenvec0 is given, the mode with the largest overlap with eigenvec0
+    is maximized in the first step.  After that the mode with the
+    largest overlap with the previously followed mode is used.
+
+    "An algorithm for the location of transition states"
+    J. Baker, J. Comput. Chem. 7, 385 (1986)
+
+    "Updated Hessian matrix and the restricted step method for locating
+    transition structures"
+    J. M. Bofill, J. Comput. Chem. 15, 1 (1994)
+
+    Use it from LocalConnect with tsSearchParams["method"] = "bofill".
+
+    See Also
+    --------
+    FindTransitionState
+    findTransitionState
+    """
+    def __init__(self, coords, pot, trust_radius=0.1, **kwargs):
+        super(BofillTransitionState, self).__init__(coords, pot, **kwargs)
+        self.trust_radius = trust_radius
+        if self.orthogZeroEigs == 0:
+            self.orthogZeroEigs = orthogopt
+        self.nfev = 0
+        if self.orthogZeroEigs is None:
+            self._zev_cache = None
+        elif self.orthogZeroEigs is orthogopt:
+            self._zev_cache = ZeroEVBasisCache(zeroEV_cluster, max_size=2)
+        elif self.orthogZeroEigs is orthogopt_translation_only:
+            self._zev_cache = ZeroEVBasisCache(zeroEV_translation, max_size=2)
+        else:
+            self._zev_cache = ZeroEVBasisCache(
+                    _zeroEV_from_orthogonalizer(self.orthogZeroEigs), max_size=2)
+
+    def _getProjector(self, coords):
+        """return the projector onto the space orthogonal to the zero eigenvectors"""
+        P = np.eye(len(coords))
+        if self._zev_cache is not None:
+            basis = self._zev_cache.get_basis(coords)
+            P -= np.dot(basis.transpose(), basis)
+        return P
+
+    def _getEnergyGradient(self, coords):
+        self.nfev += 1
+        return self.pot.getEnergyGradient(coords)
+
+    def _bofillUpdate(self, H, s, y):
+        """update the Hessian H in place using the step s and the gradient change y"""
+        xi = y - np.dot(H, s)
+        xis = np.dot(xi, s)
+        ss = np.dot(s, s)
+        xixi = np.dot(xi, xi)
+        if ss == 0. or xixi == 0.:
+            return
+        psb = ((np.outer(xi, s) + np.outer(s, xi)) / ss
+               - xis * np.outer(s, s) / ss**2)
+        phi = xis**2 / (xixi * ss)
+        H += (1. - phi) * psb
+        if phi > 1e-8:
+            H += phi * np.outer(xi, xi) / xis
+
+    def _prfoStep(self, H, grad, P, follow):
+        """
+        return the P-RFO step and the new mode to follow
+
+        The zero eigenvectors are shifted to a large positive eigenvalue so
+        they are never followed and no step is taken along them
+        """
+        Hp = np.dot(P, np.dot(H, P))
+        shift = 1e3 * max(1., np.max(np.abs(np.diag(Hp))))
+        Hp += shift * (np.eye(len(grad)) - P)
+        b, V = np.linalg.eigh(Hp)
+        F = np.dot(V.transpose(), grad)
+
+        if follow is None:
+            im = 0
+        else:
+            im = np.argmax(np.abs(np.dot(V.transpose(), follow)))
+
+        # maximize along mode im
+        lp = 0.5 * b[im] + 0.5 * np.sqrt(b[im]**2 + 4. * F[im]**2)
+        step = -F[im] / (b[im] - lp) * V[:,im]
+
+        # minimize along all other modes.  the shift is the lowest eigenvalue
+        # of the augmented Hessian
+        others = np.arange(len(b)) != im
+        bo = b[others]
+        Fo = F[others]
+        aug = np.zeros([len(bo)+1, len(bo)+1])
+        aug[:-1,:-1] = np.diag(bo)
+        aug[:-1,-1] = Fo
+        aug[-1,:-1] = Fo
+        ln = np.linalg.eigvalsh(aug)[0]
+        step += np.dot(V[:,others], -Fo / (bo - ln))
+
+        stepsize = np.linalg.norm(step)
+        if stepsize > self.trust_radius:
+            step *= self.trust_radius / stepsize
+        return step, V[:,im].copy(), b[im]
+
+    def run(self):
+        """The main loop of the algorithm"""
+        coords = np.copy(self.coords)
+        res = Result()
+        res.message = []
+        stopped = False
+
+        self.nfev += _hessian_nfev(self.pot, len(coords))
+        E, grad, H = self.pot.getEnergyGradientHessian(coords)
+        H = 0.5 * (H + H.transpose())
+        P = self._getProjector(coords)
+        grad = np.dot(P, grad)
+        follow = self.eigenvec
+        if follow is not None:
+            follow = np.dot(P, follow)
+        rms = np.linalg.norm(grad) * self.rmsnorm
+
+        i = 0
+        nsteps = 0
+        for i in xrange(self.nsteps):
+            nsteps = i + 1
+            step, follow, eigenval = self._prfoStep(H, grad, P, follow)
+            coords = coords + step
+
+            Enew, gradnew = self._getEnergyGradient(coords)
+            P = self._getProjector(coords)
+            gradnew = np.dot(P, gradnew)
+            self._bofillUpdate(H, step, gradnew - grad)
+            E, grad = Enew, gradnew
+            rms = np.linalg.norm(grad) * self.rmsnorm
+            self.eigenval = eigenval
+
+            if self.iprint > 0 and (i+1) % self.iprint == 0:
+                logger.info("bofillTS: %3d E %9g rms %8g eigenvalue %9g stepsize %8g",
+                            i, E, rms, eigenval, np.linalg.norm(step))
+            if callable(self.event):
+                self.event(energy=E, coords=coords, rms=rms, eigenval=eigenval, stepnum=i)
+            if callable(self.stop_criterion):
+                if self.stop_criterion(energy=E, coords=coords, rms=rms, eigenval=eigenval, stepnum=i):
+                    logger.info("stopping bofill transition state search.  stop criterion is satisfied")
+                    res.message.append( "stop criterion satisfied" )
+                    stopped = True
+                    break
+            if rms < self.tol:
+                break
+
+        #check the lowest eigenvalue with the iterative search, starting from
+        #the followed mode
+        if follow is None:
+            # no step was taken, start from the lowest mode of the Hessian
+            follow = self._prfoStep(H, grad, P, follow)[1]
+        self.eigenvec = follow
+        self.oldeigenvec = follow.copy()
+        if not stopped:
+            self._getLowestEigenVector(coords, i)
+            self.nfev += 2 * self.leig_result.nfev + 1
+
+        logger.info("bofill transition state search done: %s %s %s %s %s", i, E, rms, "eigenvalue", self.eigenval)
+        success = self.eigenval < 0. and rms <= self.tol and not stopped
+        if nsteps >= self.nsteps and rms > self.tol:
+            res.message.append( "maximum iterations reached %d" % nsteps )
+
+        res.coords = coords
+        res.energy = E
+        res.eigenval = self.eigenval
+        res.eigenvec = self.eigenvec
+        res.grad = grad
+        res.rms = rms
+        res.nsteps = nsteps
+        res.nfev = self.nfev
+        res.success = success
+        res.stopped = stopped
+        return res
+
+
+import unittest
+class TestBofillTransitionState(unittest.TestCase):
+    def setUp(self):
+        from pygmin.systems import LJCluster
+        from pygmin.landscape import DoubleEndedConnect
+        np.random.seed(0)
+        self.natoms = 7
+        system = LJCluster(self.natoms)
+        self.pot = system.get_potential()
+        db = system.create_database()
+        bh = system.get_basinhopping(database=db, outstream=None)
+        bh.run(20)
+        # a transition state found by DoubleEndedConnect
+        m1, m2 = db.minima()[:2]
+        connect = DoubleEndedConnect(m1, m2, self.pot, system.get_mindist(), db, 
+                                     verbosity=-1)
+        connect.connect()
+        self.ts = db.transition_states()[0]
+        x = self.ts.coords
+        self.x0 = x + np.random.uniform(-0.03, 0.03, x.shape)
+
+    def check_saddle(self, res):
+        self.assertTrue(res.success)
+        self.assertAlmostEqual(res.energy, self.ts.energy, 5)
+        # exactly one negative eigenvalue, apart from the six zero modes
+        evals = np.linalg.eigvalsh(self.pot.getHessian(res.coords))
+        self.assertEqual(np.sum(evals < -1e-3), 1)
+        self.assertEqual(np.sum(np.abs(evals) < 1e-3), 6)
+
+    def test_lj7(self):
+        res = BofillTransitionState(self.x0, self.pot, iprint=-1).run()
+        self.check_saddle(res)
+
+    def test_numerical_hessian_nfev(self):
+        class NoHessian(BasePotential):
+            def __init__(self, pot):
+                self.pot = pot
+            def getEnergy(self, x):
+                return self.pot.getEnergy(x)
+            def getEnergyGradient(self, x):
+                return self.pot.getEnergyGradient(x)
+        pot = NoHessian(self.pot)
+        res = BofillTransitionState(self.x0, pot, iprint=-1).run()
+        self.check_saddle(res)
+        self.assertGreaterEqual(res.nfev, 2 * len(self.x0) + 1 + res.nsteps)
+        self.assertEqual(_hessian_nfev(self.pot, 21), 1)
+
+    def test_nsteps(self):
+        res = BofillTransitionState(self.x0, self.pot, iprint=-1, nsteps=0).run()
+        self.assertEqual(res.nsteps, 0)
+        self.assertFalse(res.success)
+        self.assertTrue(np.all(res.coords == self.x0))
+        self.assertLess(res.eigenval, 0.)
+        
+        res = BofillTransitionState(self.x0, self.pot, iprint=-1, nsteps=1).run()
+        self.assertEqual(res.nsteps, 1)
+        
+        res = BofillTransitionState(self.x0, self.pot, iprint=-1).run()
+        self.assertTrue(res.success)
+        self.assertGreater(res.nsteps, 1)
+        res2 = BofillTransitionState(self.x0, self.pot, iprint=-1, nsteps=res.nsteps).run()
+        self.assertTrue(res2.success)
+        self.assertEqual(res2.nsteps, res.nsteps)
+
+    def test_projector(self):
+        # the zero eigenvectors found by probing orthogopt match zeroEV_cluster
+        search = BofillTransitionState(self.x0, self.pot, iprint=-1,
+                                       orthogZeroEigs=lambda v, x: orthogopt(v, x))
+        P = search._getProjector(self.x0)
+        P0 = BofillTransitionState(self.x0, self.pot)._getProjector(self.x0)
+        self.assertLess(np.max(np.abs(P - P0)), 1e-8)
+
+if __name__ == "__main__":
+    unittest.main()
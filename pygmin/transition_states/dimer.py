@@ -1,6 +1,6 @@
 import numpy as np
 from pygmin.optimize import fire, lbfgs_py
-from pygmin.transition_states import gramm_schmidt
+from pygmin.transition_states.zeroev import ZeroEVBasisCache, _orthonormal_basis
 
 __all__ = ["findTransitionState_dimer", "DimerSearch"]
 
@@ -52,11 +52,16 @@ class DimerSearch(object):
         self.tau_done=[]
         # current list of eigenvectors to projected out
         self.tau_ignore=[]
+        # cached orthonormal basis of the zero eigenvectors
+        if self.zeroEigenVecs:
+            self._zev_cache = ZeroEVBasisCache(self.zeroEigenVecs, max_size=1)
+        else:
+            self._zev_cache = None
         
         self.findNextTS(direction)
     
     def findNextTS(self, direction=None):
-        if(direction==None):
+        if direction is None:
             #while True:
             direction=np.random.random(self.x0.shape) - 0.5
             #    self.orthogonalize(x, self.t, vecs2)
@@ -72,9 +77,8 @@ class DimerSearch(object):
         #print "step",np.linalg.norm(x0-self.x0),E
         self.updateRotation(x0, E, g)
         
-        x1 = x0 + self.tau*self.delta
-        E,grad1 = self.potential.getEnergyGradient(x1)            
-        C = np.dot((grad1 - g), self.tau)/self.delta
+        # the gradient at the dimer endpoint is left over from the rotation
+        C = np.dot((self._grad1 - g), self.tau)/self.delta
         
         self.tau_ignore[:] = [t for t in self.tau_ignore if np.abs(t[1]) < np.abs(C) + 1.] 
                              
@@ -87,11 +91,10 @@ class DimerSearch(object):
         # tt.append(self.tau)
         return E,g
     
-    # should this be iterative?, go to utility with ljsyszem zero eigenvecs
     def orthogonalize(self, x, vecs):
-        #print len(vecs)
-        for v in vecs:
-            x -= np.dot(x, v)*v 
+        """make x orthogonal to the orthonormal vectors vecs (in place)"""
+        if len(vecs) > 0:
+            x -= np.dot(np.dot(vecs, x), vecs)
     
     def getOrthogonalGradient(self, x, eigenvecs):
         E, g = self.potential.getEnergyGradient(x)
@@ -99,48 +102,41 @@ class DimerSearch(object):
         return g
     
     def get_eigenvecs(self, x0):
-        zev = []
-        if(self.zeroEigenVecs):
-            zev = self.zeroEigenVecs(x0)
-        # print "lenzev", len(zev)
-        return gramm_schmidt(zev + [v[0] for v in self.tau_ignore])
+        """return the orthonormal basis (as rows of an array) of all directions to project out"""
+        if self._zev_cache is None:
+            zev = np.zeros([0, x0.size])
+        else:
+            zev = self._zev_cache.get_basis(x0)
+        if len(self.tau_ignore) == 0:
+            return zev
+        return _orthonormal_basis(list(zev) + [v[0] for v in self.tau_ignore], x0.size)
     
     def updateRotation(self, x0, E0, grad0_):
         iter_rot = 0
         
-        # get the zero eigenvalues
-        zev = []
-        if(self.zeroEigenVecs):
-            zev = self.zeroEigenVecs(x0)
-
         # remove zero eigenvalues from gradient
         grad0 = grad0_.copy()
-        evecs = gramm_schmidt(zev + [v[0] for v in self.tau_ignore])
+        evecs = self.get_eigenvecs(x0)
         self.orthogonalize(grad0, evecs)
 
-        #print u
-        #print np.dot(u[3],u[4]),np.dot(u[3],u[5]),np.dot(u[5],u[4])
-        #print self.potential.getEnergy(x0) - self.potential.getEnergy(x0 + 1e-8*u[3]/1e-8),\
-        #self.potential.getEnergy(x0) - self.potential.getEnergy(x0 + 1e-8*u[4]/1e-8),\
-        #self.potential.getEnergy(x0) - self.potential.getEnergy(x0 + 1e-8*u[5]/1e-8)
-        #print gramm_schmidt(zev)
         # update ignore list for eigenvalues
         for t in self.tau_ignore:
             E,grad1 = self.potential.getEnergyGradient(x0 + t[0]*self.delta)
-            #grad1 = self.getOrthogonalGradient(x0 + t[1]*self.delta, zev)
             t[1] = np.dot((grad1 - grad0), t[0])/self.delta
+        
+        # remove zero eigenvalues from tau
+        self.orthogonalize(self.tau, evecs)
+        self.tau /= np.linalg.norm(self.tau)
+        
+        # construct dimer image and get energy + gradient.  In the following
+        # iterations the gradient at the rotated dimer image is interpolated
+        # from the gradients at the old and the trial image, so each rotation
+        # step costs only one gradient evaluation.
+        x1 = x0 + self.tau*self.delta
+        grad1 = self.getOrthogonalGradient(x1, evecs)
+        self._grad1 = grad1
             
         while iter_rot < self.max_rotsteps:
-            #self.tau = self.tau/np.linalg.norm(self.tau)
-            # construct dimer image and get energy + gradient
-            
-            # remove zero eigenvalues from tau
-            self.orthogonalize(self.tau, evecs)
-            self.tau /= np.linalg.norm(self.tau)
-            
-            x1 = x0 + self.tau*self.delta
-            grad1 = self.getOrthogonalGradient(x1, evecs)
-            
             # calculate the rotational force of dimer
             F_rot = -2.*(grad1 - grad0) + 2.*np.dot(grad1 - grad0, self.tau)*self.tau
             
@@ -151,7 +147,6 @@ class DimerSearch(object):
             # calculate curvature C and derivative of curvature
             C = np.dot((grad1 - grad0), self.tau)/self.delta
             dC = 2.*np.dot((grad1 - grad0), Theta)/self.delta
-            #print C,self.tau
             # calculate estimated rotation angle
             theta1=-0.5*np.arctan(dC/(2.*np.abs(C)))
             
@@ -170,7 +165,6 @@ class DimerSearch(object):
             # get the new energy and gradient at trial conviguration
             grad1p = self.getOrthogonalGradient(x1p, evecs)
 
-            #grad1p = -grad1p
             # get curvature for trial point
             Cp = np.dot((grad1p - grad0), taup)/self.delta
             
@@ -184,6 +178,13 @@ class DimerSearch(object):
             self.orthogonalize(self.tau, evecs)
             self.tau /= np.linalg.norm(self.tau)
             
+            # interpolate the gradient at the rotated dimer image
+            # Heyden, Bell and Keil, J. Chem. Phys. 123, 224101 (2005), eq. 40
+            s1 = np.sin(theta1)
+            grad1 = (np.sin(theta1 - theta_min) / s1 * grad1
+                     + np.sin(theta_min) / s1 * grad1p
+                     + (1. - np.cos(theta_min) - np.sin(theta_min) * np.tan(0.5*theta1)) * grad0)
+            self._grad1 = grad1
 
             if np.abs(theta_min) < self.theta_cut:
                 return
@@ -209,7 +210,49 @@ class potwrap(object):
     
     def getEnergy(self, x):
         return self.potential.getEnergy(x)
-    
+
+import unittest
+
+class TestDimerRotation(unittest.TestCase):
+    """the rotated dimer must point along the lowest eigenvector of the Hessian"""
+    def setUp(self):
+        from pygmin.systems import LJCluster
+        np.random.seed(0)
+        self.system = LJCluster(13)
+        self.pot = self.system.get_potential()
+        db = self.system.create_database()
+        bh = self.system.get_basinhopping(database=db, outstream=None)
+        bh.run(20)
+        m1, m2 = db.minima()[:2]
+        connect = self.system.get_double_ended_connect(m1, m2, db, verbosity=-1)
+        connect.connect()
+        self.x = db.transition_states()[0].coords.copy()
+
+    def check_curvature(self, x, search):
+        from pygmin.utils.hessian import get_sorted_eig
+        evals, evecs = get_sorted_eig(self.pot.getHessian(x))
+        E, g = self.pot.getEnergyGradient(x)
+        C = np.dot(search._grad1 - g, search.tau) / search.delta
+        self.assertAlmostEqual(C / evals[0], 1., delta=1e-2)
+        self.assertGreater(np.abs(np.dot(evecs[:,0], search.tau)), 0.99)
+
+    def test_curvature(self):
+        from pygmin.transition_states.zeroev import zeroEV_cluster
+        search = DimerSearch(self.x, self.pot, zeroEigenVecs=zeroEV_cluster)
+        self.check_curvature(self.x, search)
+
+        # rotate again from the old direction at a displaced point
+        x2 = self.x + np.random.uniform(-0.02, 0.02, self.x.shape)
+        search.getEnergyGradient(x2)
+        self.check_curvature(x2, search)
+
+    def test_interpolated_gradient(self):
+        from pygmin.transition_states.zeroev import zeroEV_cluster
+        search = DimerSearch(self.x, self.pot, zeroEigenVecs=zeroEV_cluster)
+        evecs = search.get_eigenvecs(self.x)
+        grad1 = search.getOrthogonalGradient(self.x + search.delta * search.tau, evecs)
+        self.assertLess(np.max(np.abs(grad1 - search._grad1)), 1e-4)
+
 if __name__ == "__main__":
     import pylab as pl
     x = np.arange(.5, 5., .05)
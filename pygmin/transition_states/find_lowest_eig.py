@@ -90,7 +90,27 @@ class LowestEigPot(basepot):
         
         return diag2, grad
 
-def findLowestEigenVector(coords, pot, eigenvec0=None, H0=None, orthogZeroEigs=0, dx=1e-3, **kwargs):
+class _EigenvalueAgreement(object):
+    """
+    stop criterion for the lowest eigenvector search
+    
+    The search is stopped when the usual rms criterion is satisfied, or when
+    the eigenvalue agrees with an independent estimate to within a relative
+    tolerance.
+    """
+    def __init__(self, eigenval_estimate, eigenval_rtol):
+        self.eigenval_estimate = eigenval_estimate
+        self.eigenval_rtol = eigenval_rtol
+    
+    def __call__(self, energy=None, gradient=None, tol=None):
+        rms = np.linalg.norm(gradient) / np.sqrt(gradient.size)
+        if rms < tol:
+            return True
+        return (np.abs(energy - self.eigenval_estimate) < 
+                self.eigenval_rtol * np.abs(self.eigenval_estimate))
+
+def findLowestEigenVector(coords, pot, eigenvec0=None, H0=None, orthogZeroEigs=0, dx=1e-3, 
+                          eigenval0=None, eigenval_rtol=None, **kwargs):
     """
     find the eigenvector corresponding to the lowest eigenvalue using
     LowestEigPot and the LBFGS minimizer
@@ -116,6 +136,12 @@ def findLowestEigenVector(coords, pot, eigenvec0=None, H0=None, orthogZeroEigs=0
                                 rotational symmetry
             orthogZeroEigs=None : the vector is unchanged
 
+    eigenval0 : float, optional
+        an independent estimate of the lowest eigenvalue, e.g. the curvature
+        along the path from an NEB calculation
+    eigenval_rtol : float, optional
+        if given together with eigenval0, the search is stopped as soon as the
+        eigenvalue agrees with eigenval0 to within this relative tolerance
     kwargs : 
         any additional keyword arguments are passed to the minimizer
     
@@ -135,6 +161,9 @@ def findLowestEigenVector(coords, pot, eigenvec0=None, H0=None, orthogZeroEigs=0
         #this random vector should be distributed uniformly on a hypersphere.
         eigenvec0 = rotations.vec_random_ndim(coords.shape)
     
+    if eigenval0 is not None and eigenval_rtol is not None:
+        kwargs["alternate_stop_criterion"] = _EigenvalueAgreement(eigenval0, eigenval_rtol)
+    
     #set up potential for minimization    
     eigpot = LowestEigPot(coords, pot, orthogZeroEigs=orthogZeroEigs, dx=dx)
     
@@ -1,8 +1,9 @@
 """
 tool for creating interpolated paths as input to NEB
 """
+import numpy as np
 
-__all__ = ["interpolate_linear", "InterpolatedPathDensity", "InterpolatedPath"]
+__all__ = ["interpolate_linear", "interpolate_spline", "InterpolatedPathDensity", "InterpolatedPath"]
 
 def interpolate_linear(initial, final, t):
     '''
@@ -19,6 +20,53 @@ def interpolate_linear(initial, final, t):
     '''
     return (1.-t)*initial + t*final
 
+def interpolate_spline(s, path, snew):
+    '''
+        Natural cubic spline interpolation of a path
+        
+        Parameters
+        ----------
+        s : array
+            the arc length of each image of the path.  Must be strictly increasing
+        path : array
+            the images, shape (nimages, ndof)
+        snew : array
+            arc lengths at which the path should be evaluated
+        
+        Returns
+        -------
+        newpath : array
+            the interpolated images, shape (len(snew), ndof)
+    '''
+    import scipy.linalg
+    s = np.asarray(s, dtype=float)
+    path = np.asarray(path, dtype=float)
+    n = len(s)
+    if n < 3:
+        # not enough points for a spline
+        newpath = np.empty([len(snew), path.shape[1]])
+        for j in xrange(path.shape[1]):
+            newpath[:,j] = np.interp(snew, s, path[:,j])
+        return newpath
+    h = np.diff(s)
+    dy = np.diff(path, axis=0) / h[:,np.newaxis]
+    
+    # solve the tridiagonal system for the second derivatives.  The second 
+    # derivatives at the end points are zero
+    ab = np.zeros([3, n-2])
+    ab[0,1:] = h[1:-1]
+    ab[1,:] = 2. * (h[:-1] + h[1:])
+    ab[2,:-1] = h[1:-1]
+    M = np.zeros(path.shape)
+    M[1:-1] = scipy.linalg.solve_banded((1,1), ab, 6. * (dy[1:] - dy[:-1]))
+    
+    i = np.clip(np.searchsorted(s, snew, side="right") - 1, 0, n-2)
+    hi = h[i][:,np.newaxis]
+    a = (s[i+1][:,np.newaxis] - np.asarray(snew)[:,np.newaxis]) / hi
+    b = 1. - a
+    return (a * path[i] + b * path[i+1] + 
+            ((a**3 - a) * M[i] + (b**3 - b) * M[i+1]) * hi**2 / 6.)
+
 def InterpolatedPathDensity(initial, final, distance, density=10., **kwargs):
     """
     Return a InterpolatedPath object with the appropriate 
@@ -118,6 +166,29 @@ class InterpolatedPath(object):
     def __iter__(self):
         return self.Iterator(self)
     
+import unittest
+
+class TestInterpolateSpline(unittest.TestCase):
+    def test_natural_spline(self):
+        from scipy.interpolate import CubicSpline
+        np.random.seed(0)
+        s = np.cumsum(np.random.uniform(0.1, 1., 8))
+        path = np.random.uniform(-1., 1., [8, 5])
+        snew = np.linspace(s[0], s[-1], 31)
+        spline = CubicSpline(s, path, bc_type="natural")
+        self.assertLess(np.max(np.abs(interpolate_spline(s, path, snew) - spline(snew))), 1e-14)
+
+    def test_nodes(self):
+        np.random.seed(0)
+        s = np.cumsum(np.random.uniform(0.1, 1., 6))
+        path = np.random.uniform(-1., 1., [6, 3])
+        self.assertLess(np.max(np.abs(interpolate_spline(s, path, s) - path)), 1e-14)
+
+    def test_two_points(self):
+        path = np.array([[0., 1.], [2., 3.]])
+        newpath = interpolate_spline([0., 1.], path, [0.25])
+        self.assertLess(np.max(np.abs(newpath[0] - interpolate_linear(path[0], path[1], 0.25))), 1e-14)
+
 if __name__ == "__main__":
     path = InterpolatedPath(0., 1., 10)
     print len(path)
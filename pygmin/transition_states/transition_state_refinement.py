@@ -67,6 +67,12 @@ class FindTransitionState(object):
         the tolerance for the rms gradient
     event : callable
         This will be called after each step
+    stop_criterion : callable, optional
+        This will be called after each step with the same arguments as
+        `event`.  If it returns True the search is abandoned and the result
+        is marked as unsuccessful.  This can be used to stop the refinement
+        of candidates which are converging to an already known transition
+        state
     nsteps : 
         number of iterations
     nfail_max :
@@ -74,6 +80,17 @@ class FindTransitionState(object):
         than the algorithm ends
     eigenvec0 : 
         a guess for the initial lowest eigenvector
+    eigenval0 : float, optional
+        an estimate of the lowest eigenvalue, e.g. from the curvature of the
+        NEB path.  It is used together with `eigenval_rtol` to stop the first
+        lowest eigenvector search early.
+    eigenval_rtol : float
+        the first lowest eigenvector search is stopped as soon as the
+        eigenvalue agrees with eigenval0 to within this relative tolerance.
+        This has no effect if eigenval0 is not given
+    H0_transverse : float, optional
+        initial guess for the inverse Hessian diagonal in the tangent space
+        minimization, e.g. from the NEB optimization
     iprint :
         the interval at which to print status messages
     orthogZeroEigs : callable
@@ -154,15 +171,20 @@ class FindTransitionState(object):
                  nsteps_tangent1=10,
                  nsteps_tangent2=100,
                  verbosity=1,
+                 stop_criterion=None,
+                 eigenval0=None, eigenval_rtol=0.05, H0_transverse=None,
                  ):
         self.pot = pot
         self.coords = np.copy(coords)
         self.tol = tol
         self.nsteps = nsteps
         self.event = event
+        self.stop_criterion = stop_criterion
         self.nfail_max = nfail_max
         self.nfail = 0
         self.eigenvec = eigenvec0
+        self.eigenval0 = eigenval0
+        self.eigenval_rtol = eigenval_rtol
         self.orthogZeroEigs = orthogZeroEigs
         self.iprint = iprint
         self.lowestEigenvectorQuenchParams = lowestEigenvectorQuenchParams
@@ -199,7 +221,7 @@ class FindTransitionState(object):
         #initial guess for Hermitian
         self.H0_leig = None 
         
-        self.H0_transverse = None
+        self.H0_transverse = H0_transverse
         
         self.reduce_step = 0
         self.step_factor = .1
@@ -213,6 +235,9 @@ class FindTransitionState(object):
         params = dict()
         
         params["tangentSpaceQuenchParams"] = obj.tangent_space_quench_params.copy()
+        # the default logger is added in __init__.  loggers can't be pickled 
+        # so don't pass it on
+        params["tangentSpaceQuenchParams"].pop("logger", None)
         params["lowestEigenvectorQuenchParams"] = obj.lowestEigenvectorQuenchParams.copy()
         params["tol"] = obj.tol
         params["nsteps"] = obj.nsteps
@@ -223,6 +248,7 @@ class FindTransitionState(object):
         params["nsteps_tangent1"]=obj.nsteps_tangent1
         params["nsteps_tangent2"]=obj.nsteps_tangent2
         params["verbosity"]=obj.verbosity
+        params["eigenval_rtol"]=obj.eigenval_rtol
         
         # event=None, eigenvec0=None, orthogZeroEigs=0,
         return params
@@ -253,6 +279,7 @@ class FindTransitionState(object):
         coords = np.copy(self.coords)
         res = Result() #  return object
         res.message = []
+        stopped = False
         for i in xrange(self.nsteps):
             
             #get the lowest eigenvalue and eigenvector
@@ -305,6 +332,12 @@ class FindTransitionState(object):
             
             if callable(self.event):
                 self.event(energy=E, coords=coords, rms=rms, eigenval=self.eigenval, stepnum=i)
+            if callable(self.stop_criterion):
+                if self.stop_criterion(energy=E, coords=coords, rms=rms, eigenval=self.eigenval, stepnum=i):
+                    logger.info("stopping findTransitionState.  stop criterion is satisfied")
+                    res.message.append( "stop criterion satisfied" )
+                    stopped = True
+                    break
             if rms < self.tol:
                 break
             if self.nfail >= self.nfail_max:
@@ -320,7 +353,8 @@ class FindTransitionState(object):
                     break
 
         #done.  do one last eigenvector search because coords may have changed
-        self._getLowestEigenVector(coords, i)
+        if not stopped:
+            self._getLowestEigenVector(coords, i)
 
         #done, print some data
         logger.info("findTransitionState done: %s %s %s %s %s", i, E, rms, "eigenvalue", self.eigenval)
@@ -335,6 +369,8 @@ class FindTransitionState(object):
             if self.verbosity > 2:
                 logger.info("warning: transition state search appears to have failed: rms %s", rms)
             success = False
+        if stopped:
+            success = False
         if i >= self.nsteps:
             res.message.append( "maximum iterations reached %d" % i )
             
@@ -348,13 +384,18 @@ class FindTransitionState(object):
         res.rms = rms
         res.nsteps = i
         res.success = success
+        res.stopped = stopped
         return res
 
 
         
     def _getLowestEigenVector(self, coords, i):
+        # the estimate eigenval0 is only valid for the first search
+        eigenval0 = self.eigenval0
+        self.eigenval0 = None
         res = findLowestEigenVector(coords, self.pot, H0=self.H0_leig, eigenvec0=self.eigenvec, 
                                     orthogZeroEigs=self.orthogZeroEigs,
+                                    eigenval0=eigenval0, eigenval_rtol=self.eigenval_rtol,
                                     **self.lowestEigenvectorQuenchParams)
         self.leig_result = res
         
@@ -450,11 +491,25 @@ def findTransitionState(*args, **kwargs):
     """
     simply a wrapper for initializing and running FindTransitionState
     
+    Parameters
+    ----------
+    method : string, optional
+        "eigenvector_following" (the default) uses FindTransitionState, 
+        "bofill" uses the quasi-Newton BofillTransitionState
+    
     See Also
     --------
     FindTransitionState : for all documentation
+    BofillTransitionState
     """
-    finder = FindTransitionState(*args, **kwargs)
+    method = kwargs.pop("method", "eigenvector_following")
+    if method == "bofill":
+        from pygmin.transition_states._quasi_newton_ts import BofillTransitionState
+        finder = BofillTransitionState(*args, **kwargs)
+    elif method == "eigenvector_following":
+        finder = FindTransitionState(*args, **kwargs)
+    else:
+        raise ValueError("unknown transition state search method %s" % method)
     return finder.run()
 
 
@@ -68,7 +68,7 @@ def minima_from_ts(pot, xt, n=None,
     verbose : bool
     """
     # if no direction is given, choose random direction
-    if n==None:
+    if n is None:
         # TODO: replace by better algorithm with uniform sampling
         n = np.random.random(xt.shape)-0.5
     
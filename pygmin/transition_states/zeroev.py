@@ -5,8 +5,10 @@ Created on 2 Aug 2012
 '''
 
 import numpy as np
+from collections import OrderedDict
 
-__all__ = ["zeroEV_translation", "zeroEV_rotation", "zeroEV_cluster", "gramm_schmidt"]
+__all__ = ["zeroEV_translation", "zeroEV_rotation", "zeroEV_cluster", "gramm_schmidt",
+           "ZeroEVBasisCache"]
 
 def zeroEV_translation(coords):
     """
@@ -86,6 +88,84 @@ def orthogonalize(v, ozev):
         v-=np.dot(v,u)*u
     return v
 
+def _orthonormal_basis(vecs, ndof):
+    """return an orthonormal basis of the space spanned by vecs as the rows of an array
+    
+    linearly dependent vectors are dropped
+    """
+    if len(vecs) == 0:
+        return np.zeros([0, ndof])
+    q, r = np.linalg.qr(np.array(vecs).transpose())
+    keep = np.abs(np.diag(r)) > 1e-8
+    return q[:,keep].transpose().copy()
+
+class ZeroEVBasisCache(object):
+    """cache of the orthonormal basis of the zero eigenvectors
+    
+    The lowest eigenvector search and the transition state searches make a
+    vector orthogonal to the zero eigenvectors many times for the same
+    structure.  This class computes the zero eigenvectors and orthonormalizes
+    them only once per structure and does the projection with two matrix
+    vector products.
+    
+    Parameters
+    ----------
+    zeroEV : callable
+        `vecs = zeroEV(coords)` returns the list of zero eigenvectors, e.g.
+        zeroEV_cluster.  They don't need to be orthogonal.
+    max_size : int, optional
+        number of structures to keep.  The least recently used basis is
+        removed if the cache is full
+    
+    Notes
+    -----
+    The structures are looked up by a cheap fingerprint of the coordinates
+    (the size, the sum and the squared norm).  The coordinates are compared
+    exactly on a hit, so a modified coordinate array is never matched with
+    an old basis.
+    
+    Examples
+    --------
+    
+    >>> cache = ZeroEVBasisCache(zeroEV_cluster)
+    >>> v = cache.orthogonalize(v, coords)
+    """
+    def __init__(self, zeroEV, max_size=8):
+        self.zeroEV = zeroEV
+        self.max_size = max_size
+        self._cache = OrderedDict()
+        self.nhits = 0
+        self.nmisses = 0
+    
+    def _fingerprint(self, coords):
+        return coords.size, float(coords.sum()), float(np.dot(coords, coords))
+    
+    def get_basis(self, coords):
+        """return the orthonormal basis of the zero eigenvectors as the rows of an array"""
+        key = self._fingerprint(coords)
+        try:
+            x, basis = self._cache.pop(key)
+            if not np.array_equal(x, coords):
+                raise KeyError(key)
+            self.nhits += 1
+        except KeyError:
+            x = np.array(coords, copy=True)
+            basis = _orthonormal_basis(self.zeroEV(x), x.size)
+            self.nmisses += 1
+            if len(self._cache) >= self.max_size:
+                self._cache.popitem(last=False)
+        self._cache[key] = (x, basis)
+        return basis
+    
+    def orthogonalize(self, v, coords):
+        """make v orthogonal to the zero eigenvectors at coords (in place) and return it"""
+        basis = self.get_basis(coords)
+        v -= np.dot(np.dot(basis, v), basis)
+        return v
+    
+    def clear(self):
+        self._cache.clear()
+
 if __name__ == '__main__':
     from _orthogopt import orthogopt_slow, orthogopt
     natoms = 105
@@ -21,6 +21,7 @@ benchmarking tool
     :toctree: generated/
 
     pygmin.utils.benchmark.QuenchBenchmark
+    pygmin.utils.benchmark.ProfilingPotential
 
 Coords Adapter
 --------------    
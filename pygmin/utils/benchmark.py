@@ -6,8 +6,13 @@ Created on 6 Apr 2012
 
 import numpy as np
 import copy
+import sys
+import time
+import logging
 
-__all__ = ["QuenchBenchmark"]
+from pygmin.potentials.potential import BasePotential
+
+__all__ = ["QuenchBenchmark", "ProfilingPotential"]
 
 class PotentialWrapper(object):
     def __init__(self, potential):
@@ -32,6 +37,265 @@ class PotentialWrapper(object):
         self.energies.append(E)
         return g
         
+# the modules which identify the subsystem calling the potential.  A module
+# name matches if it starts with the given prefix.
+_SUBSYSTEMS = [
+    ("pygmin.transition_states.find_lowest_eig", "eigenvector search"),
+    ("pygmin.transition_states.transition_state_refinement", "TS search"),
+    ("pygmin.transition_states.dimer", "TS search"),
+    ("pygmin.transition_states._quasi_newton_ts", "TS search"),
+    ("pygmin.transition_states.tstools", "pushoff"),
+    ("pygmin.transition_states._growing_string", "growing string"),
+    ("pygmin.transition_states._NEB", "NEB"),
+    ("pygmin.transition_states._nebdriver", "NEB"),
+    ("pygmin.optimize", "quench"),
+]
+
+class ProfilingPotential(BasePotential):
+    """
+    wrap a potential and count and time the calls to it
+
+    The calls to getEnergy, getEnergyGradient, getGradient,
+    getEnergyGradientBatch, getHessian and getEnergyGradientHessian are
+    counted and timed.  They are attributed to the subsystem which made the
+    call (quench, NEB, growing string, TS search, eigenvector search,
+    pushoff or other),
+    which is determined from the call stack: the innermost function in one of
+    the modules of the subsystem decides.  A quench which is part of, e.g., a
+    pushoff is attributed to the pushoff.  The methods of potentials which
+    wrap other potentials, such as TSRefinementPotential, are skipped, so
+    their calls belong to the subsystem using the wrapper.  All other
+    attributes are passed on to the wrapped potential.
+
+    DoubleEndedConnect and BasinHopping log the report at the end of a run
+    if their potential is a ProfilingPotential.
+
+    Parameters
+    ----------
+    potential :
+        the potential to wrap
+    attribute : bool
+        if False, the calls are not attributed to subsystems.  This saves
+        the inspection of the call stack on every call
+    subsystems : list of (string, string)
+        pairs of module name prefix and subsystem name.  The default covers
+        the subsystems of pygmin
+
+    Attributes
+    ----------
+    ncalls : dict
+        the number of calls (of structures, for getEnergyGradientBatch)
+        by (method, subsystem)
+    times : dict
+        the cumulative wall time by (method, subsystem)
+    latency : dict
+        histograms of the time per call, by method.  Each histogram is a
+        dict mapping the bin i to the number of calls which took between
+        10**(i/4.) and 10**((i+1)/4.) seconds
+
+    Examples
+    --------
+    >>> pot = ProfilingPotential(system.get_potential())
+    >>> connect = system.get_double_ended_connect(min1, min2, database, pot=pot)
+    >>> connect.connect()
+    >>> print pot.report()
+
+    the same for basinhopping, including the quenches
+
+    >>> pot = ProfilingPotential(system.get_potential())
+    >>> bh = system.get_basinhopping(database=database, pot=pot)
+    >>> bh.run(100)
+    """
+    def __init__(self, potential, attribute=True, subsystems=None):
+        self.potential = potential
+        self.attribute = attribute
+        if subsystems is None:
+            subsystems = _SUBSYSTEMS
+        self.subsystems = subsystems
+        self._code_labels = dict()
+        self.reset()
+
+    def reset(self):
+        """set all counters to zero"""
+        self.ncalls = dict()
+        self.times = dict()
+        self.latency = dict()
+
+    def __getattr__(self, name):
+        # only called if name is not found in the usual places
+        if name == "potential":
+            raise AttributeError(name)
+        return getattr(self.potential, name)
+
+    def _label(self, frame):
+        """return the subsystem of the code object of a frame"""
+        code = frame.f_code
+        try:
+            return self._code_labels[code]
+        except KeyError:
+            pass
+        label = None
+        module = frame.f_globals.get("__name__")
+        if isinstance(frame.f_locals.get("self"), BasePotential):
+            # a potential wrapping another potential
+            module = None
+        if module is not None:
+            for prefix, subsystem in self.subsystems:
+                if module.startswith(prefix):
+                    label = subsystem
+                    break
+        self._code_labels[code] = label
+        return label
+
+    def _get_subsystem(self):
+        """find the subsystem of the caller by walking the call stack"""
+        if not self.attribute:
+            return "all"
+        quench = False
+        frame = sys._getframe(2)
+        while frame is not None:
+            label = self._label(frame)
+            if label == "quench":
+                quench = True
+            elif label is not None:
+                return label
+            frame = frame.f_back
+        if quench:
+            return "quench"
+        return "other"
+
+    def _record(self, method, subsystem, dt, n=1):
+        key = (method, subsystem)
+        self.ncalls[key] = self.ncalls.get(key, 0) + n
+        self.times[key] = self.times.get(key, 0.) + dt
+        hist = self.latency.setdefault(method, dict())
+        if dt > 0.:
+            i = int(np.floor(4. * np.log10(dt / n)))
+        else:
+            i = -40
+        hist[i] = hist.get(i, 0) + n
+
+    def getEnergy(self, coords):
+        subsystem = self._get_subsystem()
+        t0 = time.time()
+        ret = self.potential.getEnergy(coords)
+        self._record("getEnergy", subsystem, time.time() - t0)
+        return ret
+
+    def getEnergyGradient(self, coords):
+        subsystem = self._get_subsystem()
+        t0 = time.time()
+        ret = self.potential.getEnergyGradient(coords)
+        self._record("getEnergyGradient", subsystem, time.time() - t0)
+        return ret
+
+    def getGradient(self, coords):
+        subsystem = self._get_subsystem()
+        t0 = time.time()
+        ret = self.potential.getGradient(coords)
+        self._record("getGradient", subsystem, time.time() - t0)
+        return ret
+
+    def getEnergyGradientBatch(self, coords):
+        subsystem = self._get_subsystem()
+        t0 = time.time()
+        ret = self.potential.getEnergyGradientBatch(coords)
+        self._record("getEnergyGradientBatch", subsystem, time.time() - t0,
+                     n=len(coords))
+        return ret
+
+    def getHessian(self, coords):
+        subsystem = self._get_subsystem()
+        t0 = time.time()
+        ret = self.potential.getHessian(coords)
+        self._record("getHessian", subsystem, time.time() - t0)
+        return ret
+
+    def getEnergyGradientHessian(self, coords):
+        subsystem = self._get_subsystem()
+        t0 = time.time()
+        ret = self.potential.getEnergyGradientHessian(coords)
+        self._record("getEnergyGradientHessian", subsystem, time.time() - t0)
+        return ret
+
+    def report(self):
+        """return a summary of the calls as a string"""
+        ntot = sum(self.ncalls.values())
+        ttot = sum(self.times.values())
+        lines = ["potential calls: %d, time %.4f s" % (ntot, ttot)]
+        lines.append("%-26s %-20s %10s %10s %6s %10s" %
+                     ("method", "subsystem", "calls", "time (s)", "%", "mean (us)"))
+        for key, t in sorted(self.times.items(), key=lambda item: -item[1]):
+            n = self.ncalls[key]
+            frac = t / ttot if ttot > 0. else 0.
+            lines.append("%-26s %-20s %10d %10.4f %6.1f %10.1f" %
+                         (key[0], key[1], n, t, 100. * frac, 1e6 * t / n))
+        lines.append("latency per call")
+        for method, hist in sorted(self.latency.items()):
+            lines.append("  %s" % method)
+            for i in sorted(hist.keys()):
+                lines.append("    %9.2g - %9.2g s %10d" %
+                             (10.**(i / 4.), 10.**((i + 1) / 4.), hist[i]))
+        return "\n".join(lines)
+
+    def log_report(self, logger=None):
+        """write the report to the logger (default pygmin.profile)"""
+        if logger is None:
+            logger = logging.getLogger("pygmin.profile")
+        for line in self.report().split("\n"):
+            logger.info(line)
+
+import unittest
+
+class TestProfilingPotential(unittest.TestCase):
+    def setUp(self):
+        from pygmin.systems import LJCluster
+        np.random.seed(0)
+        self.system = LJCluster(13)
+        self.pot = ProfilingPotential(self.system.get_potential())
+
+    def test_count(self):
+        x = self.system.get_random_configuration()
+        for i in range(3):
+            self.pot.getEnergy(x)
+        self.pot.getEnergyGradient(x)
+        self.pot.getEnergyGradientBatch(np.array([x, x]))
+        self.assertEqual(self.pot.ncalls, {("getEnergy", "other"):3,
+                                           ("getEnergyGradient", "other"):1,
+                                           ("getEnergyGradientBatch", "other"):2})
+        self.assertEqual(sum(sum(h.values()) for h in self.pot.latency.values()), 6)
+        self.assertIn("potential calls: 6", self.pot.report())
+        self.pot.reset()
+        self.assertEqual(self.pot.ncalls, dict())
+
+    def test_basinhopping(self):
+        from pygmin.optimize import mylbfgs
+        bh = self.system.get_basinhopping(pot=self.pot, outstream=None)
+        bh.run(5)
+        self.assertGreater(self.pot.ncalls[("getEnergyGradient", "quench")], 0)
+        self.assertEqual(set(s for m, s in self.pot.ncalls), set(["quench", "other"]))
+
+        # a quench which is part of a pushoff
+        self.pot.reset()
+        from pygmin.transition_states import minima_from_ts
+        x = bh.coords
+        minima_from_ts(self.pot, x, n=np.random.uniform(-1, 1, x.shape))
+        self.assertEqual(set(s for m, s in self.pot.ncalls), set(["pushoff"]))
+
+    def test_connect(self):
+        from pygmin.transition_states import GrowingStringDriver
+        db = self.system.create_database()
+        bh = self.system.get_basinhopping(database=db, outstream=None)
+        bh.run(20)
+        m1, m2 = db.minima()[:2]
+        connect = self.system.get_double_ended_connect(m1, m2, db, pot=self.pot, verbosity=-1,
+                      local_connect_params=dict(create_neb=GrowingStringDriver))
+        connect.connect()
+        self.assertTrue(connect.success())
+        subsystems = set(s for m, s in self.pot.ncalls)
+        for s in ["growing string", "NEB", "TS search", "pushoff"]:
+            self.assertIn(s, subsystems)
+
 class QuenchBenchmark(object):
     '''
     classdocs
@@ -69,6 +69,10 @@ class Signal(object):
             if slot in self._functions:
                 self._functions.remove(slot)
 
+    def has_slots(self):
+        ''' return True if any callbacks are connected '''
+        return len(self._functions) > 0 or any(len(funcs) > 0 for funcs in self._methods.values())
+
     def clear(self):
         ''' remove all callbacks from the signal '''
         self._functions.clear()
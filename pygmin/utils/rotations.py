@@ -23,6 +23,7 @@ Warning, they have not all been tested in this format.
     random_aa
     takestep_aa
     rotate_aa
+    rotate_aa_array
     small_random_aa
     vec_random
     vec_random_ndim
@@ -205,6 +206,46 @@ def rotate_aa(p1, p2):
     return q2aa(q_multiply( aa2q(p2), aa2q(p1) ))
 
 
+def rotate_aa_array(p1, p2):
+    """
+    change an array of angle axis rotations p1 by the rotation p2
+    
+    this is the same as calling rotate_aa for each row of p1, but vectorized
+    
+    Parameters
+    ----------
+    p1 : array of shape (n,3)
+    p2 : angle axis vector of length 3
+    """
+    p1 = np.reshape(p1, [-1,3])
+    
+    # angle axis to quaternion
+    thetah = 0.5 * np.sqrt(np.sum(p1*p1, axis=1))
+    small = thetah < rot_epsilon
+    fac = np.where(small, 0.5, 0.5 * np.sin(thetah) / np.where(small, 1., thetah))
+    q1 = np.empty([len(p1), 4])
+    q1[:,0] = np.cos(thetah)
+    q1[:,1:] = fac[:,np.newaxis] * p1
+    q1[q1[:,0] < 0.] *= -1.
+    
+    # multiply with the rotation
+    q0 = aa2q(p2)
+    q = np.empty_like(q1)
+    q[:,0] = q0[0]*q1[:,0]-q0[1]*q1[:,1]-q0[2]*q1[:,2]-q0[3]*q1[:,3]
+    q[:,1] = q0[0]*q1[:,1]+q0[1]*q1[:,0]+q0[2]*q1[:,3]-q0[3]*q1[:,2]
+    q[:,2] = q0[0]*q1[:,2]-q0[1]*q1[:,3]+q0[2]*q1[:,0]+q0[3]*q1[:,1]
+    q[:,3] = q0[0]*q1[:,3]+q0[1]*q1[:,2]-q0[2]*q1[:,1]+q0[3]*q1[:,0]
+    
+    # quaternion to angle axis
+    q[q[:,0] < 0.] *= -1.
+    big = q[:,0] > 1.
+    q[big] /= np.sqrt(np.sum(q[big]**2, axis=1))[:,np.newaxis]
+    theta = 2. * np.arccos(np.minimum(q[:,0], 1.))
+    s = np.sqrt(np.maximum(1. - q[:,0]**2, 0.))
+    small = s < rot_epsilon
+    fac = np.where(small, 2., theta / np.where(small, 1., s))
+    return fac[:,np.newaxis] * q[:,1:]
+
 def small_random_aa(maxtheta):
     """ generate a small random rotation"""
     # first choose a random unit vector
@@ -0,0 +1,312 @@
+"""
+benchmark suite for the performance critical parts of pygmin
+
+The timings are printed and can be written to a JSON file.  Comparing the
+file with the one of an earlier run (e.g. of the last release) shows
+performance regressions.  Every timing is the best of several repeats, to
+reduce the noise from other processes.
+
+usage::
+
+    python benchmark_suite.py [-o results.json] [--compare old.json] [--quick] [benchmark ...]
+
+The benchmarks are
+
+    potentials              energy and gradient throughput of LJ, BLJ, MultiSpeciesLJ and LJCut
+    quench                  mylbfgs and lbfgs_py quenches of LJ38 and LJ75
+    mindist                 MinPermDistAtomicCluster and ExactMatchAtomicCluster
+    neb                     NEB runs (NEBDriver) between LJ13 and LJ38 minima
+    database                Database.addMinimum and addTransitionState insert rates
+    disconnectivity_graph   DisconnectivityGraph.calculate for a random landscape
+
+The JSON file has the format::
+
+    {"meta": {"date": ..., "git_commit": ..., "python": ..., "numpy": ..., "platform": ...},
+     "results": {"potentials": {"LJ38": {"time_per_call": ..., ...}, ...}, ...}}
+
+All entries starting with "time" are in seconds and are compared by
+--compare.  An exit status of 1 means at least one of them was slower than
+the reference by more than the threshold.
+"""
+import sys
+import os
+import time
+import json
+import platform
+import subprocess
+import argparse
+from collections import OrderedDict
+
+import numpy as np
+
+def best_time(func, nrepeat=1, nbest=3):
+    """return the best of nbest mean times of nrepeat calls of func"""
+    times = []
+    for i in xrange(nbest):
+        t0 = time.time()
+        for j in xrange(nrepeat):
+            func()
+        times.append((time.time() - t0) / nrepeat)
+    return min(times)
+
+def quenched(system, nstructures):
+    """return a list of minimized random structures"""
+    from pygmin.optimize import mylbfgs
+    pot = system.get_potential()
+    return [mylbfgs(system.get_random_configuration(), pot, tol=1e-6).coords
+            for i in xrange(nstructures)]
+
+#
+# the benchmarks.  Each returns a dict of results, each result is a dict of
+# numbers
+#
+
+def bench_potentials(quick=False):
+    from pygmin.systems import LJCluster, BLJCluster
+    from pygmin.potentials import LJ
+    from pygmin.potentials.ljcut import LJCut
+    from pygmin.potentials.multispecies_lj import make_blj
+    cases = [("LJ38", LJCluster(38), LJ()),
+             ("LJ75", LJCluster(75), LJ()),
+             ("BLJ75", BLJCluster(75), None),
+             ("BLJ75_multispecies", BLJCluster(75), make_blj(75, 60)),
+             ("LJCut75", LJCluster(75), LJCut(rcut=2.5)),
+             ]
+    nrepeat = 100 if quick else 1000
+    results = OrderedDict()
+    for name, system, pot in cases:
+        if pot is None:
+            pot = system.get_potential()
+        x = quenched(system, 1)[0]
+        t = best_time(lambda: pot.getEnergyGradient(x), nrepeat)
+        results[name] = OrderedDict([("time_per_call", t),
+                                     ("calls_per_second", 1. / t)])
+    return results
+
+def bench_quench(quick=False):
+    from pygmin.systems import LJCluster
+    from pygmin.optimize import mylbfgs, lbfgs_py
+    nquench = 5 if quick else 20
+    results = OrderedDict()
+    for natoms in [38, 75]:
+        system = LJCluster(natoms)
+        pot = system.get_potential()
+        np.random.seed(0)
+        starts = [system.get_random_configuration() for i in xrange(nquench)]
+        for name, quench in [("mylbfgs", mylbfgs), ("lbfgs_py", lbfgs_py)]:
+            nfev = []
+            def run():
+                del nfev[:]
+                for x in starts:
+                    nfev.append(quench(x, pot, tol=1e-6).nfev)
+            t = best_time(run)
+            results["%s_LJ%d" % (name, natoms)] = OrderedDict(
+                    [("time_per_quench", t / nquench),
+                     ("mean_nfev", float(np.mean(nfev)))])
+    return results
+
+def bench_mindist(quick=False):
+    from pygmin.systems import LJCluster
+    from pygmin.mindist import MinPermDistAtomicCluster, ExactMatchAtomicCluster
+    from pygmin.utils import rotations
+    nrepeat = 5 if quick else 20
+    results = OrderedDict()
+    for natoms in [13, 38]:
+        np.random.seed(0)
+        x1, x2 = quenched(LJCluster(natoms), 2)
+        mindist = MinPermDistAtomicCluster()
+        exact = ExactMatchAtomicCluster()
+        # a rotated and permuted copy of x1
+        mx = rotations.aa2mx(rotations.random_aa())
+        x3 = np.dot(x1.reshape(-1, 3), mx.transpose())
+        x3 = x3[np.random.permutation(natoms)].ravel()
+        results["MinPermDist_LJ%d" % natoms] = OrderedDict(
+                [("time_per_call", best_time(lambda: mindist(x1, x2), nrepeat))])
+        results["ExactMatch_LJ%d_match" % natoms] = OrderedDict(
+                [("time_per_call", best_time(lambda: exact(x1, x3), nrepeat))])
+        results["ExactMatch_LJ%d_nomatch" % natoms] = OrderedDict(
+                [("time_per_call", best_time(lambda: exact(x1, x2), nrepeat))])
+    return results
+
+def bench_neb(quick=False):
+    from pygmin.systems import LJCluster
+    from pygmin.transition_states._nebdriver import NEBDriver
+    from pygmin.utils.benchmark import ProfilingPotential
+    results = OrderedDict()
+    sizes = [13] if quick else [13, 38]
+    for natoms in sizes:
+        system = LJCluster(natoms)
+        np.random.seed(0)
+        x1, x2 = quenched(system, 2)
+        dist, x1, x2 = system.get_mindist()(x1, x2)
+        pot = ProfilingPotential(system.get_potential(), attribute=False)
+        info = dict()
+        def run():
+            pot.reset()
+            neb = NEBDriver(pot, x1, x2, verbose=-1)
+            neb.run()
+            info["nimages"] = neb.nimages
+            info["nfev"] = sum(pot.ncalls.values())
+        t = best_time(run)
+        results["NEB_LJ%d" % natoms] = OrderedDict(
+                [("time", t), ("nimages", info["nimages"]),
+                 ("nfev", info["nfev"]), ("distance", dist)])
+    return results
+
+def bench_database(quick=False):
+    from pygmin.storage import Database
+    nmin = 200 if quick else 2000
+    natoms = 38
+    results = OrderedDict()
+    np.random.seed(0)
+    energies = np.random.uniform(-170., -150., nmin)
+    coords = np.random.uniform(-1, 1, [nmin, 3 * natoms])
+    tslist = [np.random.choice(nmin, 2, replace=False) for i in xrange(nmin)]
+
+    def add_minima(commit):
+        db = Database()
+        for e, x in zip(energies, coords):
+            db.addMinimum(e, x, commit=commit)
+        db.session.commit()
+        return db
+    for commit in [True, False]:
+        t = best_time(lambda: add_minima(commit))
+        label = "" if commit else "_nocommit"
+        results["addMinimum%s" % label] = OrderedDict(
+                [("time_per_insert", t / nmin), ("inserts_per_second", nmin / t)])
+
+    db = add_minima(False)
+    minima = db.minima()
+    def add_ts():
+        for i, j in tslist:
+            m1, m2 = minima[i], minima[j]
+            db.addTransitionState(max(m1.energy, m2.energy) + 1., coords[i], m1, m2,
+                                  commit=False)
+        db.session.commit()
+    t = best_time(add_ts, nbest=1)
+    results["addTransitionState_nocommit"] = OrderedDict(
+            [("time_per_insert", t / nmin), ("inserts_per_second", nmin / t)])
+    return results
+
+def bench_disconnectivity_graph(quick=False):
+    import networkx as nx
+    from pygmin.utils.disconnectivity_graph import DisconnectivityGraph
+    nmin = 500 if quick else 5000
+    np.random.seed(0)
+    # a random connected landscape: a random spanning tree plus as many
+    # random edges.  The networkx graph is built directly, like
+    # pygmin.landscape.Graph does from a database
+    graph = nx.Graph()
+    energies = np.random.uniform(0., 10., nmin)
+    class Node(object):
+        def __init__(self, energy, i):
+            self.energy = energy
+            self._id = i
+    nodes = [Node(e, i) for i, e in enumerate(energies)]
+    graph.add_nodes_from(nodes)
+    class TS(object):
+        def __init__(self, energy):
+            self.energy = energy
+    edges = [(i, np.random.randint(0, i)) for i in xrange(1, nmin)]
+    edges += [tuple(np.random.randint(0, nmin, 2)) for i in xrange(nmin)]
+    for i, j in edges:
+        if i == j:
+            continue
+        e = max(energies[i], energies[j]) + np.random.uniform(0., 2.)
+        graph.add_edge(nodes[i], nodes[j], ts=TS(e))
+    def run():
+        dg = DisconnectivityGraph(graph, nlevels=20)
+        dg.calculate()
+    results = OrderedDict()
+    results["calculate_%d_minima" % nmin] = OrderedDict([("time", best_time(run))])
+    return results
+
+BENCHMARKS = OrderedDict([
+    ("potentials", bench_potentials),
+    ("quench", bench_quench),
+    ("mindist", bench_mindist),
+    ("neb", bench_neb),
+    ("database", bench_database),
+    ("disconnectivity_graph", bench_disconnectivity_graph),
+    ])
+
+def get_meta():
+    """return information about the machine and the version of pygmin"""
+    meta = OrderedDict()
+    meta["date"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        meta["git_commit"] = subprocess.check_output(
+                ["git", "rev-parse", "HEAD"],
+                cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        meta["git_commit"] = None
+    meta["python"] = platform.python_version()
+    meta["numpy"] = np.__version__
+    meta["platform"] = platform.platform()
+    meta["processor"] = platform.processor()
+    return meta
+
+def compare(results, reference, threshold):
+    """
+    print the ratio of all timings to the timings in reference and return the
+    list of regressions
+    """
+    regressions = []
+    print ""
+    print "comparison with %s (%s)" % (reference["meta"].get("git_commit"),
+                                        reference["meta"].get("date"))
+    for bench, bres in results.iteritems():
+        for name, values in bres.iteritems():
+            try:
+                ref = reference["results"][bench][name]
+            except KeyError:
+                continue
+            for key, value in values.iteritems():
+                if not key.startswith("time") or not ref.get(key):
+                    continue
+                ratio = value / ref[key]
+                flag = ""
+                if ratio > threshold:
+                    flag = "REGRESSION"
+                    regressions.append((bench, name, key, ratio))
+                print "%-22s %-30s %-16s %8.3f %s" % (bench, name, key, ratio, flag)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark suite for pygmin")
+    parser.add_argument("benchmarks", nargs="*",
+                        help="the benchmarks to run (default all): %s" % ", ".join(BENCHMARKS.keys()))
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare with the results in this JSON file")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="slow down factor which counts as a regression (default 1.2)")
+    parser.add_argument("--quick", action="store_true",
+                        help="smaller systems and fewer repeats")
+    args = parser.parse_args()
+
+    names = args.benchmarks or BENCHMARKS.keys()
+    for name in names:
+        if name not in BENCHMARKS:
+            parser.error("unknown benchmark %s" % name)
+    results = OrderedDict()
+    for name in names:
+        t0 = time.time()
+        results[name] = BENCHMARKS[name](quick=args.quick)
+        print "%s (%.1f s)" % (name, time.time() - t0)
+        for label, values in results[name].iteritems():
+            print "    %-30s %s" % (label, "  ".join("%s %.4g" % item for item in values.iteritems()))
+        sys.stdout.flush()
+
+    output = OrderedDict([("meta", get_meta()), ("results", results)])
+    if args.output is not None:
+        with open(args.output, "w") as fout:
+            json.dump(output, fout, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare) as fin:
+            reference = json.load(fin)
+        if compare(results, reference, args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+micro benchmark for the transform and measure kernels used by minpermdist
+
+usage::
+
+    python mindist_benchmark.py [natoms]
+"""
+import sys
+import time
+import numpy as np
+
+from pygmin.mindist import TransformAtomicCluster, MeasureAtomicCluster, \
+    MinPermDistAtomicCluster, ExactMatchAtomicCluster, findrotation
+from pygmin.mindist.permutational_alignment import permuteArray
+from pygmin.utils import rotations
+
+def timeit(func, nrepeat):
+    t0 = time.time()
+    for i in xrange(nrepeat):
+        func()
+    return (time.time() - t0) / nrepeat
+
+def run(natoms=38, nrepeat=1000):
+    transform = TransformAtomicCluster()
+    measure = MeasureAtomicCluster()
+    x1 = np.random.uniform(-1, 1, 3*natoms)
+    x2 = np.random.uniform(-1, 1, 3*natoms)
+    mx = rotations.aa2mx(rotations.random_aa())
+    perm = np.random.permutation(natoms)
+
+    results = [
+        ("permuteArray", lambda: permuteArray(x2, perm)),
+        ("translate", lambda: transform.translate(x2, np.ones(3))),
+        ("rotate", lambda: transform.rotate(x2, mx)),
+        ("invert", lambda: transform.invert(x2)),
+        ("permute", lambda: transform.permute(x2, perm)),
+        ("get_dist", lambda: measure.get_dist(x1, x2)),
+        ("find_rotation", lambda: findrotation(x1, x2)),
+        ("find_permutation", lambda: measure.find_permutation(x1, x2)),
+        ]
+
+    print "natoms", natoms
+    for name, func in results:
+        print "%-20s %10.2f us" % (name, 1e6 * timeit(func, nrepeat))
+
+    mindist = MinPermDistAtomicCluster()
+    exact = ExactMatchAtomicCluster()
+    x3 = x1.copy()
+    transform.rotate(x3, mx)
+    x3 = transform.permute(x3, perm)
+    print "%-20s %10.2f us" % ("MinPermDist", 1e6 * timeit(lambda: mindist(x1, x2), nrepeat / 10))
+    print "%-20s %10.2f us" % ("ExactMatch (match)", 1e6 * timeit(lambda: exact(x1, x3), nrepeat / 10))
+
+if __name__ == "__main__":
+    natoms = 38
+    if len(sys.argv) > 1:
+        natoms = int(sys.argv[1])
+    run(natoms)
@@ -24,7 +24,10 @@ fmodules = ModuleList(extra_compile_args=extra_compile_args)
 fmodules.add_module("pygmin/mindist/minperm.f90")
 fmodules.add_module("pygmin/optimize/mylbfgs_fort.f90")
 fmodules.add_module("pygmin/optimize/mylbfgs_updatestep.f90")
+fmodules.add_module("pygmin/optimize/_lbfgs_kernel.f90")
+fmodules.add_module("pygmin/optimize/_fire_kernel.f90")
 fmodules.add_module("pygmin/potentials/fortran/AT.f90")
+fmodules.add_module("pygmin/potentials/fortran/AT_cutoff.f90")
 fmodules.add_module("pygmin/potentials/fortran/ljpshiftfort.f90")
 fmodules.add_module("pygmin/potentials/fortran/lj.f90")
 fmodules.add_module("pygmin/potentials/fortran/ljcut.f90")
@@ -34,6 +37,7 @@ fmodules.add_module("pygmin/potentials/fortran/maxneib_lj.f90")
 fmodules.add_module("pygmin/potentials/fortran/maxneib_blj.f90")
 fmodules.add_module("pygmin/potentials/fortran/lj_hess.f90")
 fmodules.add_module("pygmin/potentials/fortran/magnetic_colloids.f90")
+fmodules.add_module("pygmin/potentials/fortran/multispecies_lj.f90")
 #fmodules.add_module("pygmin/potentials/rigid_bodies/rbutils.f90")
 fmodules.add_module("pygmin/utils/_fortran_utils.f90")
 fmodules.add_module("pygmin/transition_states/_orthogoptf.f90")